@@ -0,0 +1,45 @@
+"""
+Fixtures shared by the tests of all the apps
+"""
+import copy
+
+import pytest
+from django.conf import settings as django_settings
+from django.core.cache import caches
+from django.test import override_settings
+
+
+@pytest.fixture(scope='session', autouse=True)
+def file_cache_dirs(tmp_path_factory):
+    """
+    Keep the caches on disk in directories of the session, so that the tests
+    never clear or read the caches of the project or of another run
+    """
+    cache_settings = copy.deepcopy(django_settings.CACHES)
+    for alias, cache_setting in cache_settings.items():
+        if cache_setting['BACKEND'].endswith('FileBasedCache'):
+            cache_setting['LOCATION'] = str(tmp_path_factory.mktemp(alias))
+    with override_settings(CACHES=cache_settings):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """
+    Start every test with empty caches, so that nothing cached by one test
+    is served to another
+    """
+    for cache in caches.all():
+        cache.clear()
+    yield
+    for cache in caches.all():
+        cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """
+    Write the files of every test, such as the results of the jobs, to a
+    temporary directory
+    """
+    settings.MEDIA_ROOT = tmp_path / 'media'
@@ -0,0 +1,16 @@
+"""
+Admin for the jobs app
+"""
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """
+    Admin for the Job model
+    """
+
+    list_display = ('id', 'kind', 'user', 'status', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
@@ -0,0 +1,76 @@
+"""
+Serializers for the jobs app
+"""
+from django.urls import reverse
+from rest_framework import serializers
+
+from jobs.models import Job
+from jobs.registry import get_job_kind, get_job_kind_names
+from jobs.services import submit_job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for displaying a job while it is polled. The result is
+    fetched from `result_url` once the job succeeded
+    """
+
+    result_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = (
+            'id', 'kind', 'params', 'user', 'status', 'cancel_requested', 'error',
+            'created_at', 'started_at', 'finished_at', 'result_url',
+        )
+        read_only_fields = fields
+
+    def get_result_url(self, job):
+        """
+        Return the url of the result of a successful job, None otherwise
+        """
+        if job.status != Job.SUCCEEDED:
+            return None
+        url = reverse('job_result', kwargs={'pk': job.id})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+
+class JobSubmitSerializer(serializers.Serializer):
+    """
+    Serializer for submitting a job. The params are validated by the kind
+    of the job, with the request they are submitted with
+    """
+
+    kind = serializers.CharField()
+    params = serializers.DictField(required=False, default=dict)
+
+    def validate_kind(self, value):
+        """
+        Check that the kind is registered
+        """
+        if get_job_kind(value) is None:
+            raise serializers.ValidationError(
+                f'Unknown job kind. Choose one of: {", ".join(get_job_kind_names())}.'
+            )
+        return value
+
+    def validate(self, attrs):
+        """
+        Validate the params with the kind of the job
+        """
+        kind = get_job_kind(attrs['kind'])
+        try:
+            attrs['params'] = kind.validate(attrs['params'], self.context['request'])
+        except serializers.ValidationError as error:
+            raise serializers.ValidationError({'params': error.detail})
+        return attrs
+
+    def create(self, validated_data):
+        """
+        Queue the job for the requesting user
+        """
+        return submit_job(self.context['request'].user.id, **validated_data)
+
+    def to_representation(self, instance):
+        return JobSerializer(instance, context=self.context).data
@@ -0,0 +1,13 @@
+"""
+All the urls for the APIs in jobs app
+"""
+from django.urls import path
+
+from jobs.api import views
+
+urlpatterns = [
+    path('', views.JobListCreateAPIView.as_view(), name='job_list'),
+    path('<int:pk>/', views.JobRetrieveAPIView.as_view(), name='job_detail'),
+    path('<int:pk>/cancel/', views.JobCancelAPIView.as_view(), name='job_cancel'),
+    path('<int:pk>/result/', views.JobResultAPIView.as_view(), name='job_result'),
+]
@@ -0,0 +1,115 @@
+"""
+Views for the jobs app apis
+"""
+import os
+
+from django.http import FileResponse
+from django.urls import reverse
+from rest_framework.exceptions import NotFound
+from rest_framework.generics import (GenericAPIView, ListCreateAPIView,
+                                     RetrieveAPIView)
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.status import HTTP_202_ACCEPTED
+
+from jobs.models import Job
+from jobs.selectors import get_jobs, get_jobs_for_user
+from jobs.services import cancel_job
+from time_tracking_system.instrumentation import ServerTimingMixin
+
+from .serializers import JobSerializer, JobSubmitSerializer
+
+
+class UserJobsMixin:
+    """
+    Show all the jobs to an admin and only their own jobs to everyone else
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        """
+        Show all jobs for an admin and the user specific jobs otherwise
+        """
+        if self.request.user.is_staff:
+            return get_jobs()
+        return get_jobs_for_user(self.request.user.id)
+
+
+class JobListCreateAPIView(ServerTimingMixin, UserJobsMixin, ListCreateAPIView):
+    """
+    List the jobs, or queue a new job. A queued job is answered with
+    202 Accepted and the url to poll it at
+    """
+
+    filterset_fields = ['kind', 'status']
+
+    def get_serializer_class(self):
+        """
+        Validate new jobs with the submit serializer
+        """
+        if self.request.method == 'POST':
+            return JobSubmitSerializer
+        return JobSerializer
+
+    def create(self, request, *args, **kwargs):
+        """
+        Queue the job and point to where it can be polled
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(
+            serializer.data,
+            status=HTTP_202_ACCEPTED,
+            headers={'Location': request.build_absolute_uri(
+                reverse('job_detail', kwargs={'pk': serializer.instance.id})
+            )},
+        )
+
+
+class JobRetrieveAPIView(ServerTimingMixin, UserJobsMixin, RetrieveAPIView):
+    """
+    APIView to poll the status of a single job
+    """
+
+    serializer_class = JobSerializer
+
+
+class JobCancelAPIView(ServerTimingMixin, UserJobsMixin, GenericAPIView):
+    """
+    APIView to cancel a job. A queued job is cancelled at once and a running
+    one when it next checks, cancelling a finished job changes nothing
+    """
+
+    serializer_class = JobSerializer
+
+    def post(self, request, *args, **kwargs):
+        """
+        Cancel the job and return it as it is now
+        """
+        job = cancel_job(self.get_object())
+        return Response(self.get_serializer(job).data, status=HTTP_202_ACCEPTED)
+
+
+class JobResultAPIView(ServerTimingMixin, UserJobsMixin, GenericAPIView):
+    """
+    APIView to fetch the result of a successful job, as the file it wrote
+    or as JSON
+    """
+
+    def get(self, request, *args, **kwargs):
+        """
+        Send the result file as an attachment, or the JSON result
+        """
+        job = self.get_object()
+        if job.status != Job.SUCCEEDED:
+            raise NotFound(f'The job has no result, it is {job.status}.')
+        if not job.result_file:
+            return Response(job.result)
+        return FileResponse(
+            job.result_file.open('rb'),
+            as_attachment=True,
+            filename=os.path.basename(job.result_file.name),
+            content_type=job.result_content_type,
+        )
@@ -0,0 +1,13 @@
+"""
+App configuration for jobs app
+"""
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    """
+    Config for jobs app
+    """
+
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobs'
@@ -0,0 +1,44 @@
+"""
+Management command to run the queued jobs in worker threads
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.worker import run_workers
+
+
+class Command(BaseCommand):
+    """
+    Run the queued Jobs until interrupted, or until the queue is empty
+    """
+
+    help = 'Run the queued background jobs in worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=settings.JOB_WORKER_THREADS,
+            help='Number of jobs to run at once',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.JOB_POLL_INTERVAL,
+            help='Seconds an idle worker waits before looking for queued jobs again',
+        )
+        parser.add_argument(
+            '--exit-when-idle',
+            action='store_true',
+            help='Stop once no job is queued instead of waiting for more',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            ran = run_workers(
+                options['threads'], options['poll_interval'], options['exit_when_idle']
+            )
+        except KeyboardInterrupt:
+            # The workers were stopped after their current job
+            return
+        self.stdout.write(self.style.SUCCESS(f'Ran {ran} jobs'))
@@ -0,0 +1,62 @@
+"""
+All the models for the jobs app
+"""
+from django.conf import settings
+from django.db import models
+
+
+class Job(models.Model):
+    """
+    Job run in the background by the workers of the run_jobs command, such
+    as a large report or export. Its result is either JSON data or a file
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+    FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+    kind = models.CharField(max_length=100)
+    params = models.JSONField(default=dict)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='jobs',
+        on_delete=models.CASCADE
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    cancel_requested = models.BooleanField(default=False)
+    result = models.JSONField(null=True, blank=True)
+    result_file = models.FileField(upload_to='jobs/%Y/%m/', blank=True)
+    result_content_type = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=200, blank=True)
+    # A running job not extended by its worker until then was abandoned
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The workers claim the oldest queued job
+            models.Index(fields=['status', 'id'], name='job_status_id_idx'),
+            models.Index(fields=['user', '-id'], name='job_user_id_idx'),
+        ]
+
+    @property
+    def is_finished(self):
+        """
+        Whether the job is over, whatever its outcome
+        """
+        return self.status in self.FINISHED_STATUSES
+
+    def __str__(self):
+        return f'Job {self.id}: {self.kind} for {self.user_id} ({self.status})'
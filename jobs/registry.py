@@ -0,0 +1,63 @@
+"""
+Registry of the kinds of jobs the workers can run.
+
+Every kind has a function validating the params of the jobs submitted
+through the API, and a function running a job. The runner receives the
+claimed Job and returns its JSON result, or stores a result file with
+`jobs.services.save_job_result_file`. A long runner calls
+`jobs.services.raise_if_cancelled` now and then to stop when the job is
+cancelled. The lease of the job is extended by the worker while the runner
+runs, whether it checks or not.
+"""
+from collections import namedtuple
+
+JobKind = namedtuple('JobKind', ['name', 'validate', 'run'])
+
+_JOB_KINDS = {}
+
+
+class JobCancelled(Exception):
+    """
+    Raised by a runner to stop the job it runs because it was cancelled
+    """
+
+
+def register_job(name, validate):
+    """
+    Decorator registering the decorated function as the runner of the jobs
+    of a kind
+
+    Args:
+        name (str): Name of the kind, sent when the jobs are submitted
+        validate (callable): Called with the submitted params and the request,
+            returns the params to store or raises a ValidationError
+
+    Returns:
+        callable: The decorator
+    """
+    def decorator(run):
+        if name in _JOB_KINDS:
+            raise ValueError(f'The job kind {name} is already registered')
+        _JOB_KINDS[name] = JobKind(name, validate, run)
+        return run
+    return decorator
+
+
+def get_job_kind(name):
+    """
+    Get a registered kind of jobs
+
+    Args:
+        name (str): Name of the kind
+
+    Returns:
+        JobKind: The kind, or None if no kind has that name
+    """
+    return _JOB_KINDS.get(name)
+
+
+def get_job_kind_names():
+    """
+    Return the names of all the registered kinds, sorted
+    """
+    return sorted(_JOB_KINDS)
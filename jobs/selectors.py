@@ -0,0 +1,52 @@
+"""
+Selectors to retrieve data from db for the jobs app
+"""
+from .models import Job
+
+
+def get_jobs():
+    """
+    Get all the jobs, newest first
+
+    Returns:
+        QuerySet: Queryset containing all the Jobs
+    """
+    return Job.objects.order_by('-id')
+
+
+def get_jobs_for_user(user_id):
+    """
+    Get the jobs submitted by a user, newest first
+
+    Args:
+        user_id (int): Id of the User
+
+    Returns:
+        QuerySet: Queryset containing the Jobs of the user
+    """
+    return get_jobs().filter(user_id=user_id)
+
+
+def get_next_queued_job_id():
+    """
+    Get the id of the oldest queued job
+
+    Returns:
+        int: Id of the Job, or None if no job is queued
+    """
+    return Job.objects.filter(status=Job.QUEUED).order_by('id').values_list(
+        'id', flat=True
+    ).first()
+
+
+def is_cancel_requested(job_id):
+    """
+    Whether the job was asked to stop
+
+    Args:
+        job_id (int): Id of the Job
+
+    Returns:
+        bool: True if the job was cancelled
+    """
+    return Job.objects.filter(id=job_id, cancel_requested=True).exists()
@@ -0,0 +1,211 @@
+"""
+All the service functions to add data to the db for the jobs app
+"""
+import datetime
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import Job
+from .registry import JobCancelled, get_job_kind
+from .selectors import get_next_queued_job_id, is_cancel_requested
+
+logger = logging.getLogger(__name__)
+
+
+def submit_job(user_id, kind, params):
+    """
+    Queue a job for the workers
+
+    Args:
+        user_id (int): Id of the User submitting the job
+        kind (str): Name of a registered kind of jobs
+        params (dict): Validated params of the job
+
+    Returns:
+        Job: The queued Job
+    """
+    return Job.objects.create(user_id=user_id, kind=kind, params=params)
+
+
+def claim_next_job(worker):
+    """
+    Mark the oldest queued job as run by the given worker, leased to it for
+    JOB_LEASE_SECONDS, after failing the jobs whose lease expired. Several
+    workers can claim at once, each job is only handed to one of them
+
+    Args:
+        worker (str): Name of the worker
+
+    Returns:
+        Job: The claimed Job, or None if no job is queued
+    """
+    fail_abandoned_jobs()
+    while True:
+        job_id = get_next_queued_job_id()
+        if job_id is None:
+            return None
+        claimed = Job.objects.filter(id=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            worker=worker,
+            started_at=timezone.now(),
+            lease_expires_at=_get_lease_end(),
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+
+
+def fail_abandoned_jobs():
+    """
+    Fail the running jobs whose lease expired, because the worker running
+    them stopped without finishing them, e.g. it crashed
+
+    Returns:
+        int: Number of jobs failed
+    """
+    now = timezone.now()
+    return Job.objects.filter(status=Job.RUNNING, lease_expires_at__lt=now).update(
+        status=Job.FAILED,
+        error='The worker running the job stopped before it finished',
+        finished_at=now,
+    )
+
+
+def run_job(job):
+    """
+    Run a claimed job with the runner of its kind and store its outcome
+
+    Args:
+        job (Job): The running Job
+
+    Returns:
+        Job: The finished Job
+    """
+    kind = get_job_kind(job.kind)
+    try:
+        if kind is None:
+            raise LookupError(f'No job kind is registered as {job.kind}')
+        with _keep_leased(job):
+            result = kind.run(job)
+    except JobCancelled:
+        _finish_job(job, Job.CANCELLED)
+    except Exception as error:  # pylint: disable=broad-except
+        logger.exception('Job %s failed', job.id)
+        _finish_job(job, Job.FAILED, error=str(error) or type(error).__name__)
+    else:
+        _finish_job(job, Job.SUCCEEDED, result=result)
+    return job
+
+
+def _finish_job(job, status, result=None, error=''):
+    """
+    Store the outcome of a job, unless the job is no longer running, e.g. it
+    was failed as abandoned while its worker was stuck, whose outcome is
+    dropped. Only a successful job keeps its result file
+    """
+    if status != Job.SUCCEEDED and job.result_file:
+        job.result_file.delete(save=False)
+        job.result_content_type = ''
+    finished = Job.objects.filter(id=job.id, status=Job.RUNNING).update(
+        status=status,
+        result=result,
+        result_file=job.result_file.name,
+        result_content_type=job.result_content_type,
+        error=error,
+        finished_at=timezone.now(),
+    )
+    if not finished:
+        logger.warning('Job %s was over before its runner returned', job.id)
+        if job.result_file:
+            job.result_file.delete(save=False)
+    job.refresh_from_db()
+
+
+def cancel_job(job):
+    """
+    Cancel a job. A queued job is cancelled at once, a running one stops
+    the next time its runner checks. A finished job is left as it was
+
+    Args:
+        job (Job): The Job to cancel
+
+    Returns:
+        Job: The Job as it is now
+    """
+    Job.objects.filter(id=job.id, status=Job.QUEUED).update(
+        status=Job.CANCELLED, cancel_requested=True, finished_at=timezone.now()
+    )
+    Job.objects.filter(id=job.id, status=Job.RUNNING).update(cancel_requested=True)
+    job.refresh_from_db()
+    return job
+
+
+def raise_if_cancelled(job):
+    """
+    Stop the runner of a job if the job was cancelled
+
+    Args:
+        job (Job): The running Job
+
+    Raises:
+        JobCancelled: If the job was cancelled
+    """
+    if is_cancel_requested(job.id):
+        raise JobCancelled()
+
+
+def save_job_result_file(job, name, content, content_type):
+    """
+    Store the result file of a running job. The job is saved when it is over
+
+    Args:
+        job (Job): The running Job
+        name (str): File name the result is downloaded as
+        content (File): Content of the file
+        content_type (str): MIME type of the content
+    """
+    job.result_file.save(name, content, save=False)
+    job.result_content_type = content_type
+
+
+def _get_lease_end():
+    """
+    Return the time a job leased from now on is leased until
+    """
+    return timezone.now() + datetime.timedelta(seconds=settings.JOB_LEASE_SECONDS)
+
+
+@contextmanager
+def _keep_leased(job):
+    """
+    Extend the lease of the job every third of JOB_LEASE_SECONDS while the
+    block runs, from a thread with its own connection, so that a runner
+    busy with a single long query is not failed as abandoned
+    """
+    done = threading.Event()
+
+    def extend_lease():
+        try:
+            while not done.wait(settings.JOB_LEASE_SECONDS / 3):
+                try:
+                    Job.objects.filter(id=job.id, status=Job.RUNNING).update(
+                        lease_expires_at=_get_lease_end()
+                    )
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception('Could not extend the lease of job %s', job.id)
+        finally:
+            connection.close()
+
+    heartbeat = threading.Thread(
+        target=extend_lease, name=f'job-lease-{job.id}', daemon=True
+    )
+    heartbeat.start()
+    try:
+        yield
+    finally:
+        done.set()
+        heartbeat.join()
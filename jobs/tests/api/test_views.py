@@ -0,0 +1,168 @@
+"""
+Tests for the api views of the jobs app
+"""
+import datetime
+import threading
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from jobs.models import Job
+from jobs.worker import work
+from tracking.tests.factories import ContractFactory, TimelogFactory
+from users.tests.factories import UserFactory
+
+
+def run_queued_jobs():
+    """
+    Run all the queued jobs in the current thread
+    """
+    return work('test', threading.Event(), 0, exit_when_idle=True)
+
+
+def submit(client, kind, **params):
+    """
+    Submit a job and return the response
+    """
+    return client.post(
+        reverse('job_list'), {'kind': kind, 'params': params}, content_type='application/json'
+    )
+
+
+@pytest.fixture(name='contract')
+def contract_with_logs():
+    """
+    Fixture to get a contract with logs on the last three days
+    """
+    contract = ContractFactory(hourly_price=10)
+    for days in range(1, 4):
+        TimelogFactory(
+            contract=contract,
+            date=datetime.date.today() - datetime.timedelta(days=days),
+            hours_worked=days,
+        )
+    return contract
+
+
+class TestJobAPIViews:
+    """
+    Test that the reports and exports run as jobs give the same results as
+    their views, and that the jobs can be polled and cancelled by their user
+    """
+
+    @pytest.mark.django_db
+    def test_report_jobs_match_the_report_views(self, client, contract):
+        """
+        Test that a report job is accepted, polled and gives the report of
+        the report view
+        """
+        client.force_login(contract.user)
+        params = {
+            'date_after': str(datetime.date.today() - datetime.timedelta(days=7)),
+            'date_before': str(datetime.date.today()),
+            'group_by': 'contract',
+            'period': 'month',
+        }
+        for kind in ('hours_report', 'earnings_report'):
+            response = submit(client, kind, **params)
+            assert response.status_code == status.HTTP_202_ACCEPTED
+            job = response.json()
+            assert job['status'] == Job.QUEUED
+            assert job['params'] == {**params, 'user': contract.user_id}
+            assert response['Location'].endswith(reverse('job_detail', kwargs={'pk': job['id']}))
+
+            assert run_queued_jobs() == 1
+            job = client.get(response['Location']).json()
+            assert job['status'] == Job.SUCCEEDED
+            result = client.get(job['result_url']).json()
+            assert result == client.get(reverse(kind), params).json()
+            assert result['results']
+
+    @pytest.mark.django_db
+    def test_export_job_writes_the_export(self, client, contract):
+        """
+        Test that an export job stores the file the export view streams
+        """
+        client.force_login(contract.user)
+        ContractFactory()
+        job_id = submit(client, 'timelog_export', file_format='ndjson').json()['id']
+        run_queued_jobs()
+
+        response = client.get(reverse('job_result', kwargs={'pk': job_id}))
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'application/x-ndjson'
+        assert f'timelogs-{job_id}' in response['Content-Disposition']
+        exported = b''.join(response.streaming_content)
+        streamed = client.get(reverse('timelog_export'), {'file_format': 'ndjson'})
+        assert exported == b''.join(streamed.streaming_content)
+        assert len(exported.splitlines()) == 3
+
+    @pytest.mark.django_db
+    def test_submitted_params_are_validated(self, client, contract):
+        """
+        Test that unknown kinds and invalid params are rejected, and that
+        only admins can submit jobs over other users
+        """
+        client.force_login(contract.user)
+        other_user = UserFactory()
+
+        response = submit(client, 'payroll')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'kind' in response.json()
+        response = submit(client, 'hours_report', group_by='planet')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert set(response.json()['params']) == {'date_after', 'date_before', 'group_by'}
+        response = submit(client, 'timelog_export', date_after='yesterday')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        report = {
+            'date_after': '2021-01-01', 'date_before': '2021-12-31', 'group_by': 'user',
+        }
+        response = submit(client, 'hours_report', user=other_user.id, **report)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        response = submit(client, 'timelog_export', user=other_user.id)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert not Job.objects.exists()
+
+        client.force_login(UserFactory(is_staff=True))
+        response = submit(client, 'hours_report', user=other_user.id, **report)
+        assert response.status_code == status.HTTP_202_ACCEPTED
+
+    @pytest.mark.django_db
+    def test_jobs_are_only_shown_to_their_user(self, client, contract):
+        """
+        Test that users only see their own jobs and admins see all of them
+        """
+        client.force_login(contract.user)
+        job_id = submit(client, 'timelog_export').json()['id']
+
+        client.force_login(UserFactory())
+        assert client.get(reverse('job_list')).json()['count'] == 0
+        for route in ('job_detail', 'job_cancel', 'job_result'):
+            method = client.post if route == 'job_cancel' else client.get
+            response = method(reverse(route, kwargs={'pk': job_id}))
+            assert response.status_code == status.HTTP_404_NOT_FOUND
+
+        client.force_login(UserFactory(is_staff=True))
+        assert client.get(reverse('job_list')).json()['count'] == 1
+        response = client.get(reverse('job_detail', kwargs={'pk': job_id}))
+        assert response.json()['user'] == contract.user_id
+
+    @pytest.mark.django_db
+    def test_cancelled_job_is_not_run(self, client, contract):
+        """
+        Test that a cancelled job has no result and is never run
+        """
+        client.force_login(contract.user)
+        job_id = submit(client, 'timelog_export').json()['id']
+        result_url = reverse('job_result', kwargs={'pk': job_id})
+        assert client.get(result_url).status_code == status.HTTP_404_NOT_FOUND
+
+        response = client.post(reverse('job_cancel', kwargs={'pk': job_id}))
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.json()['status'] == Job.CANCELLED
+        assert response.json()['result_url'] is None
+
+        assert run_queued_jobs() == 0
+        assert client.get(result_url).status_code == status.HTTP_404_NOT_FOUND
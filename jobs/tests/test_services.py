@@ -0,0 +1,235 @@
+"""
+Tests for the services and the workers of the jobs app
+"""
+import datetime
+import threading
+import time
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from jobs import registry
+from jobs.models import Job
+from jobs.registry import JobCancelled, JobKind
+from jobs.services import (cancel_job, claim_next_job, fail_abandoned_jobs,
+                           raise_if_cancelled, run_job, submit_job)
+from jobs.worker import work
+from users.tests.factories import UserFactory
+
+
+def fail(job):
+    """
+    Runner of a job that always fails
+    """
+    raise ValueError('Out of paper')
+
+
+def wait_for_cancel(job):
+    """
+    Runner of a job that stops as soon as it checks whether it was cancelled
+    """
+    raise_if_cancelled(job)
+    return {'finished': True}
+
+
+def outlive_lease(job):
+    """
+    Runner of a job that never checks, running for longer than its lease,
+    and then failing the abandoned jobs like another worker would
+    """
+    time.sleep(0.5)
+    fail_abandoned_jobs()
+    return {'status': Job.objects.get(id=job.id).status}
+
+
+def get_abandoned(job):
+    """
+    Runner of a job that is failed as abandoned while it runs
+    """
+    Job.objects.filter(id=job.id).update(
+        lease_expires_at=timezone.now() - datetime.timedelta(seconds=1)
+    )
+    fail_abandoned_jobs()
+    return {'finished': True}
+
+
+@pytest.fixture(autouse=True)
+def job_kinds(monkeypatch):
+    """
+    Register kinds of jobs that echo their params, fail, or can be cancelled
+    """
+    for name, run in (
+            ('echo', lambda job: job.params),
+            ('fail', fail),
+            ('cancellable', wait_for_cancel),
+            ('long', outlive_lease),
+            ('abandoned', get_abandoned),
+    ):
+        monkeypatch.setitem(registry._JOB_KINDS, name, JobKind(name, None, run))
+
+
+class TestJobs:
+    """
+    Test that the jobs are claimed once, run, and cancelled
+    """
+
+    @pytest.mark.django_db
+    def test_every_job_is_claimed_once_in_order(self):
+        """
+        Test that the workers claim the oldest queued job, and nothing once
+        the queue is empty
+        """
+        user = UserFactory()
+        first = submit_job(user.id, 'echo', {'number': 1})
+        second = submit_job(user.id, 'echo', {'number': 2})
+
+        claimed = claim_next_job('worker-a')
+        assert (claimed.id, claimed.status, claimed.worker) == (first.id, Job.RUNNING, 'worker-a')
+        assert claimed.started_at is not None
+        assert claim_next_job('worker-b').id == second.id
+        assert claim_next_job('worker-a') is None
+
+    @pytest.mark.django_db
+    def test_outcomes_are_stored(self):
+        """
+        Test that a job stores its result, or its error when it fails
+        """
+        user = UserFactory()
+        for kind in ('echo', 'fail', 'missing'):
+            submit_job(user.id, kind, {'number': 1})
+
+        outcomes = [run_job(claim_next_job('worker')) for _ in range(3)]
+        assert [(job.status, job.result) for job in outcomes] == [
+            (Job.SUCCEEDED, {'number': 1}),
+            (Job.FAILED, None),
+            (Job.FAILED, None),
+        ]
+        assert outcomes[1].error == 'Out of paper'
+        assert 'missing' in outcomes[2].error
+        assert all(job.finished_at is not None for job in Job.objects.all())
+
+    @pytest.mark.django_db
+    def test_cancel_job(self):
+        """
+        Test that a queued job is cancelled at once, a running one when it
+        checks, and a finished one not at all
+        """
+        user = UserFactory()
+        queued = submit_job(user.id, 'echo', {})
+        running = submit_job(user.id, 'cancellable', {})
+
+        assert cancel_job(queued).status == Job.CANCELLED
+        job = claim_next_job('worker')
+        assert job.id == running.id
+        assert claim_next_job('worker') is None
+
+        cancelled = cancel_job(running)
+        assert (cancelled.status, cancelled.cancel_requested) == (Job.RUNNING, True)
+        assert run_job(job).status == Job.CANCELLED
+
+        submit_job(user.id, 'echo', {})
+        finished = run_job(claim_next_job('worker'))
+        assert cancel_job(finished).status == Job.SUCCEEDED
+
+    @pytest.mark.django_db
+    def test_jobs_of_stopped_workers_are_failed(self):
+        """
+        Test that a running job whose lease expired is failed by the next
+        claim, while the jobs still leased keep running
+        """
+        user = UserFactory()
+        abandoned = submit_job(user.id, 'echo', {})
+        leased = submit_job(user.id, 'echo', {})
+        claim_next_job('crashed')
+        claim_next_job('alive')
+        Job.objects.filter(id=abandoned.id).update(
+            lease_expires_at=timezone.now() - datetime.timedelta(seconds=1)
+        )
+        queued = submit_job(user.id, 'echo', {})
+
+        assert claim_next_job('worker').id == queued.id
+        abandoned.refresh_from_db()
+        assert (abandoned.status, abandoned.finished_at is not None) == (Job.FAILED, True)
+        assert 'stopped' in abandoned.error
+        assert Job.objects.get(id=leased.id).status == Job.RUNNING
+
+    @pytest.mark.django_db(transaction=True)
+    def test_running_jobs_keep_their_lease(self, settings):
+        """
+        Test that the worker extends the lease of a job that runs for longer
+        than it, without the runner checking anything. Needs transactions,
+        as the lease is extended from another thread
+        """
+        settings.JOB_LEASE_SECONDS = 0.3
+        submit_job(UserFactory().id, 'long', {})
+
+        job = run_job(claim_next_job('worker'))
+        assert (job.status, job.result) == (Job.SUCCEEDED, {'status': Job.RUNNING})
+
+    @pytest.mark.django_db
+    def test_outcome_of_abandoned_jobs_is_dropped(self):
+        """
+        Test that a job failed as abandoned while it ran stays failed once
+        its runner returns, without the result
+        """
+        submit_job(UserFactory().id, 'abandoned', {})
+
+        job = run_job(claim_next_job('worker'))
+        assert (job.status, job.result) == (Job.FAILED, None)
+        assert 'stopped' in job.error
+
+    def test_cancelled_runner_raises(self, monkeypatch):
+        """
+        Test that a runner checking a cancelled job is stopped
+        """
+        monkeypatch.setattr('jobs.services.is_cancel_requested', lambda job_id: True)
+        with pytest.raises(JobCancelled):
+            wait_for_cancel(Job(id=1))
+
+
+class TestWorkers:
+    """
+    Test that the workers run the queued jobs until they are stopped
+    """
+
+    @pytest.mark.django_db
+    def test_worker_runs_the_queue(self):
+        """
+        Test that a worker runs every queued job and returns once idle
+        """
+        user = UserFactory()
+        for number in range(3):
+            submit_job(user.id, 'echo', {'number': number})
+
+        assert work('worker', threading.Event(), 0, exit_when_idle=True) == 3
+        assert set(Job.objects.values_list('status', flat=True)) == {Job.SUCCEEDED}
+
+    @pytest.mark.django_db
+    def test_stopped_worker_runs_nothing(self):
+        """
+        Test that a stopped worker leaves the queue as it is
+        """
+        submit_job(UserFactory().id, 'echo', {})
+        stop = threading.Event()
+        stop.set()
+        assert work('worker', stop, 0) == 0
+        assert Job.objects.get().status == Job.QUEUED
+
+    @pytest.mark.django_db(transaction=True)
+    def test_run_jobs_command(self):
+        """
+        Test that the command runs the queued jobs in a worker thread. One
+        thread only, as the in-memory test database is locked by a writer
+        instead of waiting for it
+        """
+        user = UserFactory()
+        for number in range(4):
+            submit_job(user.id, 'echo', {'number': number})
+
+        out = StringIO()
+        call_command('run_jobs', threads=1, poll_interval=0, exit_when_idle=True, stdout=out)
+        assert 'Ran 4 jobs' in out.getvalue()
+        assert sorted(job.result['number'] for job in Job.objects.all()) == [0, 1, 2, 3]
+        assert Job.objects.filter(worker__endswith=':0').count() == 4
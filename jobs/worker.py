@@ -0,0 +1,82 @@
+"""
+Workers running the queued jobs in threads of the run_jobs command, so that
+the reports and exports never hold a web worker. Every worker claims the
+oldest queued job, runs it, and looks for the next one, waiting a poll
+interval whenever the queue is empty
+"""
+import os
+import socket
+import threading
+
+from django.db import connection
+
+from .services import claim_next_job, run_job
+
+
+def work(name, stop, poll_interval, exit_when_idle=False):
+    """
+    Run the queued jobs one after another until `stop` is set
+
+    Args:
+        name (str): Name of the worker, stored on the jobs it runs
+        stop (threading.Event): Set to stop after the current job
+        poll_interval (float): Seconds to wait when no job is queued
+        exit_when_idle (bool): Return as soon as no job is queued
+
+    Returns:
+        int: Number of jobs run
+    """
+    ran = 0
+    while not stop.is_set():
+        job = claim_next_job(name)
+        if job is None:
+            if exit_when_idle:
+                break
+            stop.wait(poll_interval)
+            continue
+        run_job(job)
+        ran += 1
+    return ran
+
+
+def run_workers(threads, poll_interval, exit_when_idle=False, stop=None):
+    """
+    Run `threads` workers at once and wait for all of them to return. Every
+    thread uses its own database connection, closed when it returns
+
+    Args:
+        threads (int): Number of workers
+        poll_interval (float): Seconds a worker waits when no job is queued
+        exit_when_idle (bool): Return once no job is queued
+        stop (threading.Event): Set to stop the workers after their current
+            job (Optional)
+
+    Returns:
+        int: Number of jobs run
+    """
+    stop = stop or threading.Event()
+    prefix = f'{socket.gethostname()}:{os.getpid()}'
+    counts = []
+
+    def target(number):
+        try:
+            counts.append(work(f'{prefix}:{number}', stop, poll_interval, exit_when_idle))
+        finally:
+            connection.close()
+
+    workers = [
+        threading.Thread(target=target, args=(number,), name=f'job-worker-{number}')
+        for number in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            # Join with a timeout so that the main thread still gets signals
+            while worker.is_alive():
+                worker.join(poll_interval)
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+    return sum(counts)
@@ -2,12 +2,13 @@
 Urls for all the APIs in the project
 """
 from django.urls import include, path
-from rest_framework_simplejwt.views import (TokenObtainPairView,
-                                            TokenRefreshView)
+from rest_framework_simplejwt.views import TokenRefreshView
+
+from users.api.views import ClaimsTokenObtainPairView
 
 urlpatterns = [
     # JWT token
-    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/', ClaimsTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 
     # tracking app
@@ -16,5 +17,8 @@ urlpatterns = [
     # users app
     path('users/', include("users.api.urls")),
 
+    # jobs app
+    path('jobs/', include('jobs.api.urls')),
+
 
 ]
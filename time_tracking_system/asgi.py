@@ -2,6 +2,8 @@
 ASGI config for time_tracking_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The read routes of the APIs are served by async views, see
+``time_tracking_system.async_views``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -9,8 +11,12 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'time_tracking_system.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+from time_tracking_system.async_views import AsyncReadsASGIHandler  # noqa: E402 isort:skip
+
+application = AsyncReadsASGIHandler()
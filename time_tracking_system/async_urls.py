@@ -0,0 +1,26 @@
+"""
+Url conf of the ASGI entry point, the same as ROOT_URLCONF except that the
+GET and HEAD requests to some routes of the APIs are served by async views
+"""
+from time_tracking_system.async_views import make_async_patterns
+from time_tracking_system.urls import urlpatterns as sync_urlpatterns
+
+# Routes whose reads are served by async views, while their writes run in
+# the shared thread like those of any sync view. Exports stream from a
+# database cursor while the response is sent, so they stay sync
+ASYNC_ROUTES = (
+    'project_list',
+    'project_detail',
+    'contract_list',
+    'contract_detail',
+    'contract_list_for_user',
+    'timelog_list',
+    'timelog_detail',
+    'timelog_list_for_user',
+    'hours_report',
+    'earnings_report',
+    'register',
+    'detail',
+)
+
+urlpatterns = make_async_patterns(sync_urlpatterns, ASYNC_ROUTES)
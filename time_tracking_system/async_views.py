@@ -0,0 +1,108 @@
+"""
+Async views for the ASGI entry point.
+
+Under ASGI, Django 3.2 runs every sync view in one shared thread, so a single
+slow request holds up all the others. Neither Django 3.2 nor DRF 3.12 have
+async ORM interfaces or async views, so the reads of some routes are run
+by coroutines calling the DRF views in a thread pool instead. The event loop
+only hands a request to a thread while the view runs, so sending responses
+to slow clients does not hold any thread. The writes to those routes are run
+like Django runs every sync view, in the shared thread.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+from django.urls import URLPattern, URLResolver
+
+# Methods run in the thread pool, the ones that never write
+READ_METHODS = ('GET', 'HEAD')
+
+
+def async_view(view):
+    """
+    Wrap a sync view into a coroutine function running its reads in a
+    thread of the pool, with the database connections of that thread
+    handled like those of a WSGI request, and any other request in the
+    thread Django runs the sync views in
+
+    Args:
+        view (callable): The sync view
+
+    Returns:
+        callable: The coroutine function to route the requests to
+    """
+    @sync_to_async(thread_sensitive=False)
+    def run(request, *args, **kwargs):
+        close_old_connections()
+        try:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            return response
+        finally:
+            close_old_connections()
+
+    run_write = sync_to_async(view, thread_sensitive=True)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            return await run(request, *args, **kwargs)
+        return await run_write(request, *args, **kwargs)
+
+    return wrapper
+
+
+def make_async_patterns(patterns, names):
+    """
+    Copy the url patterns, routing the ones with the given names to async
+    views
+
+    Args:
+        patterns (list): Url patterns and resolvers, looked into recursively
+        names (iterable): Names of the routes to make async
+
+    Returns:
+        list: The new url patterns
+    """
+    names = set(names)
+    async_patterns = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            async_patterns.append(URLResolver(
+                pattern.pattern,
+                make_async_patterns(pattern.url_patterns, names),
+                pattern.default_kwargs,
+                pattern.app_name,
+                pattern.namespace,
+            ))
+        elif isinstance(pattern, URLPattern) and pattern.name in names:
+            async_patterns.append(URLPattern(
+                pattern.pattern,
+                async_view(pattern.callback),
+                pattern.default_args,
+                pattern.name,
+            ))
+        else:
+            async_patterns.append(pattern)
+    return async_patterns
+
+
+class AsyncReadsASGIHandler(ASGIHandler):
+    """
+    ASGI handler routing the requests with the url conf of the async views,
+    so that the WSGI deployment keeps calling the sync views directly
+    """
+
+    urlconf = 'time_tracking_system.async_urls'
+
+    def create_request(self, scope, body_file):
+        """
+        Create the request, routed by the async url conf
+        """
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = self.urlconf
+        return request, error_response
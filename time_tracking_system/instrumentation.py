@@ -0,0 +1,249 @@
+"""
+Per-request performance instrumentation.
+
+The middleware counts and times the SQL queries of every request, and the
+DRF views time their authentication, permission checks, view code and
+rendering. The durations are sent back in a `Server-Timing` header and can
+also be logged as one JSON line per request. Every duration but `total`
+leaves out the SQL and the other durations measured within it, so they add
+up to (almost) the total.
+
+Under ASGI the views may run in other threads than the middleware, so the
+DRF views also record the queries of the thread they run in.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager, nullcontext
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Name and description of every duration in the Server-Timing header, in order
+TIMING_METRICS = (
+    ('auth', 'Authentication'),
+    ('perm', 'Permission checks'),
+    ('serialize', 'View and serializer code'),
+    ('render', 'Rendering'),
+)
+
+
+class RequestTimings:
+    """
+    Durations measured while handling a single request, in seconds
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql = 0.0
+        self.durations = defaultdict(float)
+        # Time spent in SQL or in nested spans, for every open span
+        self._nested = []
+        # Threads whose queries are being recorded
+        self._recording = set()
+
+    def record_query(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper counting and timing every query
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.sql += elapsed
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    @contextmanager
+    def record_queries(self):
+        """
+        Record the queries run in the current thread within the block, unless
+        they already are
+        """
+        thread = threading.get_ident()
+        if thread in self._recording:
+            yield
+            return
+
+        self._recording.add(thread)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(self.record_query))
+                yield
+        finally:
+            self._recording.discard(thread)
+
+    @contextmanager
+    def span(self, name):
+        """
+        Add the time spent in the block to the named duration, leaving out
+        the time spent in SQL and in spans nested in it
+        """
+        start = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.durations[name] += elapsed - self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    def get_metrics(self):
+        """
+        Return the measured durations in milliseconds, and the query count
+        """
+        metrics = {'db': self.sql * 1000, 'queries': self.queries}
+        for name, _ in TIMING_METRICS:
+            if name in self.durations:
+                metrics[name] = self.durations[name] * 1000
+        metrics['total'] = (time.perf_counter() - self.started) * 1000
+        return metrics
+
+    def get_header(self, metrics):
+        """
+        Format the metrics as the value of a Server-Timing header
+        """
+        entries = [f'db;dur={metrics["db"]:.2f};desc="{metrics["queries"]} queries"']
+        entries.extend(
+            f'{name};dur={metrics[name]:.2f};desc="{description}"'
+            for name, description in TIMING_METRICS if name in metrics
+        )
+        entries.append(f'total;dur={metrics["total"]:.2f}')
+        return ', '.join(entries)
+
+
+def timed(request, name):
+    """
+    Return a context manager adding the time spent in it to the named
+    duration of the request, or doing nothing if it is not instrumented
+    """
+    timings = getattr(request, 'timings', None)
+    if timings is None:
+        return nullcontext()
+    return timings.span(name)
+
+
+def record_queries(request):
+    """
+    Return a context manager recording the queries run in the current thread
+    for the request, or doing nothing if it is not instrumented
+    """
+    timings = getattr(request, 'timings', None)
+    if timings is None:
+        return nullcontext()
+    return timings.record_queries()
+
+
+class ServerTimingMiddleware:
+    """
+    Measure every request and add the durations to the response as a
+    Server-Timing header. Disabled unless SERVER_TIMING is set, and logs a
+    line per request if SERVER_TIMING_LOG is set. Should be the first
+    middleware, so that the total covers all the others. Runs in the mode of
+    the handler, so that it never moves an ASGI request to a thread
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Tell the handler that calling this instance returns a coroutine
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        request.timings = timings = RequestTimings()
+        with timings.record_queries():
+            response = self.get_response(request)
+        return self.add_timings(request, response)
+
+    async def __acall__(self, request):
+        """
+        Measure a request of the ASGI handler, the queries are recorded by
+        the views in the threads they run in
+        """
+        request.timings = RequestTimings()
+        response = await self.get_response(request)
+        return self.add_timings(request, response)
+
+    def add_timings(self, request, response):
+        """
+        Add the Server-Timing header to the response, and log the metrics
+        """
+        timings = request.timings
+        metrics = timings.get_metrics()
+        response['Server-Timing'] = timings.get_header(metrics)
+        if getattr(settings, 'SERVER_TIMING_LOG', False):
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                **{
+                    name: round(value, 3) if isinstance(value, float) else value
+                    for name, value in metrics.items()
+                },
+            }))
+        return response
+
+
+class ServerTimingMixin:
+    """
+    Time the authentication, permission checks, view code and rendering of
+    a DRF view for the ServerTimingMiddleware. Responses are rendered as
+    soon as the view returns, so that rendering can be timed on its own
+    """
+
+    def perform_authentication(self, request):
+        """
+        Time authenticating the user
+        """
+        with timed(request, 'auth'):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        """
+        Time the view level permission checks
+        """
+        with timed(request, 'perm'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        """
+        Time the object level permission checks
+        """
+        with timed(request, 'perm'):
+            super().check_object_permissions(request, obj)
+
+    def dispatch(self, request, *args, **kwargs):
+        """
+        Time everything the view does that is not timed on its own
+        """
+        with record_queries(request), timed(request, 'serialize'):
+            return super().dispatch(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """
+        Render the response right away to time the rendering
+        """
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if hasattr(response, 'render') and not response.is_rendered:
+            with timed(request, 'render'):
+                response.render()
+        return response
@@ -0,0 +1,153 @@
+"""
+Routing of the reads of the API requests to read replicas.
+
+The queries of safe-method requests to the APIs for the models of the
+DATABASE_REPLICA_APPS are read from one of the DATABASE_REPLICAS, the same
+one for the whole request, everything else from and to the default
+database, the primary. A client that has just written is pinned to the
+primary for REPLICA_PIN_SECONDS, longer than the replicas lag behind, so
+that it always reads its own writes: with a cookie, and for the users
+authenticated by a token, which may not keep cookies, by the receivers of
+`wrote_to_primary`.
+"""
+import asyncio
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.dispatch import Signal
+
+PRIMARY = 'default'
+
+# The replica the reads of the current request go to, None for the primary
+replica_reads = ContextVar('replica_reads', default=None)
+
+# Sent with the request after a successful write, for the apps to pin what
+# the client is known by besides its cookie
+wrote_to_primary = Signal()
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Read from the primary within the block, e.g. while computing data that
+    is cached for everyone and must not come from a lagging replica
+    """
+    token = replica_reads.set(None)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def pin_to_primary():
+    """
+    Read from the primary for the rest of the current request, e.g. once
+    its user turns out to have written a moment ago
+    """
+    replica_reads.set(None)
+
+
+class ReplicaRouter:
+    """
+    Send the reads of the models of the DATABASE_REPLICA_APPS to the replica
+    of the current request, if it has one, and everything else to the
+    primary
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = replica_reads.get()
+        if replica and model._meta.app_label in settings.DATABASE_REPLICA_APPS:
+            return replica
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replicas get the schema from the primary
+        return db not in getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+class ReplicaMiddleware:
+    """
+    Read from a random replica for the safe-method requests to the
+    DATABASE_REPLICA_PATHS that are not pinned to the primary, and pin the
+    clients that wrote to it. Runs in the mode of the handler, and the views
+    run in threads inherit the routing from the context
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Tell the handler that calling this instance returns a coroutine
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        token = replica_reads.set(self.get_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return self.pin_writer(request, response)
+
+    async def __acall__(self, request):
+        """
+        Route the reads of a request of the ASGI handler
+        """
+        token = replica_reads.set(self.get_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return self.pin_writer(request, response)
+
+    def get_replica(self, request):
+        """
+        Return the replica the reads of the request go to, or None
+        """
+        if self.allows_replicas(request):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def allows_replicas(self, request):
+        """
+        Whether the reads of the request may go to a replica
+        """
+        return (
+            bool(getattr(settings, 'DATABASE_REPLICAS', ()))
+            and request.method in ('GET', 'HEAD', 'OPTIONS')
+            and settings.REPLICA_PIN_COOKIE not in request.COOKIES
+            and request.path_info.startswith(tuple(settings.DATABASE_REPLICA_PATHS))
+        )
+
+    def pin_writer(self, request, response):
+        """
+        Pin the client to the primary after a successful write, and let the
+        receivers of `wrote_to_primary` pin the user it is authenticated as
+        """
+        if (
+                getattr(settings, 'DATABASE_REPLICAS', ())
+                and request.method not in ('GET', 'HEAD', 'OPTIONS')
+                and response.status_code < 400
+        ):
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+            wrote_to_primary.send(sender=self.__class__, request=request)
+        return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -50,10 +51,13 @@ INSTALLED_APPS = [
     # local apps
     'users',
     'tracking',
+    'jobs',
 
 ]
 
 MIDDLEWARE = [
+    'time_tracking_system.instrumentation.ServerTimingMiddleware',
+    'time_tracking_system.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -94,6 +98,54 @@ DATABASES = {
     }
 }
 
+# Read replicas of the default database, as a comma separated list of SQLite
+# files kept in sync with it, e.g. DATABASE_REPLICA_FILES=db-replica.sqlite3
+DATABASE_REPLICA_FILES = [
+    name for name in os.environ.get('DATABASE_REPLICA_FILES', '').split(',') if name
+]
+DATABASE_REPLICAS = [f'replica_{number}' for number in range(len(DATABASE_REPLICA_FILES))]
+for alias, name in zip(DATABASE_REPLICAS, DATABASE_REPLICA_FILES):
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / name,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['time_tracking_system.replicas.ReplicaRouter']
+
+# Paths whose safe-method requests read from the replicas, and the apps whose
+# models they read from them. Sessions are always read from the primary
+DATABASE_REPLICA_PATHS = ['/api/']
+DATABASE_REPLICA_APPS = ['tracking', 'users']
+
+# Cookie pinning a client that wrote to the primary, and for how many
+# seconds, longer than the replicas lag behind
+REPLICA_PIN_COOKIE = 'pin_primary'
+REPLICA_PIN_SECONDS = 10
+
+
+# Caches
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # On disk, so that all the processes of a host share the cached projects
+    # and see them invalidated. PROJECT_CACHE_DIR moves it out of the project
+    'projects': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('PROJECT_CACHE_DIR', BASE_DIR / 'cache' / 'projects'),
+    },
+    # On disk as well, for the state of the users every process of a host
+    # has to agree on, such as their pins to the primary. USER_CACHE_DIR
+    # moves it out of the project
+    'users': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('USER_CACHE_DIR', BASE_DIR / 'cache' / 'users'),
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -135,6 +187,9 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Files written by the background jobs, such as exports
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -146,10 +201,65 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication'
+        'users.authentication.ClaimsJWTAuthentication'
     ),
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_PERMISSION_CLASSES': ('rest_framework.permissions.IsAuthenticated',),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 20
 }
+
+# Users
+# ------------------------------------------------------------------------------
+
+# Seconds to cache the users loaded for requests authenticated by a token,
+# 0 to always load them from the db
+USER_CACHE_TIMEOUT = 60 * 5
+
+# Cache the state of the users shared by the processes is stored in
+USER_STATE_CACHE_ALIAS = 'users'
+
+# Seconds the time the tokens of a user were revoked at is cached, which is
+# how long the processes of other hosts may accept the revoked tokens
+TOKEN_REVOCATION_CACHE_TIMEOUT = 60
+
+# Tracking
+# ------------------------------------------------------------------------------
+
+# Seconds to cache the earnings of months that are over
+EARNINGS_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Cache the serialized projects are stored in, and for how many seconds
+PROJECT_CACHE_ALIAS = 'projects'
+PROJECT_CACHE_TIMEOUT = 60 * 60
+
+# Days after which the archive_timelogs command moves the logs to the
+# archive table, and how many logs it moves per transaction
+TIMELOG_ARCHIVE_AFTER_DAYS = 365
+TIMELOG_ARCHIVE_BATCH_SIZE = 1000
+
+# Contract ids per shard of the generate_invoices command
+INVOICE_SHARD_SIZE = 1000
+
+# Jobs
+# ------------------------------------------------------------------------------
+
+# Number of worker threads the run_jobs command starts, and how many seconds
+# an idle worker waits before looking for queued jobs again
+JOB_WORKER_THREADS = 2
+JOB_POLL_INTERVAL = 1.0
+
+# Seconds a running job is leased to its worker. The worker extends the lease
+# every third of it while the job runs, and a job whose lease expired, e.g.
+# because its worker crashed, is failed by the next worker that claims
+JOB_LEASE_SECONDS = 300
+
+# Instrumentation
+# ------------------------------------------------------------------------------
+
+# Send the SQL, permission, serializer and render durations of every request
+# in a Server-Timing header
+SERVER_TIMING = True
+
+# Also log them as one JSON line per request
+SERVER_TIMING_LOG = False
@@ -0,0 +1,71 @@
+"""
+Streaming writers for exporting timelogs as CSV or NDJSON. Rows are written
+a chunk at a time, so neither the rows read from the database nor the
+encoded output are ever held in memory all at once
+"""
+import csv
+import io
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Names of the exported columns, matching TIMELOG_EXPORT_FIELDS
+EXPORT_COLUMNS = (
+    'id',
+    'date',
+    'contract',
+    'user',
+    'project',
+    'hours_worked',
+    'hourly_price',
+    'hourly_price_currency',
+)
+
+# Rows fetched from the database cursor and encoded per chunk of output
+EXPORT_CHUNK_SIZE = 2000
+
+
+def stream_csv(rows):
+    """
+    Yield the header and then the given rows as CSV text
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+
+    for chunk in _chunks(rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+
+
+def stream_ndjson(rows):
+    """
+    Yield the given rows as JSON objects, one per line
+    """
+    encoder = DjangoJSONEncoder()
+    for chunk in _chunks(rows):
+        yield ''.join(
+            encoder.encode(dict(zip(EXPORT_COLUMNS, row))) + '\n' for row in chunk
+        )
+
+
+def _chunks(rows):
+    """
+    Split the rows into lists of at most EXPORT_CHUNK_SIZE rows
+    """
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, EXPORT_CHUNK_SIZE))
+        if not chunk:
+            return
+        yield chunk
+
+
+# Content type and writer of every export format
+EXPORT_FORMATS = {
+    'csv': ('text/csv', stream_csv),
+    'ndjson': ('application/x-ndjson', stream_ndjson),
+}
@@ -0,0 +1,69 @@
+"""
+Filtersets for the tracking API views
+"""
+from django_filters import rest_framework as filters
+from rest_framework.exceptions import PermissionDenied
+
+from tracking.selectors import get_timelog_model, reaches_archive
+
+
+class TimelogFilterSet(filters.FilterSet):
+    """
+    Filter logs by contract, project, user, exact date or a range of dates
+    (both ends inclusive). Every filter compares a column with a value, so
+    that a month or a week is read as a range of the date indexes and only
+    the matching rows are touched. No model is set, so that the same filters
+    apply to the Timelog table and the CombinedTimelog view
+    """
+
+    contract = filters.NumberFilter(field_name='contract_id')
+    date = filters.DateFilter(field_name='date')
+    date_after = filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_before = filters.DateFilter(field_name='date', lookup_expr='lte')
+    project = filters.NumberFilter(field_name='contract__project_id')
+    user = filters.NumberFilter(field_name='contract__user_id', method='filter_user')
+
+    def filter_user(self, queryset, name, value):
+        """
+        Filter the logs of a user. Only admins can filter by other users
+        """
+        request = self.request
+        if request is not None and not request.user.is_staff and value != request.user.id:
+            raise PermissionDenied('You can only view your own logs')
+        return queryset.filter(**{name: value})
+
+
+class TimelogListingFilterSet(TimelogFilterSet):
+    """
+    Filter the listings of the logs like the logs themselves, on the owner
+    and project columns of the listing
+    """
+
+    project = filters.NumberFilter(field_name='project_id')
+    user = filters.NumberFilter(field_name='user_id', method='filter_user')
+
+
+def filters_reach_archive(data, archive_by_default=False):
+    """
+    Return whether the logs selected by the filters of the TimelogFilterSet
+    in the given query params may be archived, so that the archive has to
+    be read as well
+
+    Args:
+        data (QueryDict): The query params
+        archive_by_default (bool): Whether to read the archive when no date
+            is filtered on
+
+    Returns:
+        bool: True if the logs have to be read from the archive as well
+    """
+    form = TimelogFilterSet(data, queryset=get_timelog_model().objects.none()).form
+    if not form.is_valid():
+        # The filterset rejects the request before anything is read
+        return False
+
+    dates = [form.cleaned_data.get(name) for name in ('date', 'date_after', 'date_before')]
+    if not any(dates) and not archive_by_default:
+        return False
+    first_dates = [date for date in dates[:2] if date]
+    return reaches_archive(max(first_dates) if first_dates else None)
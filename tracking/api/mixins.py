@@ -1,10 +1,24 @@
 """
 Mixins for the tracking API views
 """
+import hashlib
+
+from django.utils.cache import get_conditional_response
 from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.status import HTTP_201_CREATED
 
+from tracking.versions import PROJECTS, get_version_key, get_versions
+
+from .filters import (TimelogFilterSet, TimelogListingFilterSet,
+                      filters_reach_archive)
+from .renderers import FastJSONRenderer
+from .reports import get_report_params
+from .rows import get_row_mapper
+from .serializers import ReportQuerySerializer, TimelogListingSerializer
+
 
 class ReadWriteSerializerMixin:
     """
@@ -40,3 +54,162 @@ class PostRequestMixin:
         serializer.save()
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=HTTP_201_CREATED, headers=headers)
+
+
+class ReportAPIViewMixin:
+    """
+    Validate the query params of a report and scope it to the requesting
+    user. Admins can report on any user, everyone else only on themselves
+    """
+
+    query_serializer = ReportQuerySerializer
+
+    def get_report_params(self):
+        """
+        Return the validated query params with `user` set to the user the
+        report is allowed to cover, or None for all the users
+        """
+        return get_report_params(
+            self.query_serializer, self.request.query_params, self.request.user
+        )
+
+
+class ConditionalGetMixin:
+    """
+    Give GET responses a strong ETag built from the versions of the data
+    they show, and answer a matching If-None-Match with 304 Not Modified
+    before any queryset is evaluated. The versions are read before the data
+    and from the same database, the replica of the request if it has one,
+    so that an ETag is never newer than the data it tags. Inheriting class
+    must contain a `version_resources` attribute naming the resources in
+    `tracking.versions` the response is built from
+    """
+
+    version_resources = ()
+
+    def get_version_user_id(self):
+        """
+        Return the id of the user whose objects are shown, or None if the
+        objects of all the users are shown
+        """
+        if 'user_id' in self.kwargs:
+            return self.kwargs['user_id']
+        if self.request.user.is_staff:
+            return None
+        return self.request.user.id
+
+    def get_etag(self):
+        """
+        Return the ETag of the response to the current request
+        """
+        user_id = self.get_version_user_id()
+        versions = get_versions([
+            # Every user sees all the projects
+            get_version_key(resource, None if resource == PROJECTS else user_id)
+            for resource in self.version_resources
+        ])
+        request = self.request
+        digest = hashlib.sha1(repr((
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', ''),
+            request.user.id,
+            request.user.is_staff,
+            versions,
+        )).encode()).hexdigest()
+        return f'"{digest}"'
+
+    def get(self, request, *args, **kwargs):
+        """
+        Answer with 304 if the client has the current version, otherwise
+        build the response as usual and tag it
+        """
+        # Read the versions first, so that a write made while the response
+        # is built changes the ETag the next time
+        etag = self.get_etag()
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+        return response
+
+
+class ValuesListMixin:
+    """
+    List the objects from `.values()` rows with the compiled row mapper of
+    the read serializer instead of instantiating it, and render JSON with
+    orjson. The response has the same bytes as the serializer would give.
+    The pagination ordering must only use fields the serializer shows
+    """
+
+    renderer_classes = [
+        FastJSONRenderer if renderer is JSONRenderer else renderer
+        for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+    ]
+
+    def list(self, request, *args, **kwargs):
+        """
+        List a page of rows shaped like the read serializer output
+        """
+        columns, to_representation = get_row_mapper(self.get_serializer_class())
+        queryset = self.filter_queryset(self.get_queryset()).values(*columns)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response([to_representation(row) for row in page])
+        return Response([to_representation(row) for row in queryset])
+
+
+class TimelogArchiveMixin:
+    """
+    Read the archived logs as well when the requested dates reach into the
+    archived periods. Without any date filter only the logs in the Timelog
+    table are read, unless `archive_by_default` is set. See
+    `filters_reach_archive`
+    """
+
+    archive_by_default = False
+
+    def reads_archive(self):
+        """
+        Return whether the logs have to be read from the archive as well
+        """
+        if not hasattr(self, '_reads_archive'):
+            self._reads_archive = filters_reach_archive(
+                self.request.query_params, self.archive_by_default
+            )
+        return self._reads_archive
+
+
+class TimelogListingMixin(TimelogArchiveMixin):
+    """
+    List the logs from the TimelogListing table, with the serializer and
+    filters of the listings, unless the archived logs have to be read as
+    well. Inheriting class must return the listings from `get_queryset`
+    when `reads_listing` is true
+    """
+
+    def reads_listing(self):
+        """
+        Return whether the logs are listed from the TimelogListing table
+        """
+        return self.request.method in SAFE_METHODS and not self.reads_archive()
+
+    @property
+    def filterset_class(self):
+        """
+        Filter the listings or the logs
+        """
+        if self.reads_listing():
+            return TimelogListingFilterSet
+        return TimelogFilterSet
+
+    def get_serializer_class(self):
+        """
+        Show the listings like the logs they list
+        """
+        if self.reads_listing():
+            return TimelogListingSerializer
+        return super().get_serializer_class()
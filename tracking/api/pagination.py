@@ -0,0 +1,158 @@
+"""
+Paginators for the tracking API views
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination that seeks on the full ordering key instead of
+    combining the first ordering field with an offset. Every page is one
+    indexed range read of `page_size + 1` rows, whatever its depth, and no
+    count query is run. Inheriting classes must set `ordering` to a tuple of
+    fields that is unique per row, e.g. ending with the primary key.
+    """
+
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return a single page of results for the cursor in the request
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.fields = [
+            (field.lstrip('-'), field.startswith('-')) for field in self.ordering
+        ]
+        position, self.reverse = self.decode_cursor(request)
+
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.get_keyset_filter(position, self.reverse))
+            except (ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        order_by = [
+            f'{"-" if descending != self.reverse else ""}{field}'
+            for field, descending in self.fields
+        ]
+        results = list(queryset.order_by(*order_by)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+
+        if self.reverse:
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        if self.page:
+            self.next_position = self.get_position(self.page[-1])
+            self.previous_position = self.get_position(self.page[0])
+        else:
+            # Walked off the end of the results, point both links back at
+            # the cursor we were given
+            self.next_position = self.previous_position = position
+
+        if self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_keyset_filter(self, position, reverse):
+        """
+        Build the predicate selecting the rows that come after `position`
+        in the ordering, or before it when paginating in reverse, i.e.
+        `(a > x) OR (a = x AND b > y) ...` with the comparisons flipped for
+        descending fields
+        """
+        clauses = []
+        for index, (field, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending != reverse else 'gt'
+            equal = {
+                prior_field: prior_value
+                for (prior_field, _), prior_value in zip(self.fields[:index], position)
+            }
+            clauses.append(Q(**equal, **{f'{field}__{lookup}': position[index]}))
+        return reduce(or_, clauses)
+
+    def get_position(self, item):
+        """
+        Return the ordering key of the given row, which may be a model
+        instance or a `.values()` dict
+        """
+        if isinstance(item, dict):
+            return [str(item[field]) for field, _ in self.fields]
+        return [str(getattr(item, field)) for field, _ in self.fields]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor((self.next_position, False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor((self.previous_position, True))
+
+    def decode_cursor(self, request):
+        """
+        Return the `(position, reverse)` pair encoded in the request cursor
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            position, reverse = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError, UnicodeError, BinasciiError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if (
+                not isinstance(position, list)
+                or len(position) != len(self.fields)
+                or not all(isinstance(value, str) for value in position)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(reverse)
+
+    def encode_cursor(self, cursor):
+        """
+        Return the url for the given `(position, reverse)` cursor
+        """
+        encoded = urlsafe_b64encode(
+            json.dumps(cursor, separators=(',', ':')).encode('ascii')
+        ).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+
+class TimelogPagination(KeysetPagination):
+    """
+    Paginate timelogs newest first
+    """
+
+    ordering = ('-date', '-id')
+
+
+class ContractPagination(KeysetPagination):
+    """
+    Paginate contracts in creation order
+    """
+
+    ordering = ('id',)
@@ -4,10 +4,22 @@ Any custom permissions for the tracking api
 from rest_framework import permissions
 
 
+def get_owner_id(obj):
+    """
+    Return the id of the user owning the object, without loading anything.
+    Objects are either annotated with an `owner_id` by their selector, like
+    the Timelogs, or have a `user_id` column, like the Contracts
+    """
+    owner_id = getattr(obj, 'owner_id', None)
+    if owner_id is None:
+        owner_id = obj.user_id
+    return owner_id
+
+
 class IsAdminOrOwner(permissions.BasePermission):
     """
     Object-level permission to only allow owners of an object to edit it.
-    Assumes the model instance has an `owner` attribute.
+    Owners are compared by id, see `get_owner_id`
     """
 
     def has_permission(self, request, view):
@@ -23,4 +35,4 @@ class IsAdminOrOwner(permissions.BasePermission):
         return True
 
     def has_object_permission(self, request, view, obj):
-        return (obj.user == request.user) or request.user.is_staff
+        return request.user.is_staff or get_owner_id(obj) == request.user.id
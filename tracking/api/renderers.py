@@ -0,0 +1,42 @@
+"""
+Renderers for the tracking app apis
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+# Line and paragraph separators are valid in JSON but not in javascript
+# strings, DRF escapes them and so must we
+JS_ESCAPES = (
+    ('\u2028'.encode(), b'\\u2028'),
+    ('\u2029'.encode(), b'\\u2029'),
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson, which outputs the same bytes as DRF
+    for the compact, non-ASCII-escaped JSON of the default settings as long
+    as the data holds no floats, whose exponents it writes differently.
+    Falls back to DRF for indented output, other settings or data orjson
+    cannot encode, e.g. Decimals, lazy strings or huge integers
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render `data` into JSON, returning a bytestring
+        """
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        for character, escaped in JS_ESCAPES:
+            ret = ret.replace(character, escaped)
+        return ret
@@ -0,0 +1,83 @@
+"""
+Reports of the tracking API, computed from their validated query params.
+The report views compute them inline, the report jobs in the background
+"""
+from rest_framework.exceptions import PermissionDenied
+
+from tracking.earnings import get_earnings
+from tracking.selectors import get_hours_report
+
+from .serializers import EarningsReportRowSerializer, HoursReportRowSerializer
+
+
+def get_report_params(query_serializer, data, user):
+    """
+    Validate the query params of a report and scope it to the user asking
+    for it. Admins can report on any user, everyone else only on themselves
+
+    Args:
+        query_serializer (type): Serializer class validating the params
+        data (dict): The query params
+        user (User): User asking for the report
+
+    Returns:
+        dict: The validated params with `user` set to the user the report is
+        allowed to cover, or None for all the users
+
+    Raises:
+        ValidationError: If the params are invalid
+        PermissionDenied: If the user asks for the report of another user
+    """
+    serializer = query_serializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+
+    if not user.is_staff:
+        if params.get('user', user.id) != user.id:
+            raise PermissionDenied('You can only view your own reports')
+        params['user'] = user.id
+    return params
+
+
+def get_hours_report_results(params):
+    """
+    Compute the hours report in the database
+
+    Args:
+        params (dict): Params from `get_report_params`
+
+    Returns:
+        list: The serialized row of every group and period
+    """
+    rows = get_hours_report(
+        params['date_after'],
+        params['date_before'],
+        params['group_by'],
+        period=params.get('period'),
+        user_id=params.get('user'),
+        project_id=params.get('project'),
+        contract_id=params.get('contract'),
+    )
+    return HoursReportRowSerializer(rows, many=True).data
+
+
+def get_earnings_report_results(params):
+    """
+    Compute the earnings report in the database
+
+    Args:
+        params (dict): Params from `get_report_params`
+
+    Returns:
+        list: The serialized row of every group, currency and month
+    """
+    rows = get_earnings(
+        params['date_after'],
+        params['date_before'],
+        params['group_by'],
+        by_month=params.get('period') == 'month',
+        user_id=params.get('user'),
+        project_id=params.get('project'),
+        contract_id=params.get('contract'),
+    )
+    return EarningsReportRowSerializer(rows, many=True).data
@@ -0,0 +1,91 @@
+"""
+Fast path for serializing the rows of large list pages.
+
+A read serializer is compiled once into the `.values()` columns it reads
+and a function building its representation from a row of those columns.
+The representation is the same as the serializer's, key for key and in the
+same order, since every value still goes through the `to_representation` of
+its serializer field. What is skipped is instantiating the serializers, the
+model instances and the djmoney Money objects for every row.
+"""
+from functools import lru_cache
+from operator import itemgetter
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.relations import (ManyRelatedField, PrimaryKeyRelatedField,
+                                      RelatedField)
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+@lru_cache(maxsize=None)
+def get_row_mapper(serializer_class):
+    """
+    Compile the given read serializer for rows of `.values()` dicts
+
+    Args:
+        serializer_class (class): A serializer of model fields, primary keys
+            of related objects and serializers nested for relations that
+            cannot be null or on the object itself
+
+    Returns:
+        tuple: The columns to pass to `.values()`, and a function returning
+        the representation of a row of them
+    """
+    columns = []
+    to_representation = _compile(serializer_class(), '', columns)
+    return tuple(columns), to_representation
+
+
+def _compile(serializer, prefix, columns):
+    """
+    Return a function building the representation of the serializer from a
+    row, adding the columns it reads to the given list
+    """
+    readers = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, BaseSerializer) and field.source == '*':
+            # A serializer nested on the object itself reads the same row
+            readers.append((name, _compile(field, prefix, columns)))
+            continue
+        if (
+                isinstance(field, (ListSerializer, ManyRelatedField))
+                or isinstance(field, RelatedField) and not isinstance(field, PrimaryKeyRelatedField)
+                or field.source == '*'
+        ):
+            raise ImproperlyConfigured(
+                f'{type(serializer).__name__}.{name} cannot be read from rows'
+            )
+
+        column = prefix + '__'.join(field.source_attrs)
+        if isinstance(field, BaseSerializer):
+            readers.append((name, _compile(field, f'{column}__', columns)))
+        else:
+            columns.append(column)
+            readers.append((name, _read_column(column, field)))
+
+    def to_representation(row):
+        return {name: read(row) for name, read in readers}
+
+    return to_representation
+
+
+def _read_column(column, field):
+    """
+    Return a function reading the representation of the field from its
+    column of a row
+    """
+    if isinstance(field, PrimaryKeyRelatedField):
+        # The column of a relation holds the primary key itself
+        if field.pk_field is None:
+            return itemgetter(column)
+        convert = field.pk_field.to_representation
+    else:
+        convert = field.to_representation
+
+    def read(row):
+        value = row[column]
+        return None if value is None else convert(value)
+
+    return read
@@ -1,11 +1,52 @@
 """
 Serializer for the tracking app
 """
+from django.db import IntegrityError
 from rest_framework import serializers
 
-from tracking.models import Contract, Project, Timelog
+from tracking.models import Contract, Project, Timelog, TimelogListing
+from tracking.selectors import (REPORT_GROUPS, REPORT_PERIODS,
+                                get_archive_cutoff, get_archived_until,
+                                get_existing_timelog_keys,
+                                get_timelog_contract)
+from tracking.services import bulk_create_timelogs, get_contract_owners
 from users.models import User
 
+from .exports import EXPORT_FORMATS
+from .permissions import get_owner_id
+
+TIMELOG_EXISTS_ERROR = {
+    'non_field_errors': ['Log for this contract already exists for the given date']
+}
+
+
+def get_archived_date_error(date, archived_until):
+    """
+    Return the error for a log written on the given date, if that date is
+    in the archived periods
+    """
+    if archived_until is not None and date <= archived_until:
+        return f'Logs up to {archived_until} are archived and can no longer be written.'
+    return None
+
+
+class NotArchivedDateMixin:
+    """
+    Refuse logs dated in the archived periods, which are read only. Logs
+    from the archive cutoff on are never archived, so only the older dates
+    are compared with the latest archived log
+    """
+
+    def validate_date(self, value):
+        """
+        Check that the date is after the latest archived log
+        """
+        if value < get_archive_cutoff():
+            error = get_archived_date_error(value, get_archived_until())
+            if error:
+                raise serializers.ValidationError(error)
+        return value
+
 
 class ProjectSerializer(serializers.ModelSerializer):
     """
@@ -79,30 +120,179 @@ class ContractWriteSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
-class TimelogWriteSerializer(serializers.ModelSerializer):
+class TimelogWriteSerializer(NotArchivedDateMixin, serializers.ModelSerializer):
     """
-    Serializer for the writing a Timelog
+    Serializer for the writing a Timelog. The ownership of the contract and
+    the (contract, date) conflict are checked with a single query, and the
+    unique constraint catches the logs created in the meantime. A contract
+    that is sent must belong to the requesting user, admins included, while
+    a log updated without one keeps the contract of its owner
     """
 
+    contract = serializers.IntegerField(source='contract_id')
+
     class Meta:
         model = Timelog
         fields = ('date', 'contract', 'hours_worked')
-        validators = [
-            serializers.UniqueTogetherValidator(
-                queryset=model.objects.all(),
-                fields=('contract', 'date'),
-                message='Log for this contract already exists for the given date'
+
+    def get_owner_id(self, attrs):
+        """
+        Return the id of the user the contract must belong to
+        """
+        if 'contract_id' in attrs:
+            return self.context['request'].user.id
+        return get_owner_id(self.instance)
+
+    def validate(self, attrs):
+        """
+        Check that the contract belongs to the owner and has no other log on
+        the date, unless no contract is sent and the date does not change
+        """
+        contract_id = attrs.get('contract_id', getattr(self.instance, 'contract_id', None))
+        date = attrs.get('date', getattr(self.instance, 'date', None))
+        if (
+                self.instance is not None and 'contract_id' not in attrs
+                and date == self.instance.date
+        ):
+            return attrs
+
+        owner_id = self.get_owner_id(attrs)
+        contract = get_timelog_contract(
+            contract_id,
+            owner_id,
+            date,
+            exclude_timelog_id=getattr(self.instance, 'id', None)
+        )
+        if contract is None:
+            raise serializers.ValidationError({'contract': ['Invalid contract for this user.']})
+
+        project_id, has_log = contract
+        if has_log:
+            raise serializers.ValidationError(TIMELOG_EXISTS_ERROR)
+
+        self.contract_owner = (owner_id, project_id)
+        return attrs
+
+    def create(self, validated_data):
+        """
+        Insert the log, reporting a log created for the same date since it
+        was validated like any other conflict
+        """
+        return self.save_timelog(Timelog(**validated_data))
+
+    def update(self, instance, validated_data):
+        """
+        Update the log, reporting a conflict like on creation
+        """
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        return self.save_timelog(instance)
+
+    def save_timelog(self, timelog):
+        """
+        Save the log, passing the owner of its contract on to the rollups
+        """
+        timelog._contract_owner = getattr(self, 'contract_owner', None)
+        try:
+            timelog.save()
+        except IntegrityError:
+            raise serializers.ValidationError(TIMELOG_EXISTS_ERROR)
+        return timelog
+
+
+class TimelogBulkListSerializer(serializers.ListSerializer):
+    """
+    Validate a list of new Timelogs with a fixed number of queries and
+    create them in one go. The owner of the contracts is passed in the
+    `owner_id` context key
+    """
+
+    max_items = 500
+
+    def to_internal_value(self, data):
+        """
+        Validate every entry on its own, then check the contract ownership and
+        the (contract, date) conflicts of all the entries together. Errors are
+        reported per entry, in the order of the entries
+        """
+        if isinstance(data, list) and len(data) > self.max_items:
+            raise serializers.ValidationError(
+                {'non_field_errors': [f'Submit at most {self.max_items} logs at once.']}
             )
-        ]
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        request = self.context.get('request')
-        user_contracts = Contract.objects.filter(user=request.user)
-        self.fields['contract'] = serializers.PrimaryKeyRelatedField(
-            required=True,
-            queryset=user_contracts
+        entries = super().to_internal_value(data)
+        if not entries:
+            raise serializers.ValidationError(
+                {'non_field_errors': ['Submit at least one log.']}
+            )
+
+        owners = get_contract_owners(
+            {entry['contract_id'] for entry in entries},
+            user_id=self.context['owner_id']
         )
+        existing = get_existing_timelog_keys(
+            (entry['contract_id'], entry['date'])
+            for entry in entries if entry['contract_id'] in owners
+        )
+        cutoff = get_archive_cutoff()
+        archived_until = None
+        if any(entry['date'] < cutoff for entry in entries):
+            archived_until = get_archived_until()
+
+        errors, seen = [], set()
+        for entry in entries:
+            key = (entry['contract_id'], entry['date'])
+            archived_date_error = get_archived_date_error(entry['date'], archived_until)
+            if archived_date_error:
+                errors.append({'date': [archived_date_error]})
+            elif entry['contract_id'] not in owners:
+                errors.append({'contract': ['Invalid contract for this user.']})
+            elif key in existing or key in seen:
+                errors.append(TIMELOG_EXISTS_ERROR)
+            else:
+                errors.append({})
+            seen.add(key)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        self.contract_owners = owners
+        return entries
+
+    def create(self, validated_data):
+        """
+        Insert all the entries in a single transaction
+        """
+        return bulk_create_timelogs(validated_data, self.contract_owners)
+
+
+class TimelogBulkWriteSerializer(serializers.ModelSerializer):
+    """
+    Serializer for an entry of a bulk Timelog submission. Contracts are
+    validated for the whole submission by the list serializer
+    """
+
+    contract = serializers.IntegerField(source='contract_id')
+
+    class Meta:
+        model = Timelog
+        fields = ('id', 'date', 'contract', 'hours_worked')
+        read_only_fields = ('id',)
+        list_serializer_class = TimelogBulkListSerializer
+
+
+class TimelogUpsertSerializer(NotArchivedDateMixin, serializers.ModelSerializer):
+    """
+    Serializer for the log of a contract on a date, created or updated in
+    place. The contract and the date are taken from the url
+    """
+
+    contract = serializers.IntegerField(source='contract_id')
+
+    class Meta:
+        model = Timelog
+        fields = ('id', 'date', 'contract', 'hours_worked')
+        read_only_fields = ('id',)
 
 
 class TimelogReadSerializer(serializers.ModelSerializer):
@@ -115,3 +305,114 @@ class TimelogReadSerializer(serializers.ModelSerializer):
     class Meta:
         model = Timelog
         fields = ('id', 'date', 'hours_worked', 'contract')
+
+
+class ListedProjectSerializer(serializers.ModelSerializer):
+    """
+    Serializer for displaying the project of a TimelogListing like the
+    ProjectSerializer
+    """
+
+    id = serializers.IntegerField(source='project_id')
+    name = serializers.CharField(source='project_name')
+
+    class Meta:
+        model = TimelogListing
+        fields = ('id', 'name')
+
+
+class ListedContractSerializer(serializers.ModelSerializer):
+    """
+    Serializer for displaying the contract of a TimelogListing like the
+    ContractReadSerializer
+    """
+
+    id = serializers.IntegerField(source='contract_id')
+    user = serializers.IntegerField(source='user_id')
+    project = ListedProjectSerializer(source='*')
+
+    class Meta:
+        model = TimelogListing
+        fields = ('id', 'user', 'project', 'hourly_price')
+
+
+class TimelogListingSerializer(serializers.ModelSerializer):
+    """
+    Serializer for displaying a TimelogListing exactly like the
+    TimelogReadSerializer displays its Timelog
+    """
+
+    contract = ListedContractSerializer(source='*')
+
+    class Meta:
+        model = TimelogListing
+        fields = ('id', 'date', 'hours_worked', 'contract')
+
+
+class ReportQuerySerializer(serializers.Serializer):
+    """
+    Serializer for validating the query params of a report
+    """
+
+    date_after = serializers.DateField()
+    date_before = serializers.DateField()
+    group_by = serializers.ChoiceField(choices=list(REPORT_GROUPS))
+    period = serializers.ChoiceField(choices=list(REPORT_PERIODS), required=False)
+    user = serializers.IntegerField(required=False)
+    project = serializers.IntegerField(required=False)
+    contract = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        """
+        Check that the date range is not reversed
+        """
+        if attrs['date_after'] > attrs['date_before']:
+            raise serializers.ValidationError(
+                {'date_before': 'Must not be before date_after.'}
+            )
+        return attrs
+
+
+class TimelogExportQuerySerializer(serializers.Serializer):
+    """
+    Serializer for validating the format of a timelog export. The filters
+    are validated by the filterset of the view
+    """
+
+    file_format = serializers.ChoiceField(choices=list(EXPORT_FORMATS), default='csv')
+
+
+class HoursReportRowSerializer(serializers.Serializer):
+    """
+    Serializer for displaying a row of the hours report. Only the group
+    requested in the report is present in a row
+    """
+
+    period = serializers.DateField(required=False)
+    user = serializers.IntegerField(required=False)
+    project = serializers.IntegerField(required=False)
+    contract = serializers.IntegerField(required=False)
+    total_hours = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class EarningsReportQuerySerializer(ReportQuerySerializer):
+    """
+    Serializer for validating the query params of an earnings report, which
+    can only be bucketed by month
+    """
+
+    period = serializers.ChoiceField(choices=['month'], required=False)
+
+
+class EarningsReportRowSerializer(serializers.Serializer):
+    """
+    Serializer for displaying a row of the earnings report. Only the group
+    requested in the report is present in a row
+    """
+
+    period = serializers.DateField(required=False)
+    user = serializers.IntegerField(required=False)
+    project = serializers.IntegerField(required=False)
+    contract = serializers.IntegerField(required=False)
+    currency = serializers.CharField()
+    amount = serializers.DecimalField(max_digits=24, decimal_places=2)
@@ -0,0 +1,108 @@
+"""
+The reports and exports of the tracking API as background jobs. Their params
+are validated like the query params of the report and export views when the
+job is submitted, and stored scoped to the user who submitted it
+"""
+import tempfile
+
+from django.core.files import File
+from rest_framework.exceptions import ValidationError
+
+from jobs.registry import register_job
+from jobs.services import raise_if_cancelled, save_job_result_file
+from tracking.selectors import (get_timelog_export_rows, get_timelog_model,
+                                get_timelogs, get_timelogs_for_user)
+
+from .exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS
+from .filters import TimelogFilterSet, filters_reach_archive
+from .reports import (get_earnings_report_results, get_hours_report_results,
+                      get_report_params)
+from .serializers import (EarningsReportQuerySerializer, ReportQuerySerializer,
+                          TimelogExportQuerySerializer)
+
+
+def validate_report(query_serializer):
+    """
+    Return the validator of the params of a report job, which scopes the
+    report to the user submitting it
+    """
+    def validate(data, request):
+        params = get_report_params(query_serializer, data, request.user)
+        return {
+            name: value
+            for name, value in query_serializer(params).data.items()
+            if value is not None
+        }
+    return validate
+
+
+def get_stored_report_params(query_serializer, job):
+    """
+    Return the params of a report job, validated again to be read like the
+    query params of the report views
+    """
+    serializer = query_serializer(data=job.params)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+@register_job('hours_report', validate_report(ReportQuerySerializer))
+def run_hours_report(job):
+    """
+    Compute the hours report of the job
+    """
+    params = get_stored_report_params(ReportQuerySerializer, job)
+    return {'results': get_hours_report_results(params)}
+
+
+@register_job('earnings_report', validate_report(EarningsReportQuerySerializer))
+def run_earnings_report(job):
+    """
+    Compute the earnings report of the job
+    """
+    params = get_stored_report_params(EarningsReportQuerySerializer, job)
+    return {'results': get_earnings_report_results(params)}
+
+
+def validate_export(data, request):
+    """
+    Validate the format and the filters of an export job. Only admins can
+    export the logs of other users
+    """
+    query = TimelogExportQuerySerializer(data=data)
+    query.is_valid(raise_exception=True)
+
+    filterset = TimelogFilterSet(
+        data, queryset=get_timelog_model().objects.none(), request=request
+    )
+    if not filterset.is_valid():
+        raise ValidationError(filterset.errors)
+    # Check the user filter, which only runs on the queryset
+    filterset.filter_queryset(filterset.queryset)
+
+    filters = {name: data[name] for name in filterset.filters if name in data}
+    return {**filters, 'file_format': query.validated_data['file_format']}
+
+
+@register_job('timelog_export', validate_export)
+def run_timelog_export(job):
+    """
+    Write the filtered logs of the job to its result file, oldest first,
+    stopping between chunks if the job is cancelled
+    """
+    file_format = job.params['file_format']
+    content_type, stream = EXPORT_FORMATS[file_format]
+
+    include_archive = filters_reach_archive(job.params, archive_by_default=True)
+    if job.user.is_staff:
+        timelogs = get_timelogs(include_archive)
+    else:
+        timelogs = get_timelogs_for_user(job.user_id, include_archive)
+    rows = get_timelog_export_rows(TimelogFilterSet(job.params, queryset=timelogs).qs)
+
+    name = f'timelogs-{job.id}.{file_format}'
+    with tempfile.TemporaryFile() as output:
+        for chunk in stream(rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)):
+            raise_if_cancelled(job)
+            output.write(chunk.encode())
+        save_job_result_file(job, name, File(output, name=name), content_type)
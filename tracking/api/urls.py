@@ -7,6 +7,11 @@ from tracking.api import views
 
 urlpatterns = [
     path('projects/', views.ProjectListCreateAPIView.as_view(), name='project_list'),
+    path(
+        'projects/cache/',
+        views.ProjectCacheStatsAPIView.as_view(),
+        name='project_cache_stats'
+    ),
     path(
         'projects/<int:pk>/',
          views.ProjectRetrieveUpdateDestroyAPIView.as_view(),
@@ -26,6 +31,7 @@ urlpatterns = [
     ),
 
     path('logs/', views.TimelogListAPIView.as_view(), name='timelog_list'),
+    path('logs/export/', views.TimelogExportAPIView.as_view(), name='timelog_export'),
     path(
         'logs/<int:pk>/',
         views.TimelogRetrieveUpdateDestroyAPIView.as_view(),
@@ -36,5 +42,22 @@ urlpatterns = [
         views.UserTimelogListCreateAPIView.as_view(),
         name='timelog_list_for_user'
     ),
+    path(
+        'users/<int:user_id>/contracts/<int:contract_id>/logs/<str:date>/',
+        views.UserTimelogUpsertAPIView.as_view(),
+        name='timelog_upsert_for_user'
+    ),
+    path(
+        'users/<int:user_id>/logs/bulk/',
+        views.UserTimelogBulkCreateAPIView.as_view(),
+        name='timelog_bulk_create_for_user'
+    ),
+
+    path('reports/hours/', views.HoursReportAPIView.as_view(), name='hours_report'),
+    path(
+        'reports/earnings/',
+        views.EarningsReportAPIView.as_view(),
+        name='earnings_report'
+    ),
 
 ]
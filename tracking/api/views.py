@@ -1,30 +1,59 @@
 """
 Views for the tracking app apis
 """
-from rest_framework.generics import (ListAPIView, ListCreateAPIView,
+from django.db import IntegrityError
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import (GenericAPIView, ListAPIView,
+                                     ListCreateAPIView,
                                      RetrieveUpdateDestroyAPIView)
 from rest_framework.permissions import (SAFE_METHODS, IsAdminUser,
                                         IsAuthenticated)
-
-from tracking.models import Contract, Project, Timelog
-from tracking.selectors import get_contracts_for_user, get_timelogs_for_user
-
-from .mixins import PostRequestMixin, ReadWriteSerializerMixin
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK, HTTP_201_CREATED
+from rest_framework.views import APIView
+
+from time_tracking_system.instrumentation import ServerTimingMixin
+from tracking.catalogue import (get_cached, get_catalogue_stats,
+                                get_detail_key, get_list_key)
+from tracking.selectors import (get_contracts, get_contracts_for_user,
+                                get_projects, get_timelog_export_rows,
+                                get_timelog_listings,
+                                get_timelog_listings_for_user, get_timelogs,
+                                get_timelogs_for_user)
+from tracking.services import upsert_timelog
+from tracking.versions import CONTRACTS, PROJECTS, TIMELOGS
+
+from .exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS
+from .filters import TimelogFilterSet
+from .mixins import (ConditionalGetMixin, PostRequestMixin,
+                     ReadWriteSerializerMixin, ReportAPIViewMixin,
+                     TimelogArchiveMixin, TimelogListingMixin, ValuesListMixin)
+from .pagination import ContractPagination, TimelogPagination
 from .permissions import IsAdminOrOwner
+from .reports import get_earnings_report_results, get_hours_report_results
 from .serializers import (ContractReadSerializer, ContractWriteSerializer,
-                          ProjectSerializer, TimelogReadSerializer,
-                          TimelogWriteSerializer)
+                          EarningsReportQuerySerializer, ProjectSerializer,
+                          TimelogBulkWriteSerializer,
+                          TimelogExportQuerySerializer, TimelogReadSerializer,
+                          TimelogUpsertSerializer, TimelogWriteSerializer)
 
 
-class ProjectListCreateAPIView(ListCreateAPIView):
+class ProjectListCreateAPIView(ServerTimingMixin, ConditionalGetMixin, ListCreateAPIView):
     """
     Allow authenticated users to GET all projects. Allow only admins to
     create new Projects.
     """
 
-    queryset = Project.objects.all()
+    version_resources = (PROJECTS,)
     serializer_class = ProjectSerializer
 
+    def get_queryset(self):
+        """
+        Show all the projects
+        """
+        return get_projects()
+
     def get_permissions(self):
         """
         Allow only admins to add new Projects
@@ -34,17 +63,38 @@ class ProjectListCreateAPIView(ListCreateAPIView):
 
         return [IsAuthenticated()]
 
+    def list(self, request, *args, **kwargs):
+        """
+        Serve the page from the project catalogue, serializing it only when
+        it is not cached
+        """
+        data = get_cached(
+            get_list_key(request.build_absolute_uri()),
+            lambda: super(ProjectListCreateAPIView, self).list(request, *args, **kwargs).data
+        )
+        return Response(data)
+
 
-class ProjectRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
+class ProjectRetrieveUpdateDestroyAPIView(
+    ServerTimingMixin,
+    ConditionalGetMixin,
+    RetrieveUpdateDestroyAPIView
+):
     """
     Allow users to GET a single Project. Allows only admins
     to update or delete a project
     """
 
-    queryset = Project.objects.all()
+    version_resources = (PROJECTS,)
     serializer_class = ProjectSerializer
     permission_classes = (IsAdminUser,)
 
+    def get_queryset(self):
+        """
+        Show all the projects
+        """
+        return get_projects()
+
     def get_permissions(self):
         """
         Allow only admins to update/delete Projects
@@ -54,14 +104,48 @@ class ProjectRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
 
         return [IsAdminUser()]
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Serve the project from the project catalogue, loading it only when
+        it is not cached
+        """
+        data = get_cached(
+            get_detail_key(kwargs['pk']),
+            lambda: super(ProjectRetrieveUpdateDestroyAPIView, self).retrieve(
+                request, *args, **kwargs
+            ).data
+        )
+        return Response(data)
 
-class ContractListAPIView(ListAPIView):
+
+class ProjectCacheStatsAPIView(ServerTimingMixin, APIView):
+    """
+    Allow only admins to GET the hits and misses of the project catalogue
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        """
+        Return the counters of the project catalogue
+        """
+        return Response(get_catalogue_stats())
+
+
+class ContractListAPIView(
+    ServerTimingMixin,
+    ConditionalGetMixin,
+    ValuesListMixin,
+    ListAPIView
+):
     """
     APIView to list contracts
     """
 
+    version_resources = (CONTRACTS, PROJECTS)
     permission_classes = (IsAuthenticated,)
     serializer_class = ContractReadSerializer
+    pagination_class = ContractPagination
     filterset_fields = ['user', 'project']
 
     def get_queryset(self):
@@ -69,11 +153,14 @@ class ContractListAPIView(ListAPIView):
         Show all contracts for an admin and show the user specific contracts otherwise
         """
         if self.request.user.is_staff:
-            return Contract.objects.all()
+            return get_contracts()
         return get_contracts_for_user(self.request.user.id)
 
 
 class UserContractListCreateAPIView(
+    ServerTimingMixin,
+    ConditionalGetMixin,
+    ValuesListMixin,
     ReadWriteSerializerMixin,
     PostRequestMixin,
     ListCreateAPIView
@@ -83,9 +170,11 @@ class UserContractListCreateAPIView(
     user themselves or the admin
     """
 
+    version_resources = (CONTRACTS, PROJECTS)
     permission_classes = (IsAdminOrOwner,)
     read_serializer = ContractReadSerializer
     write_serializer = ContractWriteSerializer
+    pagination_class = ContractPagination
     filterset_fields = ['project']
 
     def get_serializer_data(self):
@@ -105,6 +194,8 @@ class UserContractListCreateAPIView(
 
 
 class ContractRetrieveUpdateDestroyAPIView(
+    ServerTimingMixin,
+    ConditionalGetMixin,
     ReadWriteSerializerMixin,
     RetrieveUpdateDestroyAPIView
 ):
@@ -113,8 +204,8 @@ class ContractRetrieveUpdateDestroyAPIView(
     that belongs to them. Admins have access to all the contracts.
     """
 
+    version_resources = (CONTRACTS, PROJECTS)
     permission_classes = (IsAdminOrOwner,)
-    model = Contract
     read_serializer = ContractReadSerializer
     write_serializer = ContractWriteSerializer
 
@@ -133,43 +224,102 @@ class ContractRetrieveUpdateDestroyAPIView(
         user is an admin, show all objects.
         """
         if self.request.user.is_staff:
-            return Contract.objects.all()
+            return get_contracts()
         return get_contracts_for_user(self.request.user.id)
 
 
-class TimelogListAPIView(ListAPIView):
+class TimelogListAPIView(
+    ServerTimingMixin,
+    ConditionalGetMixin,
+    ValuesListMixin,
+    TimelogListingMixin,
+    ListAPIView
+):
     """
-    APIView to list Timelogs
+    APIView to list Timelogs from their listings. The archived logs are only
+    listed for a date range reaching into the archived periods
     """
 
+    version_resources = (TIMELOGS, CONTRACTS, PROJECTS)
     permission_classes = (IsAuthenticated,)
     serializer_class = TimelogReadSerializer
-    queryset = Timelog.objects.all()
-    filterset_fields = ['contract', 'date']
+    pagination_class = TimelogPagination
 
     def get_queryset(self):
         """
         Show all logs of all users for an admin and show the user specific logs otherwise
         """
+        if self.reads_listing():
+            if self.request.user.is_staff:
+                return get_timelog_listings()
+            return get_timelog_listings_for_user(self.request.user.id)
+
+        include_archive = self.reads_archive()
         if self.request.user.is_staff:
-            return Timelog.objects.all()
-        return get_timelogs_for_user(self.request.user.id)
+            return get_timelogs(include_archive)
+        return get_timelogs_for_user(self.request.user.id, include_archive)
+
+
+class TimelogExportAPIView(ServerTimingMixin, TimelogArchiveMixin, GenericAPIView):
+    """
+    APIView to export all the filtered logs at once as CSV or NDJSON. The
+    rows are streamed from the database cursor as they are read. The
+    archived logs are exported too unless the date range starts after them
+    """
+
+    permission_classes = (IsAuthenticated,)
+    filterset_class = TimelogFilterSet
+    pagination_class = None
+    archive_by_default = True
+
+    def get_queryset(self):
+        """
+        Export all logs of all users for an admin and the user specific logs otherwise
+        """
+        include_archive = self.reads_archive()
+        if self.request.user.is_staff:
+            return get_timelogs(include_archive)
+        return get_timelogs_for_user(self.request.user.id, include_archive)
+
+    def get(self, request, *args, **kwargs):
+        """
+        Stream the logs in the requested format, oldest first
+        """
+        query = TimelogExportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        file_format = query.validated_data['file_format']
+        content_type, stream = EXPORT_FORMATS[file_format]
+
+        rows = get_timelog_export_rows(self.filter_queryset(self.get_queryset()))
+        response = StreamingHttpResponse(
+            stream(rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="timelogs.{file_format}"'
+        return response
 
 
 class UserTimelogListCreateAPIView(
+    ServerTimingMixin,
+    ConditionalGetMixin,
+    ValuesListMixin,
+    TimelogListingMixin,
     ReadWriteSerializerMixin,
     PostRequestMixin,
     ListCreateAPIView
 ):
     """
     List all the contracts for the given user id. Only accessible by the
-    user themselves or the admin
+    user themselves or the admin. The logs are listed from their listings,
+    and the archived logs only for a date range reaching into the archived
+    periods
     """
 
+    version_resources = (TIMELOGS, CONTRACTS, PROJECTS)
     permission_classes = (IsAdminOrOwner,)
     read_serializer = TimelogReadSerializer
     write_serializer = TimelogWriteSerializer
-    filterset_fields = ['contract', 'date']
+    pagination_class = TimelogPagination
 
     def get_serializer_data(self):
         """
@@ -184,10 +334,77 @@ class UserTimelogListCreateAPIView(
         """
         Filter to show only the given user id contracts
         """
-        return get_timelogs_for_user(self.kwargs['user_id'])
+        if self.reads_listing():
+            return get_timelog_listings_for_user(self.kwargs['user_id'])
+        return get_timelogs_for_user(self.kwargs['user_id'], self.reads_archive())
+
+
+class UserTimelogBulkCreateAPIView(ServerTimingMixin, GenericAPIView):
+    """
+    Create a list of logs for the given user id at once. Only accessible by
+    the user themselves or the admin. Nothing is created if any of the
+    entries is invalid, and the errors are listed per entry
+    """
+
+    permission_classes = (IsAdminOrOwner,)
+    serializer_class = TimelogBulkWriteSerializer
+
+    def get_serializer_context(self):
+        """
+        Validate the contracts against the user in the url
+        """
+        return {**super().get_serializer_context(), 'owner_id': self.kwargs['user_id']}
+
+    def post(self, request, *args, **kwargs):
+        """
+        Validate all the entries together and insert them in one transaction
+        """
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        try:
+            serializer.save()
+        except IntegrityError:
+            raise ValidationError({'non_field_errors': [
+                'Some of these logs were created at the same time by another request'
+            ]})
+        return Response(serializer.data, status=HTTP_201_CREATED)
+
+
+class UserTimelogUpsertAPIView(ServerTimingMixin, GenericAPIView):
+    """
+    Create or update the log of one of the contracts of the given user id on
+    the given date. Only accessible by the user themselves or the admin.
+    Sending the same request again leaves the log as it is
+    """
+
+    permission_classes = (IsAdminOrOwner,)
+    serializer_class = TimelogUpsertSerializer
+
+    def put(self, request, *args, **kwargs):
+        """
+        Insert the log or update its hours with a single statement, returning
+        201 if it was created and 200 if it was updated
+        """
+        data = request.data.copy()
+        data['contract'] = self.kwargs['contract_id']
+        data['date'] = self.kwargs['date']
+        serializer = self.get_serializer(data=data)
+        serializer.is_valid(raise_exception=True)
+
+        result = upsert_timelog(self.kwargs['user_id'], **serializer.validated_data)
+        if result is None:
+            raise ValidationError({'contract': ['Invalid contract for this user.']})
+
+        timelog_id, created = result
+        return Response(
+            {'id': timelog_id, **serializer.data},
+            status=HTTP_201_CREATED if created else HTTP_200_OK
+        )
 
 
 class TimelogRetrieveUpdateDestroyAPIView(
+    ServerTimingMixin,
+    ConditionalGetMixin,
     ReadWriteSerializerMixin,
     RetrieveUpdateDestroyAPIView
 ):
@@ -195,6 +412,7 @@ class TimelogRetrieveUpdateDestroyAPIView(
     APIView to get, update or delete a single timelog by ID
     """
 
+    version_resources = (TIMELOGS, CONTRACTS, PROJECTS)
     permission_classes = (IsAdminOrOwner,)
     read_serializer = TimelogReadSerializer
     write_serializer = TimelogWriteSerializer
@@ -205,5 +423,41 @@ class TimelogRetrieveUpdateDestroyAPIView(
         user is an admin, show all objects.
         """
         if self.request.user.is_staff:
-            return Timelog.objects.all()
+            return get_timelogs()
         return get_timelogs_for_user(self.request.user.id)
+
+
+class HoursReportAPIView(ServerTimingMixin, ReportAPIViewMixin, APIView):
+    """
+    APIView to total the hours worked over a date range grouped by user,
+    project or contract and optionally bucketed by day, week, month or quarter
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, *args, **kwargs):
+        """
+        Compute the report in the database and return one row per group
+        and period
+        """
+        params = self.get_report_params()
+        return Response({'results': get_hours_report_results(params)})
+
+
+class EarningsReportAPIView(ServerTimingMixin, ReportAPIViewMixin, APIView):
+    """
+    APIView to total the earnings (hours worked times the hourly price of
+    the contract) over a date range per currency, grouped by user, project
+    or contract and optionally bucketed by month
+    """
+
+    permission_classes = (IsAuthenticated,)
+    query_serializer = EarningsReportQuerySerializer
+
+    def get(self, request, *args, **kwargs):
+        """
+        Compute the report in the database and return one row per group,
+        currency and month
+        """
+        params = self.get_report_params()
+        return Response({'results': get_earnings_report_results(params)})
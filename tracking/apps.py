@@ -11,3 +11,11 @@ class TrackingConfig(AppConfig):
 
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tracking'
+
+    def ready(self):
+        """
+        Connect the signal receivers of the app and register its jobs
+        """
+        # pylint: disable=import-outside-toplevel,unused-import
+        from . import signals  # noqa: F401
+        from .api import tasks  # noqa: F401
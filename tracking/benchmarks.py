@@ -0,0 +1,616 @@
+"""
+Benchmarks of the API routes at production data volumes.
+
+The data is seeded with bulk inserts, then every route of the tracking, users
+and jobs APIs is requested through the Django test client while measuring its
+latency, number of queries and peak Python memory. Requests run in a
+transaction that is rolled back, so the writes can be repeated and leave
+the seeded data as it was.
+
+The throughput of the read routes under the WSGI and the ASGI deployments
+is compared by calling their handlers directly with many concurrent clients.
+
+Both run in a database of their own, see benchmark_database, so that the
+seeded data never ends up in the database the project is configured with.
+"""
+import asyncio
+import datetime
+import math
+import os
+import platform
+import random
+import statistics
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from decimal import Decimal
+from itertools import cycle, islice
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Max
+from django.test import Client, RequestFactory
+from django.test.utils import (CaptureQueriesContext, setup_databases,
+                               teardown_databases)
+from django.urls import get_resolver, reverse
+
+from jobs.models import Job
+from jobs.selectors import get_jobs_for_user
+from jobs.services import claim_next_job, run_job, submit_job
+from time_tracking_system.async_urls import ASYNC_ROUTES
+from time_tracking_system.async_views import AsyncReadsASGIHandler
+from tracking.earnings import invalidate_earnings
+from tracking.models import Contract, Project, Timelog
+from tracking.services import rebuild_hours_rollups, rebuild_timelog_listings
+from users.models import User
+from users.tokens import ClaimsRefreshToken
+
+# Url confs every route of which must be benchmarked
+BENCHMARKED_URLCONFS = ('tracking.api.urls', 'users.api.urls', 'jobs.api.urls')
+
+BENCHMARK_USER_PREFIX = 'bench-'
+
+BENCHMARK_ADMIN_USERNAME = f'{BENCHMARK_USER_PREFIX}admin'
+
+# Project no seeded contract is for, so that contracts can be added to it
+SPARE_PROJECT_NAME = f'{BENCHMARK_USER_PREFIX}spare'
+
+SEED_START_DATE = datetime.date(2020, 1, 1)
+
+# Number of logs sent to the bulk endpoint in one request
+BULK_SIZE = 100
+
+
+@contextmanager
+def benchmark_database(name, keep=False):
+    """
+    Switch to a database of the given name, created and migrated on entering
+    and dropped on exiting unless kept, in which case a kept one is reused.
+    The replicas mirror it. The caches are cleared on entering and exiting,
+    so that the benchmarks and the project never serve what the other cached
+
+    Args:
+        name (str): Name of the database, a file for SQLite
+        keep (bool): Whether to keep the database and its data on exiting
+
+    Raises:
+        ValueError: If the name is the one of the configured database
+    """
+    database = connections[DEFAULT_DB_ALIAS].settings_dict
+    if os.path.abspath(name) == os.path.abspath(database['NAME']):
+        raise ValueError(f'{name} is the configured database, name a database of its own')
+
+    test_settings = dict(database['TEST'])
+    # Serializing the seeded data would take longer than seeding it
+    database['TEST'].update(NAME=str(name), SERIALIZE=False)
+    try:
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=keep)
+        _clear_caches()
+        try:
+            yield
+        finally:
+            if not keep:
+                for job in Job.objects.exclude(result_file=''):
+                    job.result_file.delete(save=False)
+            _clear_caches()
+            teardown_databases(old_config, verbosity=0, keepdb=keep)
+    finally:
+        database['TEST'] = test_settings
+
+
+def _clear_caches():
+    """
+    Clear every configured cache
+    """
+    for cache in caches.all():
+        cache.clear()
+
+
+def seed_benchmark_data(users, contracts, timelogs, projects, batch_size=5000, seed=0):
+    """
+    Insert the given numbers of users, contracts and logs and rebuild the
+    rollups and listings from them. Contracts are spread over the users and the logs over
+    the contracts, one day after another starting at SEED_START_DATE. The
+    first user also gets a finished export job
+
+    Args:
+        users (int): Number of regular users, an admin is added on top
+        contracts (int): Number of contracts, at most users * projects
+        timelogs (int): Number of logs
+        projects (int): Number of projects, a spare one is added on top
+        batch_size (int): Number of rows to insert per query
+        seed (int): Seed of the generated hours and prices
+    """
+    if contracts > users * projects:
+        raise ValueError('A user can only have one contract per project')
+
+    rng = random.Random(seed)
+    password = make_password(BENCHMARK_USER_PREFIX)
+    with transaction.atomic():
+        _insert_in_batches(User, (
+            User(
+                username=f'{BENCHMARK_USER_PREFIX}{number}',
+                email=f'{BENCHMARK_USER_PREFIX}{number}@example.com',
+                password=password,
+            )
+            for number in range(users)
+        ), batch_size)
+        User.objects.create(
+            username=BENCHMARK_ADMIN_USERNAME,
+            email=f'{BENCHMARK_ADMIN_USERNAME}@example.com',
+            password=password,
+            is_staff=True,
+        )
+        _insert_in_batches(Project, (
+            Project(name=f'{BENCHMARK_USER_PREFIX}project-{number}')
+            for number in range(projects)
+        ), batch_size)
+        Project.objects.create(name=SPARE_PROJECT_NAME)
+
+        # Not every database returns the ids of bulk inserted rows
+        user_ids = _get_seeded_ids(
+            User.objects.filter(username__startswith=BENCHMARK_USER_PREFIX, is_staff=False)
+        )
+        project_ids = _get_seeded_ids(
+            Project.objects.filter(name__startswith=f'{BENCHMARK_USER_PREFIX}project-')
+        )
+        # The n-th contract of every user is for a different project
+        _insert_in_batches(Contract, (
+            Contract(
+                user_id=user_ids[number % users],
+                project_id=project_ids[(number % users + number // users) % projects],
+                hourly_price=Decimal(rng.randrange(1000, 10000)) / 100,
+            )
+            for number in range(contracts)
+        ), batch_size)
+
+        contract_ids = _get_seeded_ids(Contract.objects.filter(user_id__in=user_ids))
+        _insert_in_batches(Timelog, (
+            Timelog(
+                contract_id=contract_ids[number % contracts],
+                date=SEED_START_DATE + datetime.timedelta(days=number // contracts),
+                hours_worked=Decimal(rng.randrange(25, 1000)) / 100,
+            )
+            for number in range(timelogs)
+        ), batch_size)
+
+        # The logs were inserted without sending signals
+        rebuild_hours_rollups(batch_size=batch_size)
+        rebuild_timelog_listings()
+    invalidate_earnings()
+
+    submit_job(user_ids[0], 'timelog_export', {
+        'date_after': str(SEED_START_DATE),
+        'date_before': str(SEED_START_DATE + datetime.timedelta(days=30)),
+        'file_format': 'csv',
+    })
+    run_job(claim_next_job('benchmark'))
+
+
+def _insert_in_batches(model, objects, batch_size):
+    """
+    Insert the objects from the given iterator batch by batch, without
+    holding all of them in memory
+    """
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return
+        model.objects.bulk_create(batch)
+
+
+def _get_seeded_ids(queryset):
+    """
+    Return the ids of the queryset in the order the rows were inserted
+    """
+    return list(queryset.order_by('id').values_list('id', flat=True))
+
+
+def is_seeded():
+    """
+    Whether the benchmark data was already seeded in this database
+    """
+    return User.objects.filter(username=BENCHMARK_ADMIN_USERNAME).exists()
+
+
+def get_benchmark_requests():
+    """
+    Build the requests to benchmark from the seeded data. Every request is
+    sent by the admin, by a regular user owning contracts and logs, or
+    anonymously
+
+    Returns:
+        tuple: A list with a dict per request, holding the `route` name, a
+        `label`, the `method`, the `path`, the `data` to send and the name of
+        the `client` to send it with, and the user of every client name
+    """
+    admin = User.objects.get(username=BENCHMARK_ADMIN_USERNAME)
+    contract = Contract.objects.filter(
+        user__username__startswith=BENCHMARK_USER_PREFIX,
+        time_logs__isnull=False,
+    ).order_by('id').first()
+    owner = contract.user
+    timelog = contract.time_logs.order_by('date').first()
+    spare_project = Project.objects.get(name=SPARE_PROJECT_NAME)
+    job = get_jobs_for_user(owner.id).filter(status=Job.SUCCEEDED).first()
+
+    first_date = timelog.date
+    next_date = Timelog.objects.aggregate(last=Max('date'))['last'] + datetime.timedelta(days=1)
+    month = {'date_after': first_date, 'date_before': first_date + datetime.timedelta(days=30)}
+    quarter = {'date_after': first_date, 'date_before': first_date + datetime.timedelta(days=90)}
+
+    def request(route, method, client, kwargs=None, data=None, label=''):
+        return {
+            'route': route,
+            'label': label or f'{method} as {client}',
+            'method': method,
+            'path': reverse(route, kwargs=kwargs),
+            'data': data,
+            'client': client,
+        }
+
+    owner_id = {'user_id': owner.id}
+    return [
+        request('project_list', 'get', 'owner'),
+        request('project_list', 'post', 'admin', data={'name': 'Benchmark'}),
+        request('project_detail', 'get', 'owner', {'pk': contract.project_id}),
+        request('project_detail', 'patch', 'admin', {'pk': contract.project_id},
+                data={'name': 'Benchmark'}),
+        request('project_detail', 'delete', 'admin', {'pk': spare_project.id}),
+        request('project_cache_stats', 'get', 'admin'),
+
+        request('contract_list', 'get', 'admin'),
+        request('contract_list', 'get', 'owner'),
+        request('contract_detail', 'get', 'owner', {'pk': contract.id}),
+        request('contract_detail', 'patch', 'owner', {'pk': contract.id},
+                data={'hourly_price': '12.50'}),
+        request('contract_detail', 'delete', 'owner', {'pk': contract.id}),
+        request('contract_list_for_user', 'get', 'owner', owner_id),
+        request('contract_list_for_user', 'post', 'owner', owner_id, data={
+            'user': owner.id,
+            'project': spare_project.id,
+            'hourly_price': '10.00',
+            'hourly_price_currency': 'USD',
+        }),
+
+        request('timelog_list', 'get', 'admin'),
+        request('timelog_list', 'get', 'owner'),
+        request('timelog_list', 'get', 'admin', data=month, label='get a month as admin'),
+        request('timelog_export', 'get', 'admin', data=month, label='get a month as admin'),
+        request('timelog_export', 'get', 'owner'),
+        request('timelog_detail', 'get', 'owner', {'pk': timelog.id}),
+        request('timelog_detail', 'patch', 'owner', {'pk': timelog.id},
+                data={'hours_worked': '3.00'}),
+        request('timelog_detail', 'delete', 'owner', {'pk': timelog.id}),
+        request('timelog_list_for_user', 'get', 'owner', owner_id),
+        request('timelog_list_for_user', 'post', 'owner', owner_id, data={
+            'contract': contract.id, 'date': next_date, 'hours_worked': '8.00',
+        }),
+        request('timelog_upsert_for_user', 'put', 'owner', {
+            **owner_id, 'contract_id': contract.id, 'date': next_date,
+        }, data={'hours_worked': '8.00'}, label='put a new log as owner'),
+        request('timelog_upsert_for_user', 'put', 'owner', {
+            **owner_id, 'contract_id': contract.id, 'date': timelog.date,
+        }, data={'hours_worked': '8.00'}, label='put a log as owner'),
+        request('timelog_bulk_create_for_user', 'post', 'owner', owner_id, data=[
+            {
+                'contract': contract.id,
+                'date': next_date + datetime.timedelta(days=day),
+                'hours_worked': '8.00',
+            }
+            for day in range(BULK_SIZE)
+        ]),
+
+        request('hours_report', 'get', 'admin', data={
+            **quarter, 'group_by': 'project', 'period': 'week',
+        }),
+        request('hours_report', 'get', 'owner', data={
+            **quarter, 'group_by': 'contract', 'period': 'month',
+        }),
+        request('earnings_report', 'get', 'admin', data={
+            **quarter, 'group_by': 'user', 'period': 'month',
+        }),
+
+        request('job_list', 'get', 'owner'),
+        request('job_list', 'post', 'owner', data={
+            'kind': 'hours_report',
+            'params': {**quarter, 'group_by': 'project', 'period': 'month'},
+        }),
+        request('job_detail', 'get', 'owner', {'pk': job.id}),
+        request('job_cancel', 'post', 'owner', {'pk': job.id}),
+        request('job_result', 'get', 'owner', {'pk': job.id}),
+
+        request('register', 'get', 'admin'),
+        request('register', 'post', 'anonymous', data={
+            'username': 'benchmark',
+            'email': 'benchmark@example.com',
+            'password': 'Benchmark-password-1',
+            'confirm_password': 'Benchmark-password-1',
+        }),
+        request('detail', 'get', 'owner', {'pk': owner.id}),
+        request('detail', 'patch', 'owner', {'pk': owner.id}, data={'first_name': 'Bench'}),
+        request('detail', 'delete', 'admin', {'pk': owner.id}),
+    ], {'admin': admin, 'owner': owner, 'anonymous': None}
+
+
+def get_route_names():
+    """
+    Return the names of all the routes in BENCHMARKED_URLCONFS
+    """
+    return {
+        pattern.name
+        for urlconf in BENCHMARKED_URLCONFS
+        for pattern in get_resolver(urlconf).url_patterns
+    }
+
+
+def run_benchmarks(repeat=5):
+    """
+    Send every benchmark request `repeat` times to time it, and once more to
+    count its queries and trace its memory, which would skew the timings
+
+    Args:
+        repeat (int): Number of timed runs of every request
+
+    Returns:
+        dict: The environment, the data volumes and a result per request
+    """
+    requests, users = get_benchmark_requests()
+    missing = get_route_names() - {request['route'] for request in requests}
+    if missing:
+        raise ValueError(f'No benchmark for the routes: {", ".join(sorted(missing))}')
+
+    clients = {}
+    for name, user in users.items():
+        clients[name] = Client(HTTP_HOST=_get_allowed_host())
+        if user is not None:
+            clients[name].force_login(user)
+
+    results = []
+    for request in requests:
+        client = clients[request['client']]
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            _send(client, request)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as context:
+                status_code = _send(client, request)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        results.append({
+            'route': request['route'],
+            'label': request['label'],
+            'method': request['method'].upper(),
+            'path': request['path'],
+            'status': status_code,
+            'latency_ms': _summarize(latencies),
+            'queries': len(context.captured_queries),
+            'query_time_ms': round(
+                sum(float(query['time']) for query in context.captured_queries) * 1000, 3
+            ),
+            'peak_memory_kib': round(peak_memory / 1024, 1),
+        })
+
+    return {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+        },
+        'volumes': {
+            'users': User.objects.count(),
+            'projects': Project.objects.count(),
+            'contracts': Contract.objects.count(),
+            'timelogs': Timelog.objects.count(),
+        },
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def run_throughput_benchmark(requests=500, concurrency=50, threads=8, client_delay=0.05):
+    """
+    Compare the throughput of the WSGI and ASGI deployments on the read
+    routes served by async views. `concurrency` clients send the requests
+    one after another, authenticated with access tokens. The WSGI deployment
+    serves at most `threads` of them at once, like a threaded WSGI server,
+    and the ASGI one all of them from one event loop. Every client takes
+    `client_delay` seconds to receive its response, like a slow client,
+    which holds a WSGI thread but no ASGI one
+
+    Args:
+        requests (int): Number of requests sent to each deployment
+        concurrency (int): Number of clients sending requests at once
+        threads (int): Number of threads of the WSGI server
+        client_delay (float): Seconds every client takes to receive a response
+
+    Returns:
+        dict: The parameters and, for each deployment, the number of
+        requests per second, their latency and the statuses they got
+    """
+    benchmark_requests, users = get_benchmark_requests()
+    tokens = {
+        name: f'Bearer {ClaimsRefreshToken.for_user(user).access_token}'
+        for name, user in users.items() if user is not None
+    }
+    reads = [
+        (
+            request['path'] + (f'?{urlencode(request["data"])}' if request['data'] else ''),
+            tokens[request['client']],
+        )
+        for request in benchmark_requests
+        if request['method'] == 'get'
+        and request['route'] in ASYNC_ROUTES
+        and request['client'] in tokens
+    ]
+    sent = list(islice(cycle(reads), requests))
+    batches = [sent[client::concurrency] for client in range(concurrency)]
+
+    return {
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'requests': requests,
+        'concurrency': concurrency,
+        'threads': threads,
+        'client_delay_ms': client_delay * 1000,
+        'deployments': {
+            'wsgi': _run_wsgi_clients(batches, threads, client_delay),
+            'asgi': asyncio.run(_run_asgi_clients(batches, client_delay)),
+        },
+    }
+
+
+def _run_wsgi_clients(batches, threads, client_delay):
+    """
+    Send every batch of (path, authorization) requests from its own client
+    thread to the WSGI handler, serving at most `threads` at once
+    """
+    handler = WSGIHandler()
+    factory = RequestFactory(HTTP_HOST=_get_allowed_host())
+    workers = threading.Semaphore(threads)
+    latencies, statuses = [], []
+
+    def serve(path, authorization):
+        environ = factory.get(path, HTTP_AUTHORIZATION=authorization).environ
+        status = []
+        with workers:
+            response = handler(environ, lambda line, headers, exc_info=None: status.append(line))
+            try:
+                for _ in response:
+                    pass
+                # The thread is busy writing until the client has it all
+                time.sleep(client_delay)
+            finally:
+                response.close()
+        return int(status[0].split()[0])
+
+    def client(batch):
+        for path, authorization in batch:
+            start = time.perf_counter()
+            statuses.append(serve(path, authorization))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    clients = [threading.Thread(target=client, args=(batch,)) for batch in batches]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return _summarize_throughput(time.perf_counter() - start, latencies, statuses)
+
+
+async def _run_asgi_clients(batches, client_delay):
+    """
+    Send every batch of (path, authorization) requests from its own client
+    task to the ASGI handler
+    """
+    application = AsyncReadsASGIHandler()
+    host = _get_allowed_host()
+    latencies, statuses = [], []
+
+    async def serve(path, authorization):
+        path, _, query_string = path.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'query_string': query_string.encode(),
+            'root_path': '',
+            'headers': [(b'host', host.encode()), (b'authorization', authorization.encode())],
+            'client': ('127.0.0.1', 0),
+            'server': (host, 80),
+        }
+        status = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif not message.get('more_body', False):
+                # The event loop serves other requests meanwhile
+                await asyncio.sleep(client_delay)
+
+        await application(scope, receive, send)
+        return status[0]
+
+    async def client(batch):
+        for path, authorization in batch:
+            start = time.perf_counter()
+            statuses.append(await serve(path, authorization))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(batch) for batch in batches))
+    return _summarize_throughput(time.perf_counter() - start, latencies, statuses)
+
+
+def _summarize_throughput(elapsed, latencies, statuses):
+    """
+    Summarize the requests sent to a deployment in `elapsed` seconds
+    """
+    return {
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'latency_ms': _summarize(latencies),
+        'statuses': {
+            str(status): statuses.count(status) for status in sorted(set(statuses))
+        },
+    }
+
+
+def _send(client, request):
+    """
+    Send the request in a transaction that is rolled back, reading the whole
+    response body, and return the response status
+    """
+    with transaction.atomic():
+        method = getattr(client, request['method'])
+        if request['method'] == 'get':
+            response = method(request['path'], request['data'])
+        else:
+            response = method(request['path'], request['data'], content_type='application/json')
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        transaction.set_rollback(True)
+    return response.status_code
+
+
+def _get_allowed_host():
+    """
+    Return a host name the test client can send requests to
+    """
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'localhost'
+
+
+def _summarize(latencies):
+    """
+    Summarize the timings of a request in milliseconds
+    """
+    ordered = sorted(latencies)
+    return {
+        'min': round(ordered[0], 3),
+        'median': round(statistics.median(ordered), 3),
+        'p95': round(ordered[math.ceil(len(ordered) * 0.95) - 1], 3),
+        'max': round(ordered[-1], 3),
+    }
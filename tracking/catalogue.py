@@ -0,0 +1,131 @@
+"""
+Cache of the serialized projects served by the project views.
+
+Every user reads the projects and only admins write them, so the serialized
+pages of the list and the serialized details are cached in the `projects`
+cache, shared by all the processes of a host. A written project drops its
+own detail entry and moves the list on to a new generation, a counter of
+the version table shared by every process, so that the pages cached before
+are never served again, while the details of the other projects stay
+cached. Hits and misses are counted in the cache.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from time_tracking_system.replicas import read_from_primary
+
+from .versions import get_counters, increment_counters
+
+CACHE_PREFIX = 'tracking:projects'
+
+GENERATION_KEY = f'{CACHE_PREFIX}:generation'
+
+# Counters of the lookups in the catalogue
+HITS = 'hits'
+MISSES = 'misses'
+
+
+def get_catalogue_cache():
+    """
+    Return the cache the catalogue is stored in
+    """
+    return caches[getattr(settings, 'PROJECT_CACHE_ALIAS', 'default')]
+
+
+def get_detail_key(project_id):
+    """
+    Return the cache key of the serialized project
+    """
+    return f'{CACHE_PREFIX}:detail:{project_id}'
+
+
+def get_list_key(url):
+    """
+    Return the cache key of the serialized page of the project list at the
+    given absolute url, which the links to the other pages are built from
+    """
+    with read_from_primary():
+        generation = get_counters([GENERATION_KEY])[GENERATION_KEY]
+    digest = hashlib.sha1(url.encode()).hexdigest()
+    return f'{CACHE_PREFIX}:list:{generation}:{digest}'
+
+
+def get_cached(key, build):
+    """
+    Return the data cached under the key, or build, cache and return it
+
+    Args:
+        key (str): Key built by get_detail_key or get_list_key
+        build (callable): Returns the serialized data when it is not cached
+
+    Returns:
+        The serialized data
+    """
+    catalogue = get_catalogue_cache()
+    data = catalogue.get(key)
+    if data is not None:
+        _count(HITS)
+        return data
+
+    _count(MISSES)
+    # Cached for everyone, so never built from a lagging replica
+    with read_from_primary():
+        data = build()
+    catalogue.set(key, data, timeout=getattr(settings, 'PROJECT_CACHE_TIMEOUT', None))
+    return data
+
+
+def invalidate_project(project_id):
+    """
+    Drop the pages of the project list and the cached detail of the written
+    project. The generation moves on with the transaction of the write, the
+    detail is dropped right away and again once the transaction commits, so
+    that a detail read before the commit is not left cached
+
+    Args:
+        project_id (int): Id of the written Project
+    """
+    increment_counters([GENERATION_KEY])
+    _drop_detail(project_id)
+    transaction.on_commit(lambda: _drop_detail(project_id))
+
+
+def get_catalogue_stats():
+    """
+    Return the number of hits and misses of the catalogue so far
+
+    Returns:
+        dict: The `hits`, `misses` and `hit_ratio` of the lookups
+    """
+    catalogue = get_catalogue_cache()
+    counters = catalogue.get_many([f'{CACHE_PREFIX}:{HITS}', f'{CACHE_PREFIX}:{MISSES}'])
+    hits = counters.get(f'{CACHE_PREFIX}:{HITS}', 0)
+    misses = counters.get(f'{CACHE_PREFIX}:{MISSES}', 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / (hits + misses) if hits + misses else None,
+    }
+
+
+def _drop_detail(project_id):
+    """
+    Drop the cached detail of the project
+    """
+    get_catalogue_cache().delete(get_detail_key(project_id))
+
+
+def _count(counter):
+    """
+    Add one to the given counter
+    """
+    catalogue = get_catalogue_cache()
+    key = f'{CACHE_PREFIX}:{counter}'
+    if not catalogue.add(key, 1, timeout=None):
+        try:
+            catalogue.incr(key)
+        except ValueError:
+            catalogue.set(key, 1, timeout=None)
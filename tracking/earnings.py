@@ -0,0 +1,237 @@
+"""
+Earnings of users and costs of projects, computed in the database from the
+hours of the Timelogs and the hourly price of their Contracts.
+
+Amounts are summed per currency in SQL and never turned into Money objects
+row by row. Months that are over cannot change much, so their totals are
+cached and only recomputed once a log or contract they depend on changes,
+which moves on their versions in the table shared by every process.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from time_tracking_system.replicas import read_from_primary
+
+from .selectors import REPORT_GROUPS, get_timelog_model, reaches_archive
+from .versions import get_counters, increment_counters
+
+# Products of two amounts with 2 decimal places are exact with 4
+AMOUNT_FIELD = DecimalField(max_digits=24, decimal_places=4)
+
+CENT = Decimal('0.01')
+
+CACHE_PREFIX = 'tracking:earnings'
+
+
+def get_earnings(date_after, date_before, group_by, by_month=False, user_id=None,
+                 project_id=None, contract_id=None, today=None):
+    """
+    Total the earnings between the given dates (both inclusive) per group
+    and currency. Months that ended before the current one are served from
+    the cache when possible
+
+    Args:
+        date_after (date): First date to include
+        date_before (date): Last date to include
+        group_by (str): One of the keys of REPORT_GROUPS
+        by_month (bool): Whether to total every month separately
+        user_id (int): Only include the earnings of this User (Optional)
+        project_id (int): Only include the earnings on this Project (Optional)
+        contract_id (int): Only include the earnings under this Contract (Optional)
+        today (date): Date deciding which months are over, today if not given
+
+    Returns:
+        list: A dict per row with the group id under the `group_by` key, the
+        `currency`, the `amount` and, if by_month, the first day of the month
+        under `period`
+    """
+    today = today or datetime.date.today()
+    scope = (group_by, user_id, project_id, contract_id)
+
+    closed_months, open_ranges = [], []
+    for month_start, month_end in get_months(date_after, date_before):
+        whole_month = (max(month_start, date_after), min(month_end, date_before)) == (
+            month_start, month_end
+        )
+        if whole_month and month_end < today.replace(day=1):
+            closed_months.append(month_start)
+        else:
+            open_ranges.append((max(month_start, date_after), min(month_end, date_before)))
+
+    # Read the versions before computing anything, so that totals computed
+    # while a log changes are cached under the version that change replaced
+    versions = get_versions(closed_months)
+    totals = get_cached_months(scope, versions)
+    missing_months = [month for month in closed_months if month not in totals]
+    if missing_months:
+        # Cached until the months change again, so never read from a
+        # lagging replica
+        with read_from_primary():
+            computed = compute_earnings_by_month(
+                scope, [(month, get_month_end(month)) for month in missing_months]
+            )
+        computed = {month: computed.get(month, []) for month in missing_months}
+        set_cached_months(scope, computed, versions)
+        totals.update(computed)
+    if open_ranges:
+        totals.update(compute_earnings_by_month(scope, open_ranges))
+
+    if by_month:
+        return [
+            {
+                'period': month,
+                group_by: group,
+                'currency': currency,
+                'amount': amount.quantize(CENT),
+            }
+            for month in sorted(totals)
+            for group, currency, amount in sorted(totals[month])
+        ]
+
+    overall = defaultdict(Decimal)
+    for rows in totals.values():
+        for group, currency, amount in rows:
+            overall[(group, currency)] += amount
+    return [
+        {group_by: group, 'currency': currency, 'amount': amount.quantize(CENT)}
+        for (group, currency), amount in sorted(overall.items())
+    ]
+
+
+def compute_earnings_by_month(scope, date_ranges):
+    """
+    Total the earnings in the given date ranges per month, group and
+    currency with a single query, reading the archived logs as well if the
+    ranges reach into the archived periods
+
+    Returns:
+        dict: (group id, currency, amount) tuples for every month with earnings
+    """
+    group_by, user_id, project_id, contract_id = scope
+    model = get_timelog_model(reaches_archive(min(start for start, _ in date_ranges)))
+    timelogs = model.objects.filter(reduce(or_, (
+        Q(date__gte=start, date__lte=end) for start, end in date_ranges
+    )))
+    if user_id is not None:
+        timelogs = timelogs.filter(contract__user_id=user_id)
+    if project_id is not None:
+        timelogs = timelogs.filter(contract__project_id=project_id)
+    if contract_id is not None:
+        timelogs = timelogs.filter(contract_id=contract_id)
+
+    rows = (
+        timelogs
+        .values(
+            month=TruncMonth('date'),
+            group=F(REPORT_GROUPS[group_by]),
+            currency=F('contract__hourly_price_currency'),
+        )
+        .annotate(amount=Sum(ExpressionWrapper(
+            F('hours_worked') * F('contract__hourly_price'), output_field=AMOUNT_FIELD
+        )))
+        .order_by('month', 'group', 'currency')
+    )
+    totals = defaultdict(list)
+    for row in rows:
+        totals[row['month']].append((row['group'], row['currency'], row['amount']))
+    return dict(totals)
+
+
+def get_months(date_after, date_before):
+    """
+    Return the first and last day of every month touching the date range
+    """
+    month = date_after.replace(day=1)
+    while month <= date_before:
+        month_end = get_month_end(month)
+        yield month, month_end
+        month = month_end + datetime.timedelta(days=1)
+
+
+def get_month_end(month):
+    """
+    Return the last day of the month starting on the given date
+    """
+    next_month = (month.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return next_month - datetime.timedelta(days=1)
+
+
+def get_cache_key(scope, month, versions):
+    """
+    Return the cache key of the totals of a month for the given scope
+    """
+    global_version, month_version = versions
+    group_by, user_id, project_id, contract_id = scope
+    return (
+        f'{CACHE_PREFIX}:{group_by}:{user_id}:{project_id}:{contract_id}:'
+        f'{month:%Y-%m}:{global_version}:{month_version}'
+    )
+
+
+def get_versions(months):
+    """
+    Return the (global, month) version pair of every given month, read from
+    the primary so that the totals are never cached under a version a
+    lagging replica still has
+    """
+    if not months:
+        return {}
+
+    keys = [f'{CACHE_PREFIX}:version'] + [
+        f'{CACHE_PREFIX}:version:{month:%Y-%m}' for month in months
+    ]
+    with read_from_primary():
+        versions = get_counters(keys)
+
+    global_version = versions[keys[0]]
+    return {
+        month: (global_version, versions[key]) for month, key in zip(months, keys[1:])
+    }
+
+
+def get_cached_months(scope, versions):
+    """
+    Return the cached totals of the months in versions for the scope,
+    leaving out the months that are not cached
+    """
+    if not versions:
+        return {}
+
+    keys = {
+        get_cache_key(scope, month, month_versions): month
+        for month, month_versions in versions.items()
+    }
+    return {keys[key]: rows for key, rows in cache.get_many(list(keys)).items()}
+
+
+def set_cached_months(scope, totals, versions):
+    """
+    Cache the totals of the given months for the scope
+    """
+    cache.set_many(
+        {get_cache_key(scope, month, versions[month]): rows for month, rows in totals.items()},
+        timeout=settings.EARNINGS_CACHE_TIMEOUT
+    )
+
+
+def invalidate_earnings(dates=None):
+    """
+    Stop serving the cached totals of the months of the given dates, or of
+    all the months if no dates are given
+
+    Args:
+        dates (iterable): Dates whose logs changed (Optional)
+    """
+    if dates is None:
+        keys = {f'{CACHE_PREFIX}:version'}
+    else:
+        keys = {f'{CACHE_PREFIX}:version:{date:%Y-%m}' for date in dates}
+    increment_counters(keys)
@@ -0,0 +1,162 @@
+"""
+Bulk import of timelogs from CSV rows, such as the history of a new client.
+
+The rows are read as they come and inserted a chunk at a time, each chunk in
+its own transaction with everything derived from its logs. The contract of
+every row is looked up by (user, project) in a map of all the contracts read
+once, and the rows logged twice in the input are caught with a set of the
+(contract, date) pairs already read. A chunk costs a query to find the pairs
+that already have a log, and the bulk insert. The rows whose log was written
+by someone else between the two are rejected like the other logged rows, and
+the rest of the chunk inserted again. A chunk that is committed stays
+imported if a later one fails, and importing the same rows again rejects
+them as already logged, so an interrupted import can be run again.
+"""
+import datetime
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import IntegrityError
+
+from .selectors import (get_archived_until, get_contract_ids_by_owner,
+                        get_existing_timelog_keys)
+from .services import bulk_create_timelogs
+
+# Columns every imported row must have. The timelog export has them too
+IMPORT_COLUMNS = ('user', 'project', 'date', 'hours_worked')
+
+IMPORT_CHUNK_SIZE = 5000
+
+MAX_HOURS = Decimal(24)
+
+LOGGED_ERROR = 'Log for this contract already exists for this date'
+
+
+def import_timelogs(rows, chunk_size=IMPORT_CHUNK_SIZE, dry_run=False, reject=None,
+                    progress=None):
+    """
+    Create a Timelog for every valid row, and reject the others
+
+    Args:
+        rows (iterable): A dict per row with the `user` and `project` ids, the
+            `date` as YYYY-MM-DD and the `hours_worked`, such as the rows of
+            a csv.DictReader
+        chunk_size (int): Number of rows inserted per transaction
+        dry_run (bool): Check every row without inserting anything
+        reject (callable): Called with every rejected row and the reason
+            (Optional)
+        progress (callable): Called with the stats after every chunk
+            (Optional)
+
+    Returns:
+        dict: The number of rows `read`, `imported` and `rejected`, the
+        `seconds` it took and the `rows_per_second`
+    """
+    start = time.perf_counter()
+    contract_ids = get_contract_ids_by_owner()
+    contract_owners = {contract_id: owner for owner, contract_id in contract_ids.items()}
+    archived_until = get_archived_until()
+    # Every (contract, date) pair read so far, as one int per pair
+    seen = set()
+    stats = {'read': 0, 'imported': 0, 'rejected': 0}
+
+    def reject_row(row, reason):
+        stats['rejected'] += 1
+        if reject is not None:
+            reject(row, reason)
+
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        stats['read'] += len(chunk)
+
+        entries = {}
+        for row in chunk:
+            try:
+                entry = parse_row(row, contract_ids, archived_until)
+            except ValueError as error:
+                reject_row(row, str(error))
+                continue
+            seen_key = entry['contract_id'] << 22 | entry['date'].toordinal()
+            if seen_key in seen:
+                reject_row(row, 'Logged more than once in the import')
+                continue
+            seen.add(seen_key)
+            entries[(entry['contract_id'], entry['date'])] = row, entry
+
+        for key in get_existing_timelog_keys(entries):
+            reject_row(entries.pop(key)[0], LOGGED_ERROR)
+
+        while entries and not dry_run:
+            try:
+                bulk_create_timelogs(
+                    [entry for _, entry in entries.values()],
+                    {contract_id: contract_owners[contract_id] for contract_id, _ in entries}
+                )
+                break
+            except IntegrityError:
+                # Logs were written for some of the pairs since they were looked up
+                logged = get_existing_timelog_keys(entries)
+                if not logged:
+                    raise
+                for key in logged:
+                    reject_row(entries.pop(key)[0], LOGGED_ERROR)
+        stats['imported'] += len(entries)
+        if progress is not None:
+            progress(_with_throughput(stats, start))
+    return _with_throughput(stats, start)
+
+
+def parse_row(row, contract_ids, archived_until=None):
+    """
+    Read the log of a row
+
+    Args:
+        row (dict): The `user`, `project`, `date` and `hours_worked` of the log
+        contract_ids (dict): Contract id of every (user_id, project_id) tuple
+        archived_until (date): Last date of the archived periods (Optional)
+
+    Returns:
+        dict: The `contract_id`, `date` and `hours_worked` of the log
+
+    Raises:
+        ValueError: If the row is not a valid new log
+    """
+    try:
+        owner = (int(row['user']), int(row['project']))
+    except (TypeError, ValueError):
+        raise ValueError('User and project must be ids')
+    try:
+        date = datetime.date.fromisoformat(row['date'])
+    except (TypeError, ValueError):
+        raise ValueError('Date must be in YYYY-MM-DD format')
+    try:
+        hours_worked = Decimal(row['hours_worked'])
+    except (TypeError, InvalidOperation):
+        raise ValueError('Hours worked must be a number')
+
+    if not hours_worked.is_finite() or not 0 <= hours_worked <= MAX_HOURS:
+        raise ValueError(f'Hours worked must be between 0 and {MAX_HOURS}')
+    if hours_worked.as_tuple().exponent < -2:
+        raise ValueError('Hours worked must have at most 2 decimal places')
+    if owner not in contract_ids:
+        raise ValueError('The user has no contract for this project')
+    if archived_until is not None and date <= archived_until:
+        raise ValueError(f'Logs up to {archived_until} are archived and can no longer be written')
+
+    return {'contract_id': contract_ids[owner], 'date': date, 'hours_worked': hours_worked}
+
+
+def _with_throughput(stats, start):
+    """
+    Add the time taken since `start` and the rows read per second to the stats
+    """
+    seconds = time.perf_counter() - start
+    return {
+        **stats,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(stats['read'] / seconds, 1),
+    }
@@ -0,0 +1,116 @@
+"""
+Monthly invoices of every contract, generated in parallel.
+
+The contract ids are split into shards of consecutive ids, aligned on the
+shard size so that they do not depend on which contracts exist. Worker
+processes total the hours of a shard with a single query each, and the
+invoices of every shard are written in bulk by this process, in one
+transaction together with a marker of the shard. A run that was interrupted
+resumes with the shards it had not written, and every number of workers
+writes the same invoices.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.apps import apps
+from django.db import connections
+
+from .earnings import get_month_end
+from .selectors import (get_completed_invoice_shards, get_contract_id_range,
+                        get_invoice_totals)
+from .services import forget_invoice_shards, write_invoices
+
+
+def get_invoice_shards(shard_size):
+    """
+    Split the contract ids into ranges of `shard_size` ids
+
+    Args:
+        shard_size (int): Number of contract ids per range
+
+    Returns:
+        list: (first_contract_id, last_contract_id) of every range holding
+        contracts, in order
+    """
+    first_id, last_id = get_contract_id_range()
+    if first_id is None:
+        return []
+    first_start = (first_id - 1) // shard_size * shard_size + 1
+    return [
+        (start, start + shard_size - 1)
+        for start in range(first_start, last_id + 1, shard_size)
+    ]
+
+
+def generate_invoices(month, workers=1, shard_size=1000, restart=False):
+    """
+    Write the invoices of a month for every contract with logs in it,
+    skipping the shards an earlier run already wrote
+
+    Args:
+        month (date): First day of the month
+        workers (int): Number of processes totalling the shards at once
+        shard_size (int): Number of contract ids per shard
+        restart (bool): Write the shards an earlier run wrote again
+
+    Returns:
+        dict: The number of `shards`, of shards `skipped` because they were
+        written before, of `invoices` written and of `logs` they total, the
+        `seconds` it took and the `logs_per_second` and `shards_per_second`
+    """
+    start = time.perf_counter()
+    if restart:
+        forget_invoice_shards(month)
+    shards = get_invoice_shards(shard_size)
+    completed = get_completed_invoice_shards(month)
+    pending = [shard for shard in shards if shard not in completed]
+
+    invoices = logs = 0
+    for shard, totals in _total_shards(month, pending, workers):
+        invoices += write_invoices(month, *shard, totals)
+        logs += sum(total['logs'] for total in totals)
+
+    seconds = time.perf_counter() - start
+    return {
+        'shards': len(shards),
+        'skipped': len(shards) - len(pending),
+        'invoices': invoices,
+        'logs': logs,
+        'seconds': round(seconds, 3),
+        'logs_per_second': round(logs / seconds, 1),
+        'shards_per_second': round(len(pending) / seconds, 1),
+    }
+
+
+def _total_shards(month, shards, workers):
+    """
+    Yield every shard with its totals as soon as they are computed, by
+    worker processes if there is more than one
+    """
+    month_end = get_month_end(month)
+    if workers <= 1 or len(shards) <= 1:
+        for shard in shards:
+            yield shard, get_invoice_totals(month, month_end, *shard)
+        return
+
+    # The workers open their own connections instead of sharing these
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+        futures = {
+            pool.submit(get_invoice_totals, month, month_end, *shard): shard
+            for shard in shards
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def _setup_worker():
+    """
+    Set Django up in a worker process that was not forked from a process
+    where it was, and drop any connection a forked worker inherited so that
+    it opens its own
+    """
+    if not apps.ready:
+        django.setup()
+    connections.close_all()
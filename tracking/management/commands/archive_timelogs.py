@@ -0,0 +1,31 @@
+"""
+Management command to move the logs of closed periods to the archive table
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tracking.selectors import get_archive_cutoff
+from tracking.services import archive_timelogs
+
+
+class Command(BaseCommand):
+    """
+    Move the Timelogs older than TIMELOG_ARCHIVE_AFTER_DAYS to the
+    ArchivedTimelog table in batches
+    """
+
+    help = 'Move the timelogs older than TIMELOG_ARCHIVE_AFTER_DAYS to the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.TIMELOG_ARCHIVE_BATCH_SIZE,
+            help='Number of logs to move per transaction',
+        )
+
+    def handle(self, *args, **options):
+        archived = archive_timelogs(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} logs dated before {get_archive_cutoff()}'
+        ))
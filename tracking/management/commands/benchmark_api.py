@@ -0,0 +1,105 @@
+"""
+Management command to benchmark the API routes at production data volumes
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tracking.benchmarks import (benchmark_database, is_seeded, run_benchmarks,
+                                 seed_benchmark_data)
+
+
+def add_database_arguments(parser):
+    """
+    Add the arguments naming the database of the benchmarks and the volumes
+    of the data seeded in it
+    """
+    parser.add_argument(
+        '--database',
+        required=True,
+        help=(
+            'Name of the database to seed and benchmark, a file for SQLite. It is created '
+            'and dropped after the run, replacing any database of that name'
+        ),
+    )
+    parser.add_argument(
+        '--keep',
+        action='store_true',
+        help='Keep the database and its data after the run, and reuse them in the next one',
+    )
+    parser.add_argument('--users', type=int, default=10000, help='Number of users to seed')
+    parser.add_argument(
+        '--contracts', type=int, default=50000, help='Number of contracts to seed'
+    )
+    parser.add_argument(
+        '--timelogs', type=int, default=5000000, help='Number of logs to seed'
+    )
+    parser.add_argument(
+        '--projects', type=int, default=500, help='Number of projects to seed'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=5000,
+        help='Number of rows to insert per query while seeding',
+    )
+
+
+def seed(command, options):
+    """
+    Seed the benchmark data in the current database unless it already is
+    """
+    if is_seeded():
+        command.stdout.write('Using the benchmark data already in the database')
+        return
+
+    command.stdout.write('Seeding the benchmark data')
+    try:
+        seed_benchmark_data(
+            options['users'],
+            options['contracts'],
+            options['timelogs'],
+            options['projects'],
+            batch_size=options['batch_size'],
+        )
+    except ValueError as error:
+        raise CommandError(error) from error
+
+
+class Command(BaseCommand):
+    """
+    Seed the benchmark data in a database of its own if needed, then measure
+    every API route and write the results to a JSON file
+    """
+
+    help = 'Measure the latency, queries and peak memory of every API route'
+
+    def add_arguments(self, parser):
+        add_database_arguments(parser)
+        parser.add_argument(
+            '--repeat', type=int, default=5, help='Number of timed runs of every request'
+        )
+        parser.add_argument(
+            '--output',
+            default='benchmark-results.json',
+            help='File to write the results to',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with benchmark_database(options['database'], keep=options['keep']):
+                seed(self, options)
+                results = run_benchmarks(repeat=options['repeat'])
+        except ValueError as error:
+            raise CommandError(error) from error
+
+        with open(options['output'], 'w') as output:
+            json.dump(results, output, indent=2)
+
+        for result in results['results']:
+            self.stdout.write(
+                f"{result['route']:<30} {result['label']:<24} {result['status']} "
+                f"{result['latency_ms']['median']:>10.2f} ms {result['queries']:>4} queries "
+                f"{result['peak_memory_kib']:>10.1f} KiB"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Wrote the results to {options['output']}"))
@@ -0,0 +1,67 @@
+"""
+Management command to compare the throughput of the WSGI and ASGI deployments
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tracking.benchmarks import benchmark_database, run_throughput_benchmark
+from tracking.management.commands.benchmark_api import (add_database_arguments,
+                                                        seed)
+
+
+class Command(BaseCommand):
+    """
+    Send the same concurrent reads to the WSGI and ASGI handlers and write
+    the throughput of each to a JSON file. The data is seeded like the one of
+    benchmark_api, whose database can be reused with --keep
+    """
+
+    help = 'Compare the throughput of the read routes under WSGI and ASGI'
+
+    def add_arguments(self, parser):
+        add_database_arguments(parser)
+        parser.add_argument(
+            '--requests', type=int, default=500, help='Number of requests per deployment'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=50, help='Number of clients sending at once'
+        )
+        parser.add_argument(
+            '--threads', type=int, default=8, help='Number of threads of the WSGI server'
+        )
+        parser.add_argument(
+            '--client-delay',
+            type=float,
+            default=0.05,
+            help='Seconds every client takes to receive a response',
+        )
+        parser.add_argument(
+            '--output',
+            default='deployment-results.json',
+            help='File to write the results to',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with benchmark_database(options['database'], keep=options['keep']):
+                seed(self, options)
+                results = run_throughput_benchmark(
+                    requests=options['requests'],
+                    concurrency=options['concurrency'],
+                    threads=options['threads'],
+                    client_delay=options['client_delay'],
+                )
+        except ValueError as error:
+            raise CommandError(error) from error
+
+        with open(options['output'], 'w') as output:
+            json.dump(results, output, indent=2)
+
+        for name, result in results['deployments'].items():
+            self.stdout.write(
+                f"{name:<6} {result['requests_per_second']:>10.1f} req/s "
+                f"{result['latency_ms']['median']:>10.2f} ms median "
+                f"{result['latency_ms']['p95']:>10.2f} ms p95"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Wrote the results to {options['output']}"))
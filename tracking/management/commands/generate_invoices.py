@@ -0,0 +1,75 @@
+"""
+Management command to write the invoices of a month for every contract
+"""
+import datetime
+import os
+from argparse import ArgumentTypeError
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tracking.invoices import generate_invoices
+
+
+def parse_month(value):
+    """
+    Return the first day of a YYYY-MM month
+    """
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise ArgumentTypeError(f'{value} is not a YYYY-MM month')
+
+
+class Command(BaseCommand):
+    """
+    Total the hours of every contract in a month times its hourly price into
+    an Invoice, in parallel shards of contracts. Running it again resumes
+    with the shards an interrupted run did not write
+    """
+
+    help = 'Write the invoices of a month, by default the last one, for every contract'
+
+    def add_arguments(self, parser):
+        last_month = (datetime.date.today().replace(day=1) - datetime.timedelta(days=1))
+        parser.add_argument(
+            '--month',
+            type=parse_month,
+            default=last_month.replace(day=1),
+            help='Month to invoice as YYYY-MM, the last one by default',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of processes totalling the hours at once',
+        )
+        parser.add_argument(
+            '--shard-size',
+            type=int,
+            default=settings.INVOICE_SHARD_SIZE,
+            help='Number of contract ids per shard',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Write every shard again instead of resuming',
+        )
+
+    def handle(self, *args, **options):
+        month = options['month']
+        stats = generate_invoices(
+            month,
+            workers=options['workers'],
+            shard_size=options['shard_size'],
+            restart=options['restart'],
+        )
+        if stats['skipped']:
+            self.stdout.write(
+                f'Skipped {stats["skipped"]} of {stats["shards"]} shards written before'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {stats["invoices"]} invoices for {month:%Y-%m} from {stats["logs"]} logs '
+            f'in {stats["seconds"]}s ({stats["logs_per_second"]} logs/s, '
+            f'{stats["shards_per_second"]} shards/s)'
+        ))
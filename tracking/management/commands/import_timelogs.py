@@ -0,0 +1,103 @@
+"""
+Management command to import timelogs in bulk from a CSV file
+"""
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tracking.imports import IMPORT_CHUNK_SIZE, IMPORT_COLUMNS, import_timelogs
+
+
+class RejectWriter:
+    """
+    Write the rejected rows to a CSV file with the reason in an extra
+    `error` column. The file is only created once a row is rejected
+    """
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = [*columns, 'error']
+        self.file = None
+        self.writer = None
+
+    def __call__(self, row, reason):
+        if self.writer is None:
+            self.file = open(self.path, 'w', newline='', encoding='utf-8')
+            self.writer = csv.DictWriter(self.file, self.columns, extrasaction='ignore')
+            self.writer.writeheader()
+        self.writer.writerow({**row, 'error': reason})
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class Command(BaseCommand):
+    """
+    Stream the rows of a CSV file with the user and project ids, date and
+    hours worked of every log into Timelogs, a chunk per transaction. The
+    CSV written by the timelog export can be imported
+    """
+
+    help = 'Import timelogs in bulk from a CSV file with user, project, date and hours_worked'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help='Number of rows inserted per transaction',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Check every row without inserting anything',
+        )
+        parser.add_argument(
+            '--rejects',
+            help='CSV file the rejected rows are written to, next to the imported one by default',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        rejects_path = options['rejects'] or f'{path}.rejects.csv'
+        try:
+            with open(path, newline='', encoding='utf-8') as file:
+                rows = csv.DictReader(file)
+                missing = set(IMPORT_COLUMNS) - set(rows.fieldnames or ())
+                if missing:
+                    raise CommandError(f'Missing columns: {", ".join(sorted(missing))}')
+
+                reject = RejectWriter(rejects_path, rows.fieldnames)
+                try:
+                    stats = import_timelogs(
+                        rows,
+                        chunk_size=options['chunk_size'],
+                        dry_run=options['dry_run'],
+                        reject=reject,
+                        progress=self.write_progress,
+                    )
+                finally:
+                    reject.close()
+        except OSError as error:
+            raise CommandError(error)
+
+        verb = 'Would import' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {stats["imported"]} of {stats["read"]} rows in {stats["seconds"]}s '
+            f'({stats["rows_per_second"]} rows/s)'
+        ))
+        if stats['rejected']:
+            self.stdout.write(self.style.WARNING(
+                f'Rejected {stats["rejected"]} rows, written to {rejects_path}'
+            ))
+
+    def write_progress(self, stats):
+        """
+        Write the progress of the import after every chunk
+        """
+        self.stdout.write(
+            f'Read {stats["read"]} rows: {stats["imported"]} imported, '
+            f'{stats["rejected"]} rejected ({stats["rows_per_second"]} rows/s)'
+        )
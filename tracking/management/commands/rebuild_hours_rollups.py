@@ -0,0 +1,43 @@
+"""
+Management command to rebuild or verify the daily and weekly hours rollups
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from tracking.services import check_hours_rollups, rebuild_hours_rollups
+
+
+class Command(BaseCommand):
+    """
+    Recompute the DailyHours and WeeklyHours rollups from all the Timelogs
+    """
+
+    help = 'Rebuild the daily and weekly hours rollups from the timelogs, or verify them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only compare the rollups with the timelogs and report differences',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of rollup rows to insert per query',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            daily, weekly = rebuild_hours_rollups(batch_size=options['batch_size'])
+            self.stdout.write(f'Wrote {daily} daily and {weekly} weekly rollup rows')
+
+        mismatches = check_hours_rollups()
+        for model_name, (user_id, project_id, period), expected, stored in mismatches:
+            self.stdout.write(
+                f'{model_name} user={user_id} project={project_id} period={period}: '
+                f'expected {expected}, stored {stored}'
+            )
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} rollup rows do not match the timelogs')
+
+        self.stdout.write(self.style.SUCCESS('Rollups match the timelogs'))
@@ -0,0 +1,35 @@
+"""
+Management command to rebuild or verify the listings of the timelogs
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from tracking.services import check_timelog_listings, rebuild_timelog_listings
+
+
+class Command(BaseCommand):
+    """
+    Copy the TimelogListings again from the Timelogs, their Contracts and
+    their Projects
+    """
+
+    help = 'Rebuild the listings of the timelogs from the timelogs, or verify them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only compare the listings with the timelogs and report differences',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            listings = rebuild_timelog_listings()
+            self.stdout.write(f'Wrote {listings} timelog listings')
+
+        mismatches = check_timelog_listings()
+        for timelog_id, expected, stored in mismatches:
+            self.stdout.write(f'Timelog {timelog_id}: expected {expected}, stored {stored}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} timelog listings do not match the timelogs')
+
+        self.stdout.write(self.style.SUCCESS('Listings match the timelogs'))
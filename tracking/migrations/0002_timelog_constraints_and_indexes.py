@@ -0,0 +1,27 @@
+# Generated by Django 3.2.9 on 2026-10-18 02:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='timelog',
+            name='contract',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='time_logs', to='tracking.contract'),
+        ),
+        migrations.AddIndex(
+            model_name='timelog',
+            index=models.Index(fields=['-date', '-id'], name='timelog_date_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelog',
+            constraint=models.UniqueConstraint(fields=('contract', 'date'), name='unique_timelog_contract_date'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.2.9 on 2026-10-18 02:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tracking', '0002_timelog_constraints_and_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeeklyHours',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField()),
+                ('hours', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tracking.project')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyHours',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hours', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tracking.project')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='weeklyhours',
+            index=models.Index(fields=['week'], name='weekly_hours_week_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='weeklyhours',
+            constraint=models.UniqueConstraint(fields=('user', 'project', 'week'), name='unique_weekly_hours'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyhours',
+            index=models.Index(fields=['date'], name='daily_hours_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyhours',
+            constraint=models.UniqueConstraint(fields=('user', 'project', 'date'), name='unique_daily_hours'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.9 on 2026-10-18 03:08
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+COMBINED_TIMELOG_VIEW = '''
+CREATE VIEW tracking_combinedtimelog AS
+SELECT id, date, hours_worked, contract_id FROM tracking_timelog
+UNION ALL
+SELECT id, date, hours_worked, contract_id FROM tracking_archivedtimelog
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0003_hours_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTimelog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hours_worked', models.DecimalField(decimal_places=2, max_digits=4, validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(24.0)])),
+                ('contract', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tracking.contract')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedtimelog',
+            index=models.Index(fields=['-date', '-id'], name='archived_timelog_date_id_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='archivedtimelog',
+            constraint=models.UniqueConstraint(fields=('contract', 'date'), name='unique_archived_timelog_contract_date'),
+        ),
+        migrations.RunSQL(
+            COMBINED_TIMELOG_VIEW,
+            reverse_sql='DROP VIEW tracking_combinedtimelog',
+        ),
+        migrations.CreateModel(
+            name='CombinedTimelog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hours_worked', models.DecimalField(decimal_places=2, max_digits=4, validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(24.0)])),
+            ],
+            options={
+                'db_table': 'tracking_combinedtimelog',
+                'managed': False,
+            },
+        ),
+    ]
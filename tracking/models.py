@@ -3,11 +3,38 @@ All the models for the tracking app
 """
 from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from djmoney.models.fields import MoneyField
 
 
-class Project(models.Model):
+class LoadedValuesMixin:
+    """
+    Remember the values a model instance was loaded from the db with, so
+    that what changed can be worked out when it is saved
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save in a transaction so that the derived data updated by the
+        post_save signal is committed together with the instance
+        """
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+        deferred_fields = self.get_deferred_fields()
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred_fields
+        }
+
+
+class Project(LoadedValuesMixin, models.Model):
     """
     Project that different employees work on
     """
@@ -17,7 +44,7 @@ class Project(models.Model):
         return self.name
 
 
-class Contract(models.Model):
+class Contract(LoadedValuesMixin, models.Model):
     """
     Contract representing the agreement between a User
     and a Project with the decided upon hourly rate
@@ -41,10 +68,10 @@ class Contract(models.Model):
         return f'User: {self.user} for Project: {self.project} ({self.hourly_price} hourly)'
 
 
-class Timelog(models.Model):
+class BaseTimelog(models.Model):
     """
-    Timelog represents the hours put in by a user under a contract
-    for a single day
+    Columns of a log of the hours put in under a contract on a single day,
+    shared by the hot and the archived logs
     """
     date = models.DateField()
     hours_worked = models.DecimalField(
@@ -54,10 +81,15 @@ class Timelog(models.Model):
     )
     contract = models.ForeignKey(
         'tracking.Contract',
-        related_name='time_logs',
-        on_delete=models.CASCADE
+        related_name='+',
+        on_delete=models.CASCADE,
+        # Lookups by contract are served by the (contract, date) constraint
+        db_index=False
     )
 
+    class Meta:
+        abstract = True
+
     @property
     def user(self):
         """
@@ -67,3 +99,251 @@ class Timelog(models.Model):
 
     def __str__(self):
         return f'Contract: {self.contract} for date: {self.date})'
+
+
+class Timelog(LoadedValuesMixin, BaseTimelog):
+    """
+    Timelog represents the hours put in by a user under a contract
+    for a single day. Only the logs after the archived periods are kept here
+    """
+    contract = models.ForeignKey(
+        'tracking.Contract',
+        related_name='time_logs',
+        on_delete=models.CASCADE,
+        # Lookups by contract are served by the (contract, date) constraint
+        db_index=False
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['contract', 'date'],
+                name='unique_timelog_contract_date'
+            ),
+        ]
+        indexes = [
+            # Admin lists filter on date and page by (date, id)
+            models.Index(fields=['-date', '-id'], name='timelog_date_id_idx'),
+        ]
+
+
+class ArchivedTimelog(BaseTimelog):
+    """
+    Timelog of a closed period, moved out of the Timelog table by
+    `tracking.services.archive_timelogs` with its id unchanged. Archived logs
+    are read only and still counted in the hours rollups
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['contract', 'date'],
+                name='unique_archived_timelog_contract_date'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['-date', '-id'], name='archived_timelog_date_id_idx'),
+        ]
+
+
+class CombinedTimelog(BaseTimelog):
+    """
+    Every log, hot or archived, read through a UNION ALL view of the Timelog
+    and ArchivedTimelog tables. Only read when a date range reaches into the
+    archived periods
+    """
+    contract = models.ForeignKey(
+        'tracking.Contract',
+        related_name='+',
+        on_delete=models.DO_NOTHING,
+        db_index=False
+    )
+
+    class Meta:
+        managed = False
+        db_table = 'tracking_combinedtimelog'
+
+
+class TimelogListing(models.Model):
+    """
+    A Timelog together with the owner, project and price of its contract, so
+    that the lists of logs are read from this one table without any join.
+    Only the logs in the Timelog table are listed. Kept up to date from the
+    Timelogs, Contracts and Projects by `tracking.services` in the same
+    transaction as their writes, never written to directly
+    """
+    # The id of the Timelog
+    id = models.BigIntegerField(primary_key=True)
+    date = models.DateField()
+    hours_worked = models.DecimalField(max_digits=4, decimal_places=2)
+    contract_id = models.BigIntegerField()
+    user_id = models.BigIntegerField()
+    project_id = models.BigIntegerField()
+    project_name = models.CharField(max_length=300)
+    hourly_price = MoneyField(max_digits=14, decimal_places=2, default_currency='USD')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['contract_id', 'date'],
+                name='unique_timelog_listing_contract_date'
+            ),
+        ]
+        indexes = [
+            # Every list pages by (date, id), for everyone, a user or a project
+            models.Index(fields=['-date', '-id'], name='timelog_listing_date_id_idx'),
+            models.Index(
+                fields=['user_id', '-date', '-id'], name='timelog_listing_user_idx'
+            ),
+            models.Index(
+                fields=['project_id', '-date', '-id'], name='timelog_listing_project_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'Listing of Timelog: {self.id}'
+
+
+class Invoice(models.Model):
+    """
+    Total of the hours worked under a contract in a month, at the hourly
+    price of the contract. Written by `tracking.invoices.generate_invoices`
+    """
+    contract = models.ForeignKey(
+        'tracking.Contract',
+        related_name='invoices',
+        on_delete=models.CASCADE,
+        # Lookups by contract are served by the (month, contract) constraint
+        db_index=False
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='invoices',
+        on_delete=models.CASCADE
+    )
+    # First day of the month
+    month = models.DateField()
+    hours = models.DecimalField(max_digits=12, decimal_places=2)
+    amount = MoneyField(max_digits=14, decimal_places=2, default_currency='USD')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['month', 'contract'],
+                name='unique_invoice_month_contract'
+            ),
+        ]
+
+    def __str__(self):
+        return f'Invoice of Contract: {self.contract_id} for {self.month:%Y-%m}: {self.amount}'
+
+
+class InvoiceShard(models.Model):
+    """
+    Range of contract ids whose invoices of a month were written, so that a
+    run of `tracking.invoices.generate_invoices` that was interrupted
+    resumes after the ranges it finished
+    """
+    month = models.DateField()
+    first_contract_id = models.BigIntegerField()
+    last_contract_id = models.BigIntegerField()
+    invoices = models.PositiveIntegerField()
+    completed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['month', 'first_contract_id', 'last_contract_id'],
+                name='unique_invoice_shard'
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            f'Invoices of Contracts {self.first_contract_id}-{self.last_contract_id} '
+            f'for {self.month:%Y-%m}'
+        )
+
+
+class Version(models.Model):
+    """
+    Counter stored under a key, moved on whenever the data it versions is
+    written, so that every process can tell whether what it cached or what
+    a client cached is still current. See `tracking.versions`
+    """
+    key = models.CharField(max_length=200, primary_key=True)
+    value = models.BigIntegerField()
+
+    def __str__(self):
+        return f'{self.key}: {self.value}'
+
+
+class DailyHours(models.Model):
+    """
+    Total hours a user worked on a project on a single day. Kept up to date
+    from the Timelogs by `tracking.services`, never written to directly
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='+',
+        on_delete=models.CASCADE,
+        # Lookups by user are served by the (user, project, date) constraint
+        db_index=False
+    )
+    project = models.ForeignKey(
+        'tracking.Project',
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    date = models.DateField()
+    hours = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'project', 'date'],
+                name='unique_daily_hours'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='daily_hours_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'User: {self.user_id} on Project: {self.project_id} for date: {self.date}'
+
+
+class WeeklyHours(models.Model):
+    """
+    Total hours a user worked on a project in a single ISO week, which is
+    identified by its Monday. Kept up to date from the Timelogs by
+    `tracking.services`, never written to directly
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='+',
+        on_delete=models.CASCADE,
+        # Lookups by user are served by the (user, project, week) constraint
+        db_index=False
+    )
+    project = models.ForeignKey(
+        'tracking.Project',
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    week = models.DateField()
+    hours = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'project', 'week'],
+                name='unique_weekly_hours'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['week'], name='weekly_hours_week_idx'),
+        ]
+
+    def __str__(self):
+        return f'User: {self.user_id} on Project: {self.project_id} for week: {self.week}'
@@ -1,8 +1,100 @@
 """
 Selectors to retrieve data from db for the tracking app
 """
+import datetime
 
-from .models import Contract, Timelog
+from django.conf import settings
+from django.db.models import (Count, DecimalField, Exists, F, Max, Min,
+                              OuterRef, Sum)
+from django.db.models.functions import (TruncDay, TruncMonth, TruncQuarter,
+                                        TruncWeek)
+
+from .models import (ArchivedTimelog, CombinedTimelog, Contract, DailyHours,
+                     InvoiceShard, Project, Timelog, TimelogListing,
+                     WeeklyHours)
+
+# Columns read by ContractReadSerializer and the nested ProjectSerializer
+CONTRACT_READ_FIELDS = (
+    'id',
+    'user',
+    'hourly_price',
+    'hourly_price_currency',
+    'project__id',
+    'project__name',
+)
+
+# Columns read by TimelogReadSerializer and everything nested under it
+TIMELOG_READ_FIELDS = (
+    'id',
+    'date',
+    'hours_worked',
+    *(f'contract__{field}' for field in CONTRACT_READ_FIELDS),
+)
+
+# Columns of a row of the timelog export, in order
+TIMELOG_EXPORT_FIELDS = (
+    'id',
+    'date',
+    'contract_id',
+    'contract__user_id',
+    'contract__project_id',
+    'hours_worked',
+    'contract__hourly_price',
+    'contract__hourly_price_currency',
+)
+
+# Columns of the TimelogListing table and the Timelog lookups they are
+# copied from, in order
+TIMELOG_LISTING_SOURCES = {
+    'id': 'id',
+    'date': 'date',
+    'hours_worked': 'hours_worked',
+    'contract_id': 'contract_id',
+    'user_id': 'contract__user_id',
+    'project_id': 'contract__project_id',
+    'project_name': 'contract__project__name',
+    'hourly_price': 'contract__hourly_price',
+    'hourly_price_currency': 'contract__hourly_price_currency',
+}
+
+# Columns the hours reports can be grouped by
+REPORT_GROUPS = {
+    'user': 'contract__user',
+    'project': 'contract__project',
+    'contract': 'contract',
+}
+
+# Periods the hours reports can be bucketed into, weeks start on Monday
+REPORT_PERIODS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+}
+
+# Totals outgrow the 4 digits of a single Timelog.hours_worked
+TOTAL_HOURS_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+
+def get_projects():
+    """
+    Get all the projects
+
+    Returns:
+        QuerySet: A qs of all the Project objects
+    """
+    return Project.objects.all()
+
+
+def get_contracts():
+    """
+    Get all the contracts, shaped for the contract read serializer so that
+    the nested project is loaded in the same query
+
+    Returns:
+        QuerySet: A qs of all the Contract objects
+    """
+    return Contract.objects.select_related('project').only(*CONTRACT_READ_FIELDS)
 
 
 def get_contracts_for_user(user_id):
@@ -15,20 +107,127 @@ def get_contracts_for_user(user_id):
     Returns:
         QuerySet: A qs of all the relevant Contract objects
     """
-    return Contract.objects.filter(user_id=user_id)
+    return get_contracts().filter(user_id=user_id)
+
+
+def get_archive_cutoff(today=None):
+    """
+    Get the date before which logs may have been moved to the archive. Every
+    log from that date on is in the Timelog table
+
+    Args:
+        today (date): Date the cutoff is counted back from, today if not given
+
+    Returns:
+        date: The first date that is never archived
+    """
+    today = today or datetime.date.today()
+    return today - datetime.timedelta(days=settings.TIMELOG_ARCHIVE_AFTER_DAYS)
+
+
+def reaches_archive(date_after=None):
+    """
+    Check whether the logs from the given date on may include archived ones
+
+    Args:
+        date_after (date): First date to include, from the oldest log if not
+            given (Optional)
+
+    Returns:
+        bool: Whether the logs have to be read from the CombinedTimelog view
+    """
+    return date_after is None or date_after < get_archive_cutoff()
+
+
+def get_timelog_model(include_archive=False):
+    """
+    Get the model to read the logs from, the Timelog table or the view of it
+    together with the archived logs
+    """
+    return CombinedTimelog if include_archive else Timelog
+
+
+def get_archived_until():
+    """
+    Get the date of the latest archived log, up to which no log can be
+    written anymore
+
+    Returns:
+        date: The date of the latest ArchivedTimelog, or None if there is none
+    """
+    return ArchivedTimelog.objects.aggregate(until=Max('date'))['until']
+
+
+def get_timelogs(include_archive=False):
+    """
+    Get all the logs, shaped for the timelog read serializer so that the
+    nested contract and project are loaded in the same query. Every log is
+    annotated with the `owner_id` of its contract for the permission checks
+
+    Args:
+        include_archive (bool): Whether to read the archived logs as well
+
+    Returns:
+        QuerySet: A qs of all the Timelog objects
+    """
+    return (
+        get_timelog_model(include_archive).objects
+        .select_related('contract__project')
+        .only(*TIMELOG_READ_FIELDS)
+        .annotate(owner_id=F('contract__user_id'))
+    )
 
 
-def get_timelogs_for_user(user_id):
+def get_timelogs_for_user(user_id, include_archive=False):
     """
     Get all the logs for the given user ID
 
     Args:
         user_id (int): Id of the User
+        include_archive (bool): Whether to read the archived logs as well
 
     Returns:
         QuerySet: A qs of all the relevant Timelog objects
     """
-    return Timelog.objects.filter(contract__user=user_id)
+    return get_timelogs(include_archive).filter(contract__user_id=user_id)
+
+
+def get_timelog_listings():
+    """
+    Get the listings of all the logs that are not archived, which hold
+    everything the lists show
+
+    Returns:
+        QuerySet: A qs of all the TimelogListing objects
+    """
+    return TimelogListing.objects.all()
+
+
+def get_timelog_listings_for_user(user_id):
+    """
+    Get the listings of all the logs of the given user ID that are not
+    archived
+
+    Args:
+        user_id (int): Id of the User
+
+    Returns:
+        QuerySet: A qs of all the relevant TimelogListing objects
+    """
+    return get_timelog_listings().filter(user_id=user_id)
+
+
+def get_timelog_listing_rows(timelogs):
+    """
+    Shape the given logs as the rows of their listings
+
+    Args:
+        timelogs (QuerySet): A qs of Timelog objects
+
+    Returns:
+        QuerySet: A qs of tuples with the columns in TIMELOG_LISTING_SOURCES
+    """
+    return timelogs.values_list(*TIMELOG_LISTING_SOURCES.values())
 
 
 def get_timelogs_for_contract(contract_id):
@@ -41,4 +240,284 @@ def get_timelogs_for_contract(contract_id):
     Returns:
         QuerySet: A qs of all the relevant Timelog objects
     """
-    return Timelog.objects.filter(contract_id=contract_id)
+    return get_timelogs().filter(contract_id=contract_id)
+
+
+def get_timelog_export_rows(timelogs):
+    """
+    Shape the given logs as plain rows for exporting, oldest first. Nothing
+    but the exported columns is loaded and no model instances are built
+
+    Args:
+        timelogs (QuerySet): A qs of the Timelog objects to export
+
+    Returns:
+        QuerySet: A qs of tuples with the columns in TIMELOG_EXPORT_FIELDS
+    """
+    return timelogs.order_by('date', 'id').values_list(*TIMELOG_EXPORT_FIELDS)
+
+
+def get_timelog_contract(contract_id, user_id, date, exclude_timelog_id=None):
+    """
+    Look up a contract a log is written under, checking with a single query
+    that it belongs to the user and whether it has another log on the date
+
+    Args:
+        contract_id (int): Id of the Contract
+        user_id (int): Id of the User the contract must belong to
+        date (date): Date of the log
+        exclude_timelog_id (int): Id of the Timelog being updated (Optional)
+
+    Returns:
+        tuple: The project id of the contract and whether it already has a
+        log on the date, or None if the user has no such contract
+    """
+    timelogs = Timelog.objects.filter(contract_id=OuterRef('id'), date=date)
+    if exclude_timelog_id is not None:
+        timelogs = timelogs.exclude(id=exclude_timelog_id)
+    return (
+        Contract.objects
+        .filter(id=contract_id, user_id=user_id)
+        .annotate(has_log=Exists(timelogs))
+        .values_list('project_id', 'has_log')
+        .first()
+    )
+
+
+def get_contract_ids_by_owner():
+    """
+    Get the id of the contract of every user on every project, with a single
+    query
+
+    Returns:
+        dict: Contract id of every (user_id, project_id) tuple
+    """
+    return {
+        (user_id, project_id): contract_id
+        for contract_id, user_id, project_id in Contract.objects.values_list(
+            'id', 'user_id', 'project_id'
+        ).iterator()
+    }
+
+
+def get_existing_timelog_keys(keys):
+    """
+    Find which of the given (contract, date) pairs already have a log, with
+    a single query
+
+    Args:
+        keys (iterable): (contract_id, date) tuples
+
+    Returns:
+        set: The (contract_id, date) tuples that have a Timelog
+    """
+    keys = set(keys)
+    if not keys:
+        return set()
+
+    dates = [date for _, date in keys]
+    return keys & set(
+        Timelog.objects.filter(
+            contract_id__in={contract_id for contract_id, _ in keys},
+            date__gte=min(dates),
+            date__lte=max(dates),
+        ).values_list('contract_id', 'date')
+    )
+
+
+def get_timelogs_in_range(date_after, date_before, user_id=None, project_id=None,
+                          contract_id=None):
+    """
+    Get the logs between the given dates (both inclusive), optionally only
+    the ones of the given user, project or contract. The archived logs are
+    read as well if the range reaches into the archived periods
+
+    Args:
+        date_after (date): First date to include
+        date_before (date): Last date to include
+        user_id (int): Id of the User (Optional)
+        project_id (int): Id of the Project (Optional)
+        contract_id (int): Id of the Contract (Optional)
+
+    Returns:
+        QuerySet: A qs of all the relevant Timelog objects
+    """
+    timelogs = get_timelog_model(reaches_archive(date_after)).objects.filter(
+        date__gte=date_after, date__lte=date_before
+    )
+    if user_id is not None:
+        timelogs = timelogs.filter(contract__user_id=user_id)
+    if project_id is not None:
+        timelogs = timelogs.filter(contract__project_id=project_id)
+    if contract_id is not None:
+        timelogs = timelogs.filter(contract_id=contract_id)
+    return timelogs
+
+
+def get_contract_id_range():
+    """
+    Get the lowest and highest contract ids
+
+    Returns:
+        tuple: The two ids, or (None, None) if there is no contract
+    """
+    ids = Contract.objects.aggregate(first=Min('id'), last=Max('id'))
+    return ids['first'], ids['last']
+
+
+def get_invoice_totals(month, month_end, first_contract_id, last_contract_id):
+    """
+    Total the hours of a month per contract, for the contracts in a range of
+    ids, with a single query
+
+    Args:
+        month (date): First day of the month
+        month_end (date): Last day of the month
+        first_contract_id (int): Lowest contract id of the range
+        last_contract_id (int): Highest contract id of the range
+
+    Returns:
+        list: A dict per contract with logs in the month, ordered by
+        `contract_id`, with its `user_id`, `hourly_price`,
+        `hourly_price_currency`, total `hours` and number of `logs`
+    """
+    return list(
+        get_timelogs_in_range(month, month_end)
+        .filter(contract_id__gte=first_contract_id, contract_id__lte=last_contract_id)
+        .values(
+            'contract_id',
+            user_id=F('contract__user_id'),
+            hourly_price=F('contract__hourly_price'),
+            hourly_price_currency=F('contract__hourly_price_currency'),
+        )
+        .annotate(hours=Sum('hours_worked', output_field=TOTAL_HOURS_FIELD), logs=Count('id'))
+        .order_by('contract_id')
+    )
+
+
+def get_completed_invoice_shards(month):
+    """
+    Get the ranges of contract ids whose invoices of a month were written
+
+    Args:
+        month (date): First day of the month
+
+    Returns:
+        set: (first_contract_id, last_contract_id) tuples
+    """
+    return set(
+        InvoiceShard.objects.filter(month=month).values_list(
+            'first_contract_id', 'last_contract_id'
+        )
+    )
+
+
+def get_hours_report(date_after, date_before, group_by, period=None, user_id=None,
+                     project_id=None, contract_id=None):
+    """
+    Total the hours worked between the given dates (both inclusive) in the
+    database, one row for every group and period. Reports by user or project
+    are read from the daily or weekly rollups, so they cost as much as the
+    number of days or weeks covered and not the number of logs
+
+    Args:
+        date_after (date): First date to include
+        date_before (date): Last date to include
+        group_by (str): One of the keys of REPORT_GROUPS
+        period (str): One of the keys of REPORT_PERIODS, the totals span
+            the whole date range if not given (Optional)
+        user_id (int): Only include the hours of this User (Optional)
+        project_id (int): Only include the hours on this Project (Optional)
+        contract_id (int): Only include the hours under this Contract (Optional)
+
+    Returns:
+        list: A dict per row with the group id under the `group_by` key, the
+        first day of the period under `period` and the `total_hours`
+    """
+    if group_by == 'contract' or contract_id is not None:
+        # A contract is a (user, project) pair, but the rollups cannot be
+        # joined back to it, so these are totalled from the logs
+        timelogs = get_timelogs_in_range(
+            date_after, date_before, user_id, project_id, contract_id
+        )
+        return _total_hours(
+            timelogs, REPORT_GROUPS[group_by], 'hours_worked', group_by,
+            REPORT_PERIODS[period]('date') if period else None
+        )
+
+    whole_weeks = date_after.weekday() == 0 and date_before.weekday() == 6
+    if period in ('week', None) and whole_weeks:
+        rollups = WeeklyHours.objects.filter(week__gte=date_after, week__lte=date_before)
+        period_expression = F('week') if period else None
+    else:
+        rollups = DailyHours.objects.filter(date__gte=date_after, date__lte=date_before)
+        period_expression = REPORT_PERIODS[period]('date') if period else None
+
+    if user_id is not None:
+        rollups = rollups.filter(user_id=user_id)
+    if project_id is not None:
+        rollups = rollups.filter(project_id=project_id)
+    return _total_hours(rollups, group_by, 'hours', group_by, period_expression)
+
+
+def _total_hours(queryset, group_field, hours_field, group_by, period_expression=None):
+    """
+    Sum the hours field of the queryset per group field and period, and
+    return the rows keyed by `period`, `group_by` and `total_hours`
+    """
+    columns = [group_field]
+    if period_expression is not None:
+        queryset = queryset.annotate(period=period_expression)
+        columns.insert(0, 'period')
+
+    rows = (
+        queryset
+        .values(*columns)
+        .annotate(total_hours=Sum(hours_field, output_field=TOTAL_HOURS_FIELD))
+        .order_by(*columns)
+    )
+    return [
+        {
+            **({'period': row['period']} if period_expression is not None else {}),
+            group_by: row[group_field],
+            'total_hours': row['total_hours'],
+        }
+        for row in rows
+    ]
+
+
+def get_daily_hours_totals():
+    """
+    Total the hours of all the logs per user, project and day, as stored in
+    the DailyHours rollup
+
+    Returns:
+        QuerySet: Dicts with `user`, `project`, `period` and `hours` keys,
+        ordered by user, project and period
+    """
+    return _get_hours_totals(F('date'))
+
+
+def get_weekly_hours_totals():
+    """
+    Total the hours of all the logs per user, project and ISO week, as
+    stored in the WeeklyHours rollup
+
+    Returns:
+        QuerySet: Dicts with `user`, `project`, `period` (the Monday of the
+        week) and `hours` keys, ordered by user, project and period
+    """
+    return _get_hours_totals(TruncWeek('date'))
+
+
+def _get_hours_totals(period):
+    """
+    Total the hours of all the logs, archived ones included, per user,
+    project and the given period
+    """
+    return (
+        CombinedTimelog.objects
+        .values(user=F('contract__user'), project=F('contract__project'), period=period)
+        .annotate(hours=Sum('hours_worked', output_field=TOTAL_HOURS_FIELD))
+        .order_by('user', 'project', 'period')
+    )
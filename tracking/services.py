@@ -0,0 +1,596 @@
+"""
+All the service functions to add data to the db for the tracking app
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from itertools import islice
+from operator import or_
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import FilteredRelation, Q
+
+from .earnings import CENT, invalidate_earnings
+from .models import (ArchivedTimelog, Contract, DailyHours, Invoice,
+                     InvoiceShard, Timelog, TimelogListing, WeeklyHours)
+from .selectors import (TIMELOG_LISTING_SOURCES, get_archive_cutoff,
+                        get_daily_hours_totals, get_timelog_listing_rows,
+                        get_weekly_hours_totals)
+from .versions import TIMELOGS, bump_versions
+
+# Contracts whose listings are refreshed by one statement, which keeps the
+# OR of their lookups well under the SQLite limit on expression depth
+LISTING_REFRESH_BATCH_SIZE = 500
+
+
+def get_week_start(date):
+    """
+    Return the Monday of the ISO week the given date falls in
+    """
+    return date - timedelta(days=date.weekday())
+
+
+def get_contract_owners(contract_ids, user_id=None):
+    """
+    Get the user and project of each of the given contracts
+
+    Args:
+        contract_ids (iterable): Ids of the Contracts
+        user_id (int): Leave out the contracts of other users (Optional)
+
+    Returns:
+        dict: (user_id, project_id) tuple for every contract id
+    """
+    contracts = Contract.objects.filter(id__in=set(contract_ids))
+    if user_id is not None:
+        contracts = contracts.filter(user_id=user_id)
+    return {
+        contract_id: (owner_id, project_id)
+        for contract_id, owner_id, project_id in contracts.values_list(
+            'id', 'user_id', 'project_id'
+        )
+    }
+
+
+def bulk_create_timelogs(entries, contract_owners):
+    """
+    Insert Timelogs with a single query and update everything derived from
+    them, all in one transaction
+
+    Args:
+        entries (list): Dicts with the `contract_id`, `date` and
+            `hours_worked` of every new log
+        contract_owners (dict): (user_id, project_id) of every contract in
+            entries
+
+    Returns:
+        list: The created Timelog objects
+    """
+    with transaction.atomic():
+        timelogs = Timelog.objects.bulk_create([Timelog(**entry) for entry in entries])
+        if any(timelog.pk is None for timelog in timelogs):
+            # Not every database returns the ids of bulk inserted rows
+            ids = {
+                (contract_id, date): timelog_id
+                for timelog_id, contract_id, date in Timelog.objects.filter(
+                    contract_id__in={timelog.contract_id for timelog in timelogs},
+                    date__in={timelog.date for timelog in timelogs},
+                ).values_list('id', 'contract_id', 'date')
+            }
+            for timelog in timelogs:
+                timelog.pk = ids[(timelog.contract_id, timelog.date)]
+
+        record_timelog_changes(
+            ((timelog.contract_id, timelog.date, timelog.hours_worked) for timelog in timelogs),
+            contract_owners
+        )
+    return timelogs
+
+
+def upsert_timelog(user_id, contract_id, date, hours_worked):
+    """
+    Create the log of the contract for the date, or update its hours if it
+    exists, and update everything derived from it, all in one transaction.
+    The log is written by a single upsert on the (contract, date) constraint,
+    which only overwrites the hours read just before, the ones the rollups
+    take out, and is tried again if a concurrent write changed them, so no
+    row is locked. A log that already has the hours is not written at all,
+    so sending the same request again changes nothing
+
+    Args:
+        user_id (int): Id of the User the contract must belong to
+        contract_id (int): Id of the Contract
+        date (date): Date of the log
+        hours_worked (Decimal): Hours worked on the date
+
+    Returns:
+        tuple: The id of the Timelog and whether it was created, or None if
+        the user has no such contract
+    """
+    with transaction.atomic():
+        while True:
+            existing = Contract.objects.filter(id=contract_id, user_id=user_id).annotate(
+                log=FilteredRelation('time_logs', condition=Q(time_logs__date=date))
+            ).values_list('log__id', 'log__hours_worked').first()
+            if existing is None:
+                return None
+            existing_id, previous_hours = existing
+            if previous_hours == hours_worked:
+                return existing_id, False
+
+            timelog_id = _upsert_timelog_row(
+                user_id, contract_id, date, hours_worked, previous_hours
+            )
+            if timelog_id is not None:
+                break
+
+        deltas = [] if existing_id is None else [(contract_id, date, -previous_hours)]
+        record_timelog_changes([(contract_id, date, hours_worked), *deltas])
+    return timelog_id, existing_id is None
+
+
+def _upsert_timelog_row(user_id, contract_id, date, hours_worked, previous_hours):
+    """
+    Insert the log, or set the hours of the existing one if they are still
+    the previous hours, None for a log that was not there. Returns the id of
+    the log, or None if nothing was written
+    """
+    fields = {field.attname: field for field in Timelog._meta.concrete_fields}
+    prep_hours = fields['hours_worked'].get_db_prep_save
+    table = connection.ops.quote_name(Timelog._meta.db_table)
+    with connection.cursor() as cursor:
+        # A NULL never equals the hours, so a log inserted meanwhile is kept
+        cursor.execute(
+            f'INSERT INTO {table} (contract_id, date, hours_worked) '
+            f'SELECT id, %s, %s FROM {connection.ops.quote_name(Contract._meta.db_table)} '
+            f'WHERE id = %s AND user_id = %s '
+            f'ON CONFLICT (contract_id, date) DO UPDATE '
+            f'SET hours_worked = excluded.hours_worked WHERE {table}.hours_worked = %s '
+            f'RETURNING id',
+            [
+                fields['date'].get_db_prep_save(date, connection),
+                prep_hours(hours_worked, connection),
+                contract_id,
+                user_id,
+                prep_hours(previous_hours, connection),
+            ]
+        )
+        written = cursor.fetchone()
+    return written and written[0]
+
+
+def apply_hours_deltas(deltas):
+    """
+    Add changes in the hours worked to the daily and weekly rollups
+
+    Args:
+        deltas (iterable): (user_id, project_id, date, hours) tuples, with
+            the hours negative for hours that were removed
+    """
+    daily = defaultdict(Decimal)
+    weekly = defaultdict(Decimal)
+    for user_id, project_id, date, hours in deltas:
+        daily[(user_id, project_id, date)] += hours
+        weekly[(user_id, project_id, get_week_start(date))] += hours
+
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                _apply_rollup_deltas(DailyHours, 'date', daily)
+                _apply_rollup_deltas(WeeklyHours, 'week', weekly)
+            return
+        except IntegrityError:
+            # A concurrent writer inserted one of the rows we were about to
+            # create, it will be picked up for update on the second attempt
+            if attempt:
+                raise
+
+
+def record_timelog_changes(deltas, contract_owners=None):
+    """
+    Update everything derived from the Timelogs after some of them were
+    created, changed or deleted. Every path that writes Timelogs without
+    sending model signals (bulk inserts, raw SQL) must report its changes here
+
+    Args:
+        deltas (iterable): (contract_id, date, hours) tuples, with the hours
+            negative for hours that were removed
+        contract_owners (dict): (user_id, project_id) of every contract in
+            deltas, looked up if not given (Optional)
+    """
+    deltas = list(deltas)
+    if contract_owners is None:
+        contract_owners = get_contract_owners(contract_id for contract_id, _, _ in deltas)
+
+    apply_timelog_deltas(deltas, contract_owners)
+    refresh_timelog_listings((contract_id, date) for contract_id, date, _ in deltas)
+    invalidate_earnings(date for _, date, _ in deltas)
+    bump_versions(TIMELOGS, (
+        contract_owners[contract_id][0]
+        for contract_id, _, _ in deltas if contract_id in contract_owners
+    ))
+
+
+def apply_timelog_deltas(deltas, contract_owners=None):
+    """
+    Add changes in the hours worked under contracts to the rollups
+
+    Args:
+        deltas (iterable): (contract_id, date, hours) tuples, with the hours
+            negative for hours that were removed
+        contract_owners (dict): (user_id, project_id) of every contract in
+            deltas, looked up if not given (Optional)
+    """
+    deltas = list(deltas)
+    if contract_owners is None:
+        contract_owners = get_contract_owners(contract_id for contract_id, _, _ in deltas)
+
+    apply_hours_deltas(
+        (*contract_owners[contract_id], date, hours)
+        for contract_id, date, hours in deltas
+        if contract_id in contract_owners
+    )
+
+
+def refresh_timelog_listings(keys):
+    """
+    Rewrite the listings of the logs of the given (contract_id, date) pairs
+    from the Timelog table, after the logs were created, changed or deleted
+
+    Args:
+        keys (iterable): (contract_id, date) tuples of the changed logs
+    """
+    keys = set(keys)
+    if not keys:
+        return
+
+    dates_by_contract = defaultdict(set)
+    for contract_id, date in keys:
+        dates_by_contract[contract_id].add(date)
+
+    # Only the changed pairs are rewritten, with one lookup per contract
+    contracts = iter(dates_by_contract.items())
+    with transaction.atomic():
+        while True:
+            batch = list(islice(contracts, LISTING_REFRESH_BATCH_SIZE))
+            if not batch:
+                return
+            lookup = reduce(or_, (
+                Q(contract_id=contract_id, date__in=dates) for contract_id, dates in batch
+            ))
+            TimelogListing.objects.filter(lookup).delete()
+            _insert_timelog_listings(Timelog.objects.filter(lookup))
+
+
+def update_contract_listings(contract):
+    """
+    Copy the owner, project and price of the contract to the listings of
+    its logs
+
+    Args:
+        contract (Contract): The Contract that changed
+    """
+    TimelogListing.objects.filter(contract_id=contract.id).update(
+        user_id=contract.user_id,
+        project_id=contract.project_id,
+        project_name=contract.project.name,
+        hourly_price=contract.hourly_price.amount,
+        hourly_price_currency=str(contract.hourly_price.currency),
+    )
+
+
+def update_project_listings(project):
+    """
+    Copy the name of the project to the listings of its logs
+
+    Args:
+        project (Project): The Project that changed
+    """
+    TimelogListing.objects.filter(project_id=project.id).update(project_name=project.name)
+
+
+def _insert_timelog_listings(timelogs):
+    """
+    Copy the given logs with the owner, project and price of their contracts
+    to the TimelogListing table with a single INSERT ... SELECT. Returns the
+    number of rows inserted
+    """
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(
+        quote_name(TimelogListing._meta.get_field(name).column) for name in TIMELOG_LISTING_SOURCES
+    )
+    sql, params = get_timelog_listing_rows(timelogs).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote_name(TimelogListing._meta.db_table)} ({columns}) {sql}', params
+        )
+        return cursor.rowcount
+
+
+def _apply_rollup_deltas(model, period_field, deltas):
+    """
+    Add the deltas keyed by (user_id, project_id, period) to the rows of the
+    given rollup model with a fixed number of queries
+    """
+    deltas = {key: hours for key, hours in deltas.items() if hours}
+    if not deltas:
+        return
+
+    periods = [period for _, _, period in deltas]
+    rows = model.objects.select_for_update().filter(
+        user_id__in={user_id for user_id, _, _ in deltas},
+        project_id__in={project_id for _, project_id, _ in deltas},
+        **{f'{period_field}__gte': min(periods), f'{period_field}__lte': max(periods)}
+    )
+    existing = {
+        (row.user_id, row.project_id, getattr(row, period_field)): row for row in rows
+    }
+
+    to_create, to_update, to_delete = [], [], []
+    for (user_id, project_id, period), hours in deltas.items():
+        row = existing.get((user_id, project_id, period))
+        if row is None:
+            # Nothing to subtract from if there is no row, e.g. it was
+            # removed together with its user or project
+            if hours > 0:
+                to_create.append(model(
+                    user_id=user_id,
+                    project_id=project_id,
+                    hours=hours,
+                    **{period_field: period}
+                ))
+            continue
+
+        row.hours += hours
+        if row.hours > 0:
+            to_update.append(row)
+        else:
+            to_delete.append(row.id)
+
+    model.objects.bulk_create(to_create)
+    model.objects.bulk_update(to_update, ['hours'])
+    model.objects.filter(id__in=to_delete).delete()
+
+
+def archive_timelogs(batch_size=1000, today=None):
+    """
+    Move the logs before the archive cutoff from the Timelog table to the
+    ArchivedTimelog table, one batch per transaction so that the Timelog
+    table is never locked for long. The logs keep their ids and stay counted
+    in the rollups and reports, only the lists that read the Timelog table
+    alone stop showing them
+
+    Args:
+        batch_size (int): Number of logs to move per transaction
+        today (date): Date the cutoff is counted back from, today if not given
+
+    Returns:
+        int: Number of logs archived
+    """
+    cutoff = get_archive_cutoff(today)
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(quote_name(field.column) for field in Timelog._meta.concrete_fields)
+    total = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                Timelog.objects.select_for_update()
+                .filter(date__lt=cutoff)
+                .order_by('date', 'id')
+                .values_list('id', 'contract_id')[:batch_size]
+            )
+            if not batch:
+                return total
+
+            ids = [timelog_id for timelog_id, _ in batch]
+            in_ids = f'WHERE id IN ({", ".join(["%s"] * len(ids))})'
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {quote_name(ArchivedTimelog._meta.db_table)} ({columns}) '
+                    f'SELECT {columns} FROM {quote_name(Timelog._meta.db_table)} {in_ids}',
+                    ids
+                )
+                cursor.execute(f'DELETE FROM {quote_name(Timelog._meta.db_table)} {in_ids}', ids)
+            TimelogListing.objects.filter(id__in=ids).delete()
+
+            owners = get_contract_owners(contract_id for _, contract_id in batch)
+            bump_versions(TIMELOGS, {user_id for user_id, _ in owners.values()})
+        total += len(batch)
+
+
+def write_invoices(month, first_contract_id, last_contract_id, totals):
+    """
+    Replace the invoices of a month for a range of contract ids with the
+    given totals, and mark the range as written, in one transaction. Writing
+    the same range again gives the same invoices
+
+    Args:
+        month (date): First day of the month
+        first_contract_id (int): Lowest contract id of the range
+        last_contract_id (int): Highest contract id of the range
+        totals (list): Dicts from `get_invoice_totals` for the range
+
+    Returns:
+        int: Number of invoices written
+    """
+    with transaction.atomic():
+        Invoice.objects.filter(
+            month=month,
+            contract_id__gte=first_contract_id,
+            contract_id__lte=last_contract_id,
+        ).delete()
+        Invoice.objects.bulk_create([
+            Invoice(
+                contract_id=total['contract_id'],
+                user_id=total['user_id'],
+                month=month,
+                hours=total['hours'],
+                amount=(total['hours'] * total['hourly_price']).quantize(CENT),
+                amount_currency=total['hourly_price_currency'],
+            )
+            for total in totals
+        ])
+        InvoiceShard.objects.update_or_create(
+            month=month,
+            first_contract_id=first_contract_id,
+            last_contract_id=last_contract_id,
+            defaults={'invoices': len(totals)},
+        )
+    return len(totals)
+
+
+def forget_invoice_shards(month):
+    """
+    Forget which ranges of contract ids had their invoices of a month
+    written, so that all of them are written again
+
+    Args:
+        month (date): First day of the month
+    """
+    InvoiceShard.objects.filter(month=month).delete()
+
+
+def rebuild_hours_rollups(batch_size=5000):
+    """
+    Replace the daily and weekly rollups with totals recomputed from all the
+    Timelogs
+
+    Args:
+        batch_size (int): Number of rows to insert per query
+
+    Returns:
+        tuple: Number of daily and weekly rows written
+    """
+    with transaction.atomic():
+        DailyHours.objects.all().delete()
+        WeeklyHours.objects.all().delete()
+        daily = _bulk_insert(
+            DailyHours,
+            (
+                DailyHours(
+                    user_id=row['user'],
+                    project_id=row['project'],
+                    date=row['period'],
+                    hours=row['hours']
+                )
+                for row in get_daily_hours_totals().iterator(chunk_size=batch_size)
+            ),
+            batch_size
+        )
+        weekly = _bulk_insert(
+            WeeklyHours,
+            (
+                WeeklyHours(
+                    user_id=row['user'],
+                    project_id=row['project'],
+                    week=row['period'],
+                    hours=row['hours']
+                )
+                for row in get_weekly_hours_totals().iterator(chunk_size=batch_size)
+            ),
+            batch_size
+        )
+    return daily, weekly
+
+
+def _bulk_insert(model, objects, batch_size):
+    """
+    Insert the objects from the given iterator batch by batch, without
+    holding all of them in memory. Returns the number of rows inserted
+    """
+    total = 0
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return total
+        model.objects.bulk_create(batch)
+        total += len(batch)
+
+
+def rebuild_timelog_listings():
+    """
+    Replace the listings with ones copied from all the Timelogs
+
+    Returns:
+        int: Number of listings written
+    """
+    with transaction.atomic():
+        TimelogListing.objects.all().delete()
+        return _insert_timelog_listings(Timelog.objects.all())
+
+
+def check_timelog_listings():
+    """
+    Compare the listings with the Timelogs and their contracts and projects,
+    streaming both sides in id order
+
+    Returns:
+        list: (timelog id, expected columns, stored columns) for every
+        listing that differs, with the columns of TIMELOG_LISTING_SOURCES
+        after the id, or None for a missing side
+    """
+    expected = (
+        (row[0], row[1:])
+        for row in get_timelog_listing_rows(Timelog.objects.order_by('id')).iterator()
+    )
+    stored = (
+        (row[0], row[1:])
+        for row in TimelogListing.objects.order_by('id').values_list(
+            *TIMELOG_LISTING_SOURCES
+        ).iterator()
+    )
+    return list(_diff_sorted(expected, stored))
+
+
+def check_hours_rollups():
+    """
+    Compare the daily and weekly rollups with totals recomputed from all the
+    Timelogs, streaming both sides in key order
+
+    Returns:
+        list: (model name, (user_id, project_id, period), expected hours,
+        stored hours) for every row that differs
+    """
+    mismatches = []
+    for model, period_field, totals in (
+            (DailyHours, 'date', get_daily_hours_totals()),
+            (WeeklyHours, 'week', get_weekly_hours_totals()),
+    ):
+        expected = (
+            ((row['user'], row['project'], row['period']), row['hours'])
+            for row in totals.iterator()
+        )
+        stored = (
+            ((row[0], row[1], row[2]), row[3])
+            for row in model.objects.order_by('user', 'project', period_field).values_list(
+                'user', 'project', period_field, 'hours'
+            ).iterator()
+        )
+        mismatches.extend(
+            (model.__name__, key, expected_hours, stored_hours)
+            for key, expected_hours, stored_hours in _diff_sorted(expected, stored)
+        )
+    return mismatches
+
+
+def _diff_sorted(expected, stored):
+    """
+    Merge two iterators of (key, hours) sorted by key and yield
+    (key, expected hours, stored hours) wherever they disagree
+    """
+    missing = (None, None)
+    expected_row, stored_row = next(expected, missing), next(stored, missing)
+    while expected_row != missing or stored_row != missing:
+        if stored_row == missing or (
+                expected_row != missing and expected_row[0] < stored_row[0]
+        ):
+            yield expected_row[0], expected_row[1], None
+            expected_row = next(expected, missing)
+        elif expected_row == missing or stored_row[0] < expected_row[0]:
+            yield stored_row[0], None, stored_row[1]
+            stored_row = next(stored, missing)
+        else:
+            if expected_row[1] != stored_row[1]:
+                yield expected_row[0], expected_row[1], stored_row[1]
+            expected_row, stored_row = next(expected, missing), next(stored, missing)
@@ -0,0 +1,243 @@
+"""
+Signal receivers keeping the derived data of the tracking app in sync with
+the Timelogs. Paths that bypass model signals (bulk inserts, raw SQL) call
+the functions in `tracking.services` themselves
+"""
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.backends.utils import format_number
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from .catalogue import invalidate_project
+from .earnings import invalidate_earnings
+from .models import (Contract, DailyHours, Project, Timelog, TimelogListing,
+                     WeeklyHours)
+from .services import (record_timelog_changes, update_contract_listings,
+                       update_project_listings)
+from .versions import CONTRACTS, PROJECTS, TIMELOGS, bump_versions
+
+TIMELOG_ROLLUP_FIELDS = ('contract_id', 'date', 'hours_worked')
+
+CONTRACT_EARNINGS_FIELDS = ('user_id', 'project_id', 'hourly_price', 'hourly_price_currency')
+
+PROJECT_LISTING_FIELDS = ('name',)
+
+# Contracts being deleted in this context, each with the on-commit callback
+# forgetting it. Their rollup rows are dropped wholesale, so the cascade
+# deleting their logs must not adjust them one by one. A delete that fails is
+# rolled back along with its callback, which makes its contract stale here
+deleting_contracts = ContextVar('deleting_contracts', default={})
+
+
+def get_previous_values(instance, fields):
+    """
+    Return the values of the given fields as they are stored in the db for
+    the given instance, or None if it has not been saved yet
+    """
+    if instance.pk is None:
+        return None
+
+    loaded = getattr(instance, '_loaded_values', {})
+    if all(field in loaded for field in fields):
+        return {field: loaded[field] for field in fields}
+
+    return type(instance).objects.filter(pk=instance.pk).values(*fields).first()
+
+
+def is_contract_being_deleted(contract_id, using):
+    """
+    Whether the Contract is being deleted by the transaction in progress,
+    forgetting it if its delete was rolled back
+    """
+    forget = deleting_contracts.get().get(contract_id)
+    if forget is None:
+        return False
+    if any(entry[1] is forget for entry in transaction.get_connection(using).run_on_commit):
+        return True
+    forget()
+    return False
+
+
+def forget_deleting_contract(contract_id):
+    """
+    Stop skipping the logs of the Contract
+    """
+    contracts = dict(deleting_contracts.get())
+    contracts.pop(contract_id, None)
+    deleting_contracts.set(contracts)
+
+
+def get_timelog_delta(values, sign=1):
+    """
+    Return the (contract_id, date, hours) rollup delta of the given Timelog
+    values, which may still be in the form they were assigned in. The hours
+    are rounded the same way as when they are saved
+    """
+    hours_field = Timelog._meta.get_field('hours_worked')
+    hours = Decimal(format_number(
+        hours_field.to_python(values['hours_worked']),
+        hours_field.max_digits,
+        hours_field.decimal_places
+    ))
+    return (
+        values['contract_id'],
+        Timelog._meta.get_field('date').to_python(values['date']),
+        sign * hours,
+    )
+
+
+@receiver(pre_save, sender=Timelog)
+def remember_previous_timelog(sender, instance, raw, **kwargs):
+    """
+    Keep the stored values of a Timelog that is about to be updated
+    """
+    instance._previous_values = None if raw else get_previous_values(
+        instance, TIMELOG_ROLLUP_FIELDS
+    )
+
+
+@receiver(post_save, sender=Timelog)
+def update_rollups_on_timelog_save(sender, instance, raw, **kwargs):
+    """
+    Move the hours of a saved Timelog from where they were counted to where
+    they are counted now
+    """
+    if raw:
+        return
+
+    current = {field: getattr(instance, field) for field in TIMELOG_ROLLUP_FIELDS}
+    deltas = [get_timelog_delta(current)]
+    if instance._previous_values:
+        deltas.append(get_timelog_delta(instance._previous_values, sign=-1))
+
+    # Writers that already looked up the (user, project) of the contract pass
+    # it on, so that it is not looked up again
+    contract_owner = getattr(instance, '_contract_owner', None)
+    contract_owners = None
+    if contract_owner and all(delta[0] == instance.contract_id for delta in deltas):
+        contract_owners = {instance.contract_id: contract_owner}
+    record_timelog_changes(deltas, contract_owners)
+
+
+@receiver(post_delete, sender=Timelog)
+def update_rollups_on_timelog_delete(sender, instance, **kwargs):
+    """
+    Remove the hours of a deleted Timelog from the rollups
+    """
+    if is_contract_being_deleted(instance.contract_id, kwargs['using']):
+        return
+
+    loaded = getattr(instance, '_loaded_values', {})
+    values = {
+        field: loaded.get(field, getattr(instance, field)) for field in TIMELOG_ROLLUP_FIELDS
+    }
+    record_timelog_changes([get_timelog_delta(values, sign=-1)])
+
+
+@receiver(pre_save, sender=Contract)
+def remember_previous_contract(sender, instance, raw, **kwargs):
+    """
+    Keep the stored owner and price of a Contract that is about to be updated
+    """
+    instance._previous_values = None if raw else get_previous_values(
+        instance, CONTRACT_EARNINGS_FIELDS
+    )
+
+
+@receiver(post_save, sender=Contract)
+def update_rollups_on_contract_save(sender, instance, raw, **kwargs):
+    """
+    Move the rollups of a Contract that changed hands. A user has a single
+    contract per project, so the rows of the old (user, project) pair are all
+    of this contract and the new pair has none yet. Earnings are recomputed
+    if the owner or the price changed
+    """
+    previous = getattr(instance, '_previous_values', None)
+    if raw:
+        return
+
+    # The logs are listed with their contract, so they change with it
+    owners = {instance.user_id, previous['user_id'] if previous else instance.user_id}
+    bump_versions(CONTRACTS, owners)
+    bump_versions(TIMELOGS, owners)
+    if not previous:
+        return
+
+    changed = [
+        field for field in CONTRACT_EARNINGS_FIELDS
+        if getattr(previous[field], 'amount', previous[field])
+        != getattr(getattr(instance, field), 'amount', getattr(instance, field))
+    ]
+    if changed:
+        invalidate_earnings()
+        update_contract_listings(instance)
+    if not {'user_id', 'project_id'} & set(changed):
+        return
+
+    for model in (DailyHours, WeeklyHours):
+        model.objects.filter(
+            user_id=previous['user_id'],
+            project_id=previous['project_id']
+        ).update(user_id=instance.user_id, project_id=instance.project_id)
+
+
+@receiver(pre_delete, sender=Contract)
+def drop_rollups_on_contract_delete(sender, instance, **kwargs):
+    """
+    Drop the rollups and listings of a Contract that is being deleted along
+    with its logs
+    """
+    invalidate_earnings()
+    bump_versions(CONTRACTS, [instance.user_id])
+    bump_versions(TIMELOGS, [instance.user_id])
+    for model in (DailyHours, WeeklyHours):
+        model.objects.filter(user_id=instance.user_id, project_id=instance.project_id).delete()
+    TimelogListing.objects.filter(contract_id=instance.id).delete()
+
+    def forget():
+        forget_deleting_contract(instance.id)
+
+    transaction.on_commit(forget, using=kwargs['using'])
+    deleting_contracts.set({**deleting_contracts.get(), instance.id: forget})
+
+
+@receiver(post_delete, sender=Contract)
+def forget_deleted_contract(sender, instance, **kwargs):
+    """
+    The logs of the deleted Contract are gone, stop skipping them
+    """
+    forget_deleting_contract(instance.id)
+
+
+@receiver(pre_save, sender=Project)
+def remember_previous_project(sender, instance, raw, **kwargs):
+    """
+    Keep the stored name of a Project that is about to be updated
+    """
+    instance._previous_values = None if raw else get_previous_values(
+        instance, PROJECT_LISTING_FIELDS
+    )
+
+
+@receiver(post_save, sender=Project)
+def update_listings_on_project_save(sender, instance, raw, **kwargs):
+    """
+    Rename the project in the listings of its logs
+    """
+    previous = getattr(instance, '_previous_values', None)
+    if not raw and previous and previous['name'] != instance.name:
+        update_project_listings(instance)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def bump_project_versions(sender, instance, **kwargs):
+    """
+    Every user sees all the projects, so any change is a change for everyone
+    """
+    bump_versions(PROJECTS)
+    invalidate_project(instance.id)
@@ -0,0 +1,184 @@
+"""
+Tests for the archiving of the logs of closed periods
+"""
+import datetime
+import json
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from tracking.models import ArchivedTimelog, Timelog
+from tracking.selectors import get_archive_cutoff
+from tracking.services import check_hours_rollups
+from tracking.tests.factories import ContractFactory, TimelogFactory
+
+
+@pytest.fixture(name='archived')
+def archived_logs():
+    """
+    Fixture to get a contract with three archived logs and one recent log,
+    and the ids of the archived ones
+    """
+    contract = ContractFactory(hourly_price=Decimal('10'))
+    cutoff = get_archive_cutoff()
+    old_logs = [
+        TimelogFactory(
+            contract=contract, date=cutoff - datetime.timedelta(days=days), hours_worked=1
+        )
+        for days in (30, 20, 10)
+    ]
+    TimelogFactory(contract=contract, date=cutoff, hours_worked=2)
+    call_command('archive_timelogs', '--batch-size', '2', stdout=StringIO())
+    return contract, {log.id for log in old_logs}
+
+
+def get_listed_ids(client, url, **params):
+    """
+    Return the ids of the logs listed at the url with the given query params,
+    and the SQL the listing ran
+    """
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url, params)
+    assert response.status_code == status.HTTP_200_OK
+    sql = ' '.join(query['sql'] for query in context.captured_queries)
+    return {log['id'] for log in response.json()['results']}, sql
+
+
+class TestArchiveTimelogs:
+    """
+    Test that the logs before the cutoff are moved to the archive and that
+    the reads only look at the archive when they have to
+    """
+
+    @pytest.mark.django_db
+    def test_old_logs_are_moved_with_their_ids(self, archived):
+        """
+        Test that only the logs before the cutoff are moved, and that they
+        are still counted in the rollups
+        """
+        contract, archived_ids = archived
+        assert set(ArchivedTimelog.objects.values_list('id', flat=True)) == archived_ids
+        assert list(Timelog.objects.values_list('date', flat=True)) == [get_archive_cutoff()]
+        assert check_hours_rollups() == []
+
+        out = StringIO()
+        call_command('archive_timelogs', stdout=out)
+        assert 'Archived 0 logs' in out.getvalue()
+
+    @pytest.mark.django_db
+    def test_lists_only_read_the_archive_for_archived_periods(self, client, archived):
+        """
+        Test that the lists read the Timelog table alone unless the dates
+        reach into the archived periods
+        """
+        contract, archived_ids = archived
+        client.force_login(contract.user)
+        url = reverse('timelog_list')
+        recent_id = Timelog.objects.get().id
+
+        ids, sql = get_listed_ids(client, url)
+        assert ids == {recent_id}
+        assert 'tracking_combinedtimelog' not in sql
+
+        ids, sql = get_listed_ids(client, url, date_after=get_archive_cutoff())
+        assert ids == {recent_id}
+        assert 'tracking_combinedtimelog' not in sql
+
+        day = get_archive_cutoff() - datetime.timedelta(days=20)
+        assert get_listed_ids(client, url, date=day)[0] < archived_ids
+        assert get_listed_ids(client, url, date_before=get_archive_cutoff())[0] == {
+            recent_id, *archived_ids
+        }
+        user_url = reverse('timelog_list_for_user', kwargs={'user_id': contract.user_id})
+        ids = get_listed_ids(client, user_url, date_after=day)[0]
+        assert ids == {recent_id, *archived_ids} - {min(archived_ids)}
+
+    @pytest.mark.django_db
+    def test_exports_and_reports_are_complete(self, client, archived):
+        """
+        Test that the exports and reports include the archived logs
+        """
+        contract, _ = archived
+        client.force_login(contract.user)
+
+        response = client.get(reverse('timelog_export'))
+        assert len(b''.join(response.streaming_content).splitlines()) == 5
+
+        params = {
+            'date_after': get_archive_cutoff() - datetime.timedelta(days=60),
+            'date_before': get_archive_cutoff(),
+            'group_by': 'contract',
+        }
+        hours = client.get(reverse('hours_report'), params).json()['results']
+        assert hours == [{'contract': contract.id, 'total_hours': '5.00'}]
+        earnings = client.get(reverse('earnings_report'), params).json()['results']
+        assert earnings == [{'contract': contract.id, 'currency': 'USD', 'amount': '50.00'}]
+
+    @pytest.mark.django_db
+    def test_archived_periods_are_read_only(self, client, archived):
+        """
+        Test that no log can be written on or before the latest archived date
+        """
+        contract, _ = archived
+        client.force_login(contract.user)
+        archived_date = str(get_archive_cutoff() - datetime.timedelta(days=10))
+        entry = {'contract': contract.id, 'date': archived_date, 'hours_worked': 1}
+
+        response = client.post(
+            reverse('timelog_list_for_user', kwargs={'user_id': contract.user_id}), entry
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'archived' in response.json()['date'][0]
+
+        response = client.post(
+            reverse('timelog_bulk_create_for_user', kwargs={'user_id': contract.user_id}),
+            json.dumps([entry]),
+            content_type='application/json'
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'archived' in response.json()[0]['date'][0]
+
+        response = client.put(
+            reverse('timelog_upsert_for_user', kwargs={
+                'user_id': contract.user_id,
+                'contract_id': contract.id,
+                'date': archived_date,
+            }),
+            {'hours_worked': 1},
+            content_type='application/json'
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert ArchivedTimelog.objects.count() == 3
+
+    @pytest.mark.django_db
+    def test_recent_dates_are_not_looked_up_in_the_archive(self, client, archived):
+        """
+        Test that logs dated from the cutoff on are written without reading
+        the archive, one at a time or in bulk
+        """
+        contract, _ = archived
+        client.force_login(contract.user)
+        user_kwargs = {'user_id': contract.user_id}
+        dates = [str(get_archive_cutoff() + datetime.timedelta(days=day)) for day in (1, 2)]
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.post(
+                reverse('timelog_list_for_user', kwargs=user_kwargs),
+                {'contract': contract.id, 'date': dates[0], 'hours_worked': 1}
+            )
+            assert response.status_code == status.HTTP_201_CREATED
+            response = client.post(
+                reverse('timelog_bulk_create_for_user', kwargs=user_kwargs),
+                json.dumps([{'contract': contract.id, 'date': dates[1], 'hours_worked': 1}]),
+                content_type='application/json'
+            )
+            assert response.status_code == status.HTTP_201_CREATED
+        assert not any(
+            'tracking_archivedtimelog' in query['sql'] for query in context.captured_queries
+        )
@@ -0,0 +1,124 @@
+"""
+Tests for the async views of the ASGI entry point
+"""
+import asyncio
+import threading
+
+import pytest
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import URLResolver, get_resolver, reverse
+from rest_framework import status
+
+from time_tracking_system.async_urls import ASYNC_ROUTES
+from time_tracking_system.async_views import AsyncReadsASGIHandler, async_view
+from tracking.tests.api.test_instrumentation import parse_server_timing
+from tracking.tests.factories import TimelogFactory
+from users.tests.factories import UserFactory
+from users.tokens import ClaimsRefreshToken
+
+
+def asgi_get(path, user):
+    """
+    Send a GET request for the path to the ASGI handler as the user, and
+    return the status, headers and body of the response
+    """
+    token = ClaimsRefreshToken.for_user(user).access_token
+
+    async def send_request():
+        communicator = ApplicationCommunicator(AsyncReadsASGIHandler(), {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'query_string': b'',
+            'root_path': '',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Bearer {token}'.encode()),
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': ('testserver', 80),
+        })
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        start = await communicator.receive_output(timeout=5)
+        body = await communicator.receive_output(timeout=5)
+        return start['status'], dict(start['headers']), body['body']
+
+    return asyncio.run(send_request())
+
+
+def get_callbacks(patterns):
+    """
+    Return the view of every named route in the url patterns
+    """
+    callbacks = {}
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            callbacks.update(get_callbacks(pattern.url_patterns))
+        elif pattern.name:
+            callbacks[pattern.name] = pattern.callback
+    return callbacks
+
+
+class TestAsyncViews:
+    """
+    Test that the ASGI handler serves the read routes with async views
+    """
+
+    def test_read_routes_are_async(self):
+        """
+        Test that only the listed routes are served by coroutine functions
+        """
+        callbacks = get_callbacks(get_resolver('time_tracking_system.async_urls').url_patterns)
+        async_routes = {
+            name for name, callback in callbacks.items()
+            if asyncio.iscoroutinefunction(callback)
+        }
+        assert async_routes == set(ASYNC_ROUTES)
+
+    def test_only_reads_run_in_the_pool(self):
+        """
+        Test that the writes to an async route run in the thread Django runs
+        the sync views in, and only the reads in the thread pool
+        """
+        threads = {}
+
+        def view(request):
+            threads[request.method] = threading.current_thread()
+            return HttpResponse()
+
+        wrapper = async_view(view)
+        factory = RequestFactory()
+
+        async def send_requests():
+            for method in ('get', 'post', 'delete'):
+                await wrapper(getattr(factory, method)('/api/projects/'))
+            return await sync_to_async(threading.current_thread, thread_sensitive=True)()
+
+        shared_thread = asyncio.run(send_requests())
+        assert threads['POST'] is shared_thread and threads['DELETE'] is shared_thread
+        assert threads['GET'] is not shared_thread
+
+    @pytest.mark.django_db(transaction=True)
+    def test_same_response_as_the_sync_view(self, client):
+        """
+        Test that a page of logs is the same under ASGI, with its queries
+        measured in the thread the view ran in
+        """
+        user = UserFactory()
+        TimelogFactory.create_batch(3, contract__user=user)
+        client.force_login(user)
+        expected = client.get(reverse('timelog_list'))
+
+        status_code, headers, body = asgi_get(reverse('timelog_list'), user)
+
+        assert status_code == status.HTTP_200_OK
+        assert body == expected.content
+        metrics = parse_server_timing(headers[b'Server-Timing'].decode())
+        assert metrics['db'][1] != '0 queries'
+        assert 'serialize' in metrics
@@ -0,0 +1,122 @@
+"""
+Tests for the cache of the serialized projects behind the project views
+"""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from tracking.tests.factories import ProjectFactory
+from users.tests.factories import UserFactory
+
+
+def count_project_queries(client, url):
+    """
+    GET the url and return the response and the number of project queries
+    """
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    return response, sum(
+        'tracking_project' in query['sql'] for query in context.captured_queries
+    )
+
+
+class TestProjectCatalogue:
+    """
+    Test that project reads are served from the cache until an admin writes
+    """
+
+    @pytest.mark.django_db
+    def test_pages_and_details_are_cached(self, client):
+        """
+        Test that repeated reads of a page or a project do not query the
+        projects and return the same data
+        """
+        project = ProjectFactory()
+        ProjectFactory.create_batch(2)
+        client.force_login(UserFactory())
+
+        for url in (reverse('project_list'), reverse('project_detail', args=[project.id])):
+            first, queries = count_project_queries(client, url)
+            assert queries
+            second, queries = count_project_queries(client, url)
+            assert not queries
+            assert second.status_code == status.HTTP_200_OK
+            assert second.json() == first.json()
+
+    @pytest.mark.django_db
+    def test_pages_are_cached_per_query(self, client):
+        """
+        Test that every page of the list is cached on its own
+        """
+        ProjectFactory.create_batch(3)
+        client.force_login(UserFactory())
+        url = reverse('project_list')
+
+        first_page = client.get(f'{url}?limit=2').json()
+        second_page = client.get(f'{url}?limit=2&offset=2').json()
+        assert [project['id'] for project in first_page['results']] != [
+            project['id'] for project in second_page['results']
+        ]
+        assert client.get(f'{url}?limit=2').json() == first_page
+
+    @pytest.mark.django_db
+    def test_admin_writes_invalidate_the_written_project(self, client):
+        """
+        Test that an update drops the pages and the written project, but
+        leaves the other projects cached
+        """
+        project, other_project = ProjectFactory.create_batch(2)
+        client.force_login(UserFactory(is_staff=True))
+        list_url = reverse('project_list')
+        detail_url = reverse('project_detail', args=[project.id])
+        other_url = reverse('project_detail', args=[other_project.id])
+        for url in (list_url, detail_url, other_url):
+            client.get(url)
+
+        response = client.patch(detail_url, {'name': 'Renamed'}, content_type='application/json')
+        assert response.status_code == status.HTTP_200_OK
+
+        assert client.get(detail_url).json()['name'] == 'Renamed'
+        assert 'Renamed' in [project['name'] for project in client.get(list_url).json()['results']]
+        _, queries = count_project_queries(client, other_url)
+        assert not queries
+
+    @pytest.mark.django_db
+    def test_created_and_deleted_projects_are_listed(self, client):
+        """
+        Test that creating or deleting a project drops the cached pages and
+        the deleted project
+        """
+        project = ProjectFactory()
+        client.force_login(UserFactory(is_staff=True))
+        list_url = reverse('project_list')
+        detail_url = reverse('project_detail', args=[project.id])
+        assert client.get(list_url).json()['count'] == 1
+        client.get(detail_url)
+
+        client.post(list_url, {'name': 'New'})
+        assert client.get(list_url).json()['count'] == 2
+
+        client.delete(detail_url)
+        assert client.get(list_url).json()['count'] == 1
+        assert client.get(detail_url).status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.django_db
+    def test_stats_count_hits_and_misses(self, client):
+        """
+        Test that the stats endpoint reports the lookups to admins only
+        """
+        project = ProjectFactory()
+        url = reverse('project_detail', args=[project.id])
+        stats_url = reverse('project_cache_stats')
+        client.force_login(UserFactory())
+        for _ in range(3):
+            client.get(url)
+        assert client.get(stats_url).status_code == status.HTTP_403_FORBIDDEN
+
+        client.force_login(UserFactory(is_staff=True))
+        response = client.get(stats_url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {'hits': 2, 'misses': 1, 'hit_ratio': 2 / 3}
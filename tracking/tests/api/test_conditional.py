@@ -0,0 +1,192 @@
+"""
+Tests for the ETags and 304 responses of the tracking api reads
+"""
+import datetime
+from io import StringIO
+
+import pytest
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from tracking.tests.factories import (ContractFactory, ProjectFactory,
+                                      TimelogFactory)
+from tracking.tests.test_imports import write_csv
+from users.tests.factories import UserFactory
+
+
+def get_etag(client, url):
+    """
+    GET the url and return the ETag of the response
+    """
+    response = client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    return response['ETag']
+
+
+def is_fresh(client, url, etag):
+    """
+    Whether the url answers with 304 to a request with the given ETag
+    """
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    return response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+class TestConditionalGet:
+    """
+    Test that unchanged reads are answered with 304 until the data changes
+    """
+
+    @pytest.mark.django_db
+    def test_not_modified_runs_no_tracking_queries(self, client):
+        """
+        Test that a matching ETag is answered by reading the versions only,
+        without querying the logs
+        """
+        user = UserFactory()
+        TimelogFactory.create_batch(3, contract__user=user)
+        client.force_login(user)
+        url = reverse('timelog_list')
+        etag = get_etag(client, url)
+
+        with CaptureQueriesContext(connection) as context:
+            assert is_fresh(client, url, etag)
+        tables = [
+            query['sql'] for query in context.captured_queries if 'tracking_' in query['sql']
+        ]
+        assert len(tables) == 1 and 'tracking_version' in tables[0]
+        assert not is_fresh(client, f'{url}?limit=1', etag)
+
+    @pytest.mark.django_db
+    def test_writes_change_the_etag_of_their_owner_only(
+            self, client, django_capture_on_commit_callbacks
+    ):
+        """
+        Test that a log written for a user changes the ETags of that user
+        and, once committed, of the admin, but not of other users
+        """
+        user, other = UserFactory(), UserFactory()
+        contract = ContractFactory(user=user)
+        ContractFactory(user=other)
+        admin = UserFactory(is_staff=True)
+        url = reverse('timelog_list')
+
+        etags = {}
+        for viewer in (user, other, admin):
+            client.force_login(viewer)
+            etags[viewer] = get_etag(client, url)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            TimelogFactory(contract=contract, date=datetime.date(2022, 1, 3))
+
+        for viewer, fresh in ((user, False), (other, True), (admin, False)):
+            client.force_login(viewer)
+            assert is_fresh(client, url, etags[viewer]) is fresh
+
+    @pytest.mark.django_db
+    def test_writes_do_not_lock_the_version_of_everyone(
+            self, django_capture_on_commit_callbacks
+    ):
+        """
+        Test that the transaction of a write only moves on the version of its
+        owner, and the version shared by all the writers after it commits
+        """
+        contract = ContractFactory()
+        shared = "'tracking:versions:timelogs'"
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            with CaptureQueriesContext(connection) as context:
+                TimelogFactory(contract=contract, date=datetime.date(2022, 1, 3))
+        assert any(
+            f"'tracking:versions:timelogs:user:{contract.user_id}'" in query['sql']
+            for query in context.captured_queries
+        )
+        assert not any(shared in query['sql'] for query in context.captured_queries)
+
+        with CaptureQueriesContext(connection) as context:
+            for callback in callbacks:
+                callback()
+        assert any(shared in query['sql'] for query in context.captured_queries)
+
+    @pytest.mark.django_db
+    def test_nested_resources_change_the_etag(self, client, django_capture_on_commit_callbacks):
+        """
+        Test that the logs and contracts lists change with the projects and
+        contracts shown in them
+        """
+        timelog = TimelogFactory()
+        contract = timelog.contract
+        client.force_login(contract.user)
+        urls = [reverse('timelog_list'), reverse('contract_list'), reverse('project_list')]
+        etags = [get_etag(client, url) for url in urls]
+
+        contract.project.name = 'Renamed'
+        with django_capture_on_commit_callbacks(execute=True):
+            contract.project.save()
+        assert not any(is_fresh(client, url, etag) for url, etag in zip(urls, etags))
+
+        etags = [get_etag(client, url) for url in urls]
+        contract.hourly_price = '99.00'
+        with django_capture_on_commit_callbacks(execute=True):
+            contract.save()
+        assert [is_fresh(client, url, etag) for url, etag in zip(urls, etags)] == [
+            False, False, True
+        ]
+
+    @pytest.mark.django_db
+    def test_detail_and_user_lists_are_tagged(self, client):
+        """
+        Test that details and the lists of a user are answered with 304 too
+        """
+        timelog = TimelogFactory()
+        user = timelog.contract.user
+        client.force_login(user)
+        urls = [
+            reverse('timelog_detail', kwargs={'pk': timelog.id}),
+            reverse('timelog_list_for_user', kwargs={'user_id': user.id}),
+            reverse('contract_detail', kwargs={'pk': timelog.contract_id}),
+            reverse('contract_list_for_user', kwargs={'user_id': user.id}),
+            reverse('project_detail', kwargs={'pk': ProjectFactory().id}),
+        ]
+        for url in urls:
+            assert is_fresh(client, url, get_etag(client, url))
+
+    @pytest.mark.django_db
+    def test_versions_are_shared_by_every_process(self, client):
+        """
+        Test that the versions outlive the memory of the process, so that a
+        process which cached nothing yet answers with the same ETag
+        """
+        user = UserFactory()
+        TimelogFactory(contract__user=user)
+        client.force_login(user)
+        url = reverse('timelog_list')
+        etag = get_etag(client, url)
+
+        for cache in caches.all():
+            cache.clear()
+        assert is_fresh(client, url, etag)
+
+    @pytest.mark.django_db
+    def test_writes_outside_the_api_change_the_etag(self, client, tmp_path):
+        """
+        Test that logs imported by a management command change the ETag of
+        their owner, as seen by a process whose caches were never told
+        """
+        contract = ContractFactory()
+        client.force_login(contract.user)
+        url = reverse('timelog_list')
+        etag = get_etag(client, url)
+
+        path = write_csv(tmp_path / 'logs.csv', [
+            (contract.user_id, contract.project_id, datetime.date(2022, 1, 3), '7.5')
+        ])
+        call_command('import_timelogs', path, stdout=StringIO())
+        for cache in caches.all():
+            cache.clear()
+
+        assert not is_fresh(client, url, etag)
+        assert get_etag(client, url) != etag
@@ -0,0 +1,84 @@
+"""
+Tests for the Server-Timing instrumentation of the api views
+"""
+import json
+import logging
+import re
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from tracking.tests.factories import TimelogFactory
+from users.tests.factories import UserFactory
+
+
+def parse_server_timing(header):
+    """
+    Return the duration and description of every metric in a Server-Timing
+    header
+    """
+    metrics = {}
+    for entry in header.split(', '):
+        name, *params = entry.split(';')
+        params = dict(param.split('=', 1) for param in params)
+        metrics[name] = (float(params['dur']), params.get('desc', '').strip('"'))
+    return metrics
+
+
+class TestServerTiming:
+    """
+    Test that the durations of a request are sent in a Server-Timing header
+    """
+
+    @pytest.mark.django_db
+    def test_timings_of_a_list_page(self, client):
+        """
+        Test that the SQL, authentication, permission, view and render
+        durations are all measured, and the queries counted
+        """
+        user = UserFactory()
+        TimelogFactory.create_batch(3, contract__user=user)
+        client.force_login(user)
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(reverse('timelog_list'))
+
+        assert response.status_code == status.HTTP_200_OK
+        metrics = parse_server_timing(response['Server-Timing'])
+        assert list(metrics) == ['db', 'auth', 'perm', 'serialize', 'render', 'total']
+        assert metrics['db'][1] == f'{len(context.captured_queries)} queries'
+        assert all(duration >= 0 for duration, _ in metrics.values())
+        assert sum(metrics[name][0] for name in metrics if name != 'total') <= (
+            metrics['total'][0] + 0.1
+        )
+
+    @pytest.mark.django_db
+    def test_timings_of_a_denied_request(self, client):
+        """
+        Test that a request denied before reaching the view is still timed
+        """
+        response = client.get(reverse('timelog_list'))
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        metrics = parse_server_timing(response['Server-Timing'])
+        assert {'db', 'perm', 'render', 'total'} <= set(metrics)
+
+    @pytest.mark.django_db
+    def test_timings_are_logged_if_enabled(self, client, settings, caplog):
+        """
+        Test that a JSON line is logged per request when enabled
+        """
+        settings.SERVER_TIMING_LOG = True
+        client.force_login(UserFactory())
+
+        with caplog.at_level(logging.INFO, logger='time_tracking_system.instrumentation'):
+            client.get(reverse('project_list'))
+
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record['path'] == reverse('project_list')
+        assert record['status'] == status.HTTP_200_OK
+        assert isinstance(record['queries'], int)
+        assert re.fullmatch(r'\d+\.?\d*', str(record['total']))
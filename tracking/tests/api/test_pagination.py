@@ -0,0 +1,112 @@
+"""
+Tests for the keyset pagination of the tracking api list views
+"""
+import datetime
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from tracking.tests.factories import ContractFactory, TimelogFactory
+from users.tests.factories import UserFactory
+
+
+def walk_pages(client, url):
+    """
+    Follow the next link of every page starting at the given url and return
+    the ids of all the results in the order they were seen
+    """
+    ids = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        ids.extend(result['id'] for result in response.data['results'])
+        url = response.data['next']
+    return ids
+
+
+class TestTimelogKeysetPagination:
+    """
+    Test that timelogs are paginated by (date, id) newest first
+    """
+
+    @pytest.mark.django_db
+    def test_pages_follow_date_and_id_ordering(self, client):
+        """
+        Test that following the next links visits every log exactly once in
+        order, and following the previous links walks back to the start
+        """
+        user = UserFactory()
+        contracts = ContractFactory.create_batch(3, user=user)
+        # Several logs share a date so that the id tie-breaker matters
+        for day in range(4):
+            for contract in contracts:
+                TimelogFactory(contract=contract, date=datetime.date(2022, 1, 1 + day))
+
+        expected = [
+            log.id for log in sorted(
+                (log for contract in contracts for log in contract.time_logs.all()),
+                key=lambda log: (log.date, log.id),
+                reverse=True
+            )
+        ]
+
+        client.force_login(user)
+        url = reverse('timelog_list_for_user', kwargs={'user_id': user.id})
+        assert walk_pages(client, f'{url}?limit=5') == expected
+
+        page = client.get(f'{url}?limit=5').data
+        while page['next']:
+            page = client.get(page['next']).data
+
+        backwards = []
+        while page:
+            backwards[:0] = [result['id'] for result in page['results']]
+            page = client.get(page['previous']).data if page['previous'] else None
+        assert backwards == expected
+
+    @pytest.mark.django_db
+    def test_pages_do_not_run_a_count_query(self, client):
+        """
+        Test that no COUNT(*) is run for a page
+        """
+        user = UserFactory()
+        TimelogFactory.create_batch(3, contract__user=user)
+        client.force_login(user)
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(reverse('timelog_list'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert 'count' not in response.data
+        assert not any('COUNT(' in query['sql'] for query in context.captured_queries)
+
+    @pytest.mark.django_db
+    def test_invalid_cursor_is_not_found(self, client):
+        """
+        Test that a tampered cursor is rejected
+        """
+        client.force_login(UserFactory())
+        for cursor in ('garbage', 'W1siYWJjIiwiMSJdLGZhbHNlXQ=='):
+            response = client.get(reverse('timelog_list'), {'cursor': cursor})
+            assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+class TestContractKeysetPagination:
+    """
+    Test that contracts are paginated by id
+    """
+
+    @pytest.mark.django_db
+    def test_pages_follow_id_ordering(self, client):
+        """
+        Test that following the next links visits every contract in id order
+        """
+        user = UserFactory()
+        contracts = ContractFactory.create_batch(7, user=user)
+        client.force_login(user)
+
+        url = reverse('contract_list')
+        assert walk_pages(client, f'{url}?limit=3') == [contract.id for contract in contracts]
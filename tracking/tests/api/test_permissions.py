@@ -0,0 +1,38 @@
+"""
+Tests for the custom permissions of the tracking api
+"""
+import pytest
+from rest_framework.test import APIRequestFactory
+
+from tracking.api.permissions import IsAdminOrOwner
+from tracking.selectors import get_contracts, get_timelogs
+from tracking.tests.factories import TimelogFactory
+from users.tests.factories import UserFactory
+
+
+class TestIsAdminOrOwner:
+    """
+    Test that owners are checked by id without loading related objects
+    """
+
+    @pytest.mark.django_db
+    def test_object_permission_runs_no_queries(self, django_assert_num_queries):
+        """
+        Test that the owner of a contract or a log loaded by the selectors is
+        checked without any query or related object
+        """
+        timelog = TimelogFactory()
+        owner, other = timelog.contract.user, UserFactory()
+        contract = get_contracts().get(id=timelog.contract_id)
+        timelog = get_timelogs().select_related(None).get(id=timelog.id)
+
+        permission = IsAdminOrOwner()
+        request = APIRequestFactory().get('/')
+        with django_assert_num_queries(0):
+            for obj in (contract, timelog):
+                request.user = owner
+                assert permission.has_object_permission(request, None, obj)
+                request.user = other
+                assert not permission.has_object_permission(request, None, obj)
+
+        assert 'contract' not in timelog._state.fields_cache
@@ -0,0 +1,174 @@
+"""
+Tests for the routing of the API reads to the read replicas
+"""
+import pytest
+from django.contrib.sessions.models import Session
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from time_tracking_system.replicas import (ReplicaMiddleware,
+                                           read_from_primary, replica_reads)
+from tracking.catalogue import get_cached
+from tracking.models import Timelog, Version
+from users.authentication import ClaimsJWTAuthentication
+from users.models import UserState
+from users.selectors import is_pinned_to_primary
+from users.tests.factories import UserFactory
+
+REPLICAS = ['replica_0', 'replica_1']
+
+
+def route_request(request, status=200, authenticate=False):
+    """
+    Pass the request through the middleware, and return the database the
+    view would read from, after authenticating the request by its token if
+    asked, and the response
+    """
+    databases = []
+
+    def view(request):
+        if authenticate:
+            request.user = ClaimsJWTAuthentication().authenticate(request)[0]
+        databases.append(router.db_for_read(Timelog))
+        return HttpResponse(status=status)
+
+    response = ReplicaMiddleware(view)(request)
+    return databases[0], response
+
+
+class TestReplicaRouting:
+    """
+    Test that only the safe API requests of unpinned clients read from the
+    replicas
+    """
+
+    factory = RequestFactory()
+
+    @pytest.fixture(autouse=True)
+    def replicas(self, settings):
+        """
+        Configure two replicas, which are never connected to
+        """
+        settings.DATABASE_REPLICAS = REPLICAS
+
+    def test_safe_api_requests_read_from_a_replica(self):
+        """
+        Test that GET requests to the APIs are sent to a replica
+        """
+        database, response = route_request(self.factory.get('/api/logs/'))
+        assert database in REPLICAS
+        assert 'pin_primary' not in response.cookies
+
+    def test_a_request_reads_from_a_single_replica(self):
+        """
+        Test that every read of a request, the versions of its ETag included,
+        goes to the same replica
+        """
+        databases = set()
+
+        def view(request):
+            for _ in range(20):
+                databases.update((router.db_for_read(Timelog), router.db_for_read(Version)))
+            return HttpResponse()
+
+        ReplicaMiddleware(view)(self.factory.get('/api/logs/'))
+        assert len(databases) == 1 and databases <= set(REPLICAS)
+
+    def test_other_requests_read_from_the_primary(self):
+        """
+        Test that writes and requests outside the APIs stay on the primary
+        """
+        assert route_request(self.factory.post('/api/logs/'))[0] == 'default'
+        assert route_request(self.factory.get('/admin/'))[0] == 'default'
+        assert router.db_for_write(Timelog) == 'default'
+
+    def test_sessions_are_read_from_the_primary(self):
+        """
+        Test that only the models of the replica apps are read from replicas
+        """
+        token = replica_reads.set(REPLICAS[0])
+        try:
+            assert router.db_for_read(Session) == 'default'
+        finally:
+            replica_reads.reset(token)
+
+    def test_writers_are_pinned_to_the_primary(self):
+        """
+        Test that a successful write pins the client to the primary, and a
+        pinned client reads from it
+        """
+        _, response = route_request(self.factory.patch('/api/logs/1/'))
+        cookie = response.cookies['pin_primary']
+        assert cookie['max-age'] == 10
+
+        request = self.factory.get('/api/logs/')
+        request.COOKIES['pin_primary'] = cookie.value
+        assert route_request(request)[0] == 'default'
+
+    @pytest.mark.django_db
+    def test_token_users_are_pinned_to_the_primary(self):
+        """
+        Test that a user authenticated by a token, which does not keep the
+        cookie, reads from the primary after a successful write, while the
+        other users still read from the replicas. The pin is not written to
+        the db
+        """
+        writer, other = UserFactory(), UserFactory()
+        request = self.factory.post('/api/logs/')
+        request.user = writer
+        route_request(request)
+        assert is_pinned_to_primary(writer.id)
+        assert not UserState.objects.exists()
+
+        for user, pinned in ((writer, True), (other, False)):
+            token = user.get_tokens_for_user()['access']
+            request = self.factory.get('/api/logs/', HTTP_AUTHORIZATION=f'Bearer {token}')
+            expected = ['default'] if pinned else REPLICAS
+            assert route_request(request, authenticate=True)[0] in expected
+
+    @pytest.mark.django_db
+    def test_pin_of_token_users_expires(self, settings):
+        """
+        Test that a user pinned to the primary reads from the replicas again
+        after REPLICA_PIN_SECONDS
+        """
+        settings.REPLICA_PIN_SECONDS = -1
+        user = UserFactory()
+        request = self.factory.post('/api/logs/')
+        request.user = user
+        route_request(request)
+
+        token = user.get_tokens_for_user()['access']
+        request = self.factory.get('/api/logs/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        assert route_request(request, authenticate=True)[0] in REPLICAS
+
+    def test_failed_writes_do_not_pin(self):
+        """
+        Test that a rejected write does not pin the client
+        """
+        _, response = route_request(self.factory.post('/api/logs/'), status=400)
+        assert 'pin_primary' not in response.cookies
+
+    def test_cached_data_is_built_from_the_primary(self):
+        """
+        Test that the project catalogue never caches what a replica read
+        """
+        token = replica_reads.set(REPLICAS[0])
+        try:
+            assert router.db_for_read(Timelog) in REPLICAS
+            with read_from_primary():
+                assert router.db_for_read(Timelog) == 'default'
+            assert get_cached('test', lambda: router.db_for_read(Timelog)) == 'default'
+        finally:
+            replica_reads.reset(token)
+
+    def test_no_replicas_configured(self, settings):
+        """
+        Test that without replicas everything goes to the primary and no
+        client is pinned
+        """
+        settings.DATABASE_REPLICAS = []
+        assert route_request(self.factory.get('/api/logs/'))[0] == 'default'
+        _, response = route_request(self.factory.post('/api/logs/'))
+        assert 'pin_primary' not in response.cookies
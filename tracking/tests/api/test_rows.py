@@ -0,0 +1,155 @@
+"""
+Tests for the fast path serializing the rows of the list views
+"""
+import datetime
+import json
+from decimal import Decimal
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import reverse
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from tracking.api.renderers import FastJSONRenderer
+from tracking.api.rows import get_row_mapper
+from tracking.api.serializers import (ContractReadSerializer,
+                                      TimelogReadSerializer)
+from tracking.models import Contract, Timelog
+from tracking.tests.factories import (ContractFactory, ProjectFactory,
+                                      TimelogFactory)
+from users.tests.factories import UserFactory
+
+
+def render_page(response, objects, serializer_class):
+    """
+    Render the page of the response the way DRF does with the serializer
+    """
+    data = response.json()
+    return JSONRenderer().render({
+        'next': data['next'],
+        'previous': data['previous'],
+        'results': serializer_class(objects, many=True).data,
+    })
+
+
+@pytest.fixture(name='timelogs')
+def timelog_instances():
+    """
+    Fixture to get logs with awkward names, hours and prices
+    """
+    user = UserFactory()
+    project = ProjectFactory(name='Ünïcode \u2028 "quoted" \\ 😀 \x01')
+    contract = ContractFactory(user=user, project=project, hourly_price=Decimal('10'))
+    other = ContractFactory(user=user, hourly_price=Decimal('0.5'))
+    return [
+        TimelogFactory(contract=contract, date=datetime.date(2021, 1, 1), hours_worked=8),
+        TimelogFactory(
+            contract=contract, date=datetime.date(2021, 1, 2), hours_worked=Decimal('0.25')
+        ),
+        TimelogFactory(
+            contract=other, date=datetime.date(2021, 1, 2), hours_worked=Decimal('23.99')
+        ),
+    ]
+
+
+class TestValuesListViews:
+    """
+    Test that the list views give the same bytes as their serializers
+    """
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('route, kwargs', [
+        ('timelog_list', False),
+        ('timelog_list_for_user', True),
+    ])
+    def test_timelog_lists_match_the_serializer(self, client, timelogs, route, kwargs):
+        """
+        Test that every page of logs is rendered byte for byte like before
+        """
+        user = timelogs[0].contract.user
+        client.force_login(user)
+        url = reverse(route, kwargs={'user_id': user.id} if kwargs else None)
+        ordered = list(Timelog.objects.order_by('-date', '-id'))
+
+        for limit, page in ((20, ordered), (2, ordered[:2])):
+            response = client.get(f'{url}?limit={limit}')
+            assert response.content == render_page(response, page, TimelogReadSerializer)
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('route, kwargs', [
+        ('contract_list', False),
+        ('contract_list_for_user', True),
+    ])
+    def test_contract_lists_match_the_serializer(self, client, timelogs, route, kwargs):
+        """
+        Test that a page of contracts is rendered byte for byte like before
+        """
+        user = timelogs[0].contract.user
+        client.force_login(user)
+        url = reverse(route, kwargs={'user_id': user.id} if kwargs else None)
+
+        response = client.get(url)
+        expected = render_page(response, Contract.objects.order_by('id'), ContractReadSerializer)
+        assert response.content == expected
+
+    @pytest.mark.django_db
+    def test_indented_output_is_left_to_drf(self, client, timelogs):
+        """
+        Test that an indented response is still rendered
+        """
+        client.force_login(timelogs[0].contract.user)
+        response = client.get(reverse('timelog_list'), HTTP_ACCEPT='application/json; indent=2')
+        assert b'\n  "results"' in response.content
+        assert len(json.loads(response.content)['results']) == 3
+
+
+class TestRowMapper:
+    """
+    Test compiling serializers into row mappers
+    """
+
+    def test_columns_follow_the_nested_serializers(self):
+        """
+        Test that the columns of the nested serializers are prefixed
+        """
+        columns, _ = get_row_mapper(TimelogReadSerializer)
+        assert columns == (
+            'id', 'date', 'hours_worked', 'contract__id', 'contract__user',
+            'contract__project__id', 'contract__project__name', 'contract__hourly_price',
+        )
+
+    def test_method_fields_are_refused(self):
+        """
+        Test that fields computed from the whole object cannot be compiled
+        """
+        class MethodSerializer(serializers.Serializer):
+            name = serializers.SerializerMethodField()
+
+        with pytest.raises(ImproperlyConfigured):
+            get_row_mapper(MethodSerializer)
+
+
+class TestFastJSONRenderer:
+    """
+    Test that the renderer matches the DRF JSONRenderer
+    """
+
+    def test_same_bytes_as_drf(self):
+        """
+        Test that strings, numbers and nulls are rendered like DRF
+        """
+        data = {
+            'text': ''.join(chr(code) for code in range(128)) + 'é\u2028\u2029😀',
+            'numbers': [0, -1, 2 ** 40],
+            'nothing': None,
+            'nested': {'flag': True},
+        }
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+
+    def test_unsupported_data_falls_back(self):
+        """
+        Test that data orjson cannot encode is rendered by DRF
+        """
+        data = {'amount': Decimal('1.50'), 'huge': 2 ** 70}
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
@@ -1,18 +1,39 @@
 """
 Tests for all the api views for the
 """
+import datetime
 import json
+import re
+from decimal import Decimal
 
 import pytest
+from django.db import connection
+from django.test import RequestFactory
 from django.test.client import MULTIPART_CONTENT
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 
+from tracking.api.filters import TimelogFilterSet, TimelogListingFilterSet
+from tracking.models import DailyHours, Timelog, WeeklyHours
+from tracking.selectors import (get_timelog_listings,
+                                get_timelog_listings_for_user, get_timelogs,
+                                get_timelogs_for_user)
 from tracking.tests.factories import (ContractFactory, ProjectFactory,
                                       TimelogFactory)
 from users.tests.factories import UserFactory
 
 
+def count_queries(client, url):
+    """
+    Return the number of queries run to GET the given url
+    """
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    return len(context.captured_queries)
+
+
 @pytest.fixture(name='project')
 def project_instance():
     """
@@ -188,15 +209,29 @@ class TestContractListAPIView:
         client.force_login(user_one)
         response = client.get(self.url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data['count'] == total_user_one_contracts
+        assert len(response.data['results']) == total_user_one_contracts
 
         # Admin can see all the contracts
         client.force_login(user_two)
         response = client.get(self.url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data['count'] == total_user_one_contracts + \
+        assert len(response.data['results']) == total_user_one_contracts + \
                total_user_two_contracts
 
+    @pytest.mark.django_db
+    def test_contract_list_query_count_does_not_depend_on_page_size(self, client):
+        """
+        Test that the nested project is loaded with the contracts instead
+        of one query per row
+        """
+        user = UserFactory()
+        client.force_login(user)
+        ContractFactory(user=user)
+        queries_for_one = count_queries(client, self.url)
+
+        ContractFactory.create_batch(9, user=user)
+        assert count_queries(client, self.url) == queries_for_one
+
 
 class TestContractDetailAPIView:
     """
@@ -323,13 +358,13 @@ class TestUserContractListAPIView:
         client.force_login(owner_user)
         response = client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data['count'] == total_owned_contracts
+        assert len(response.data['results']) == total_owned_contracts
 
         # Non-owner admin user - Accessible
         client.force_login(UserFactory(is_staff=True))
         response = client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data['count'] == total_owned_contracts
+        assert len(response.data['results']) == total_owned_contracts
 
 
 class TestTimelogListAPIView:
@@ -370,14 +405,125 @@ class TestTimelogListAPIView:
         client.force_login(user_one)
         response = client.get(self.url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data['count'] == total_user_one_logs
+        assert len(response.data['results']) == total_user_one_logs
 
         client.force_login(user_two)
         response = client.get(self.url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data['count'] == total_user_one_logs + \
+        assert len(response.data['results']) == total_user_one_logs + \
                total_user_two_logs
 
+    @pytest.mark.django_db
+    def test_timelog_list_query_count_does_not_depend_on_page_size(self, client):
+        """
+        Test that the nested contract and project are loaded with the logs
+        instead of one query per row
+        """
+        user = UserFactory()
+        client.force_login(user)
+        TimelogFactory(contract__user=user)
+        queries_for_one = count_queries(client, self.url)
+        user_url = reverse('timelog_list_for_user', kwargs={'user_id': user.id})
+        user_queries_for_one = count_queries(client, user_url)
+
+        TimelogFactory.create_batch(9, contract__user=user)
+        assert count_queries(client, self.url) == queries_for_one
+        assert count_queries(client, user_url) == user_queries_for_one
+
+    @pytest.mark.django_db
+    def test_timelog_list_filters(self, client):
+        """
+        Test filtering the logs by a date range, a project and, for admins,
+        a user
+        """
+        user = UserFactory()
+        contract = ContractFactory(user=user)
+        other_contract = ContractFactory()
+        for day in (1, 15, 31):
+            TimelogFactory(contract=contract, date=datetime.date(2021, 1, day))
+        TimelogFactory(contract=contract, date=datetime.date(2021, 2, 1))
+        TimelogFactory(contract=other_contract, date=datetime.date(2021, 1, 10))
+        january = {'date_after': '2021-01-01', 'date_before': '2021-01-31'}
+
+        def dates(viewer, **params):
+            client.force_login(viewer)
+            response = client.get(self.url, params)
+            assert response.status_code == status.HTTP_200_OK
+            return [log['date'] for log in response.json()['results']]
+
+        assert dates(user, **january) == ['2021-01-31', '2021-01-15', '2021-01-01']
+        admin = UserFactory(is_staff=True)
+        assert len(dates(admin, **january)) == 4
+        assert dates(admin, **january, project=other_contract.project_id) == ['2021-01-10']
+        assert dates(admin, **january, user=user.id) == [
+            '2021-01-31', '2021-01-15', '2021-01-01'
+        ]
+        user_url = reverse('timelog_list_for_user', kwargs={'user_id': user.id})
+        client.force_login(user)
+        assert len(client.get(user_url, {'date_after': '2021-01-16'}).json()['results']) == 2
+
+    @pytest.mark.django_db
+    def test_timelog_lists_read_the_listing_table_alone(self, client):
+        """
+        Test that the logs are listed from their listings without any join
+        """
+        user = UserFactory()
+        TimelogFactory.create_batch(3, contract__user=user)
+        client.force_login(user)
+
+        for url in (self.url, reverse('timelog_list_for_user', kwargs={'user_id': user.id})):
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(url, {'project': 1})
+            assert response.status_code == status.HTTP_200_OK
+            listing_queries = [
+                query['sql'] for query in context.captured_queries
+                if 'tracking_timeloglisting' in query['sql']
+            ]
+            assert len(listing_queries) == 1
+            assert 'JOIN' not in listing_queries[0]
+
+    @pytest.mark.django_db
+    def test_timelog_list_user_filter_is_for_admins(self, client):
+        """
+        Test that users can not filter by other users
+        """
+        user = UserFactory()
+        client.force_login(user)
+        assert client.get(self.url, {'user': user.id}).status_code == status.HTTP_200_OK
+        response = client.get(self.url, {'user': UserFactory().id})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    @pytest.mark.django_db
+    def test_timelog_list_date_range_is_read_from_an_index(self):
+        """
+        Test that a date range of the logs is an index range read rather
+        than a scan of all the logs
+        """
+        user = UserFactory()
+        request = RequestFactory().get(
+            self.url, {'date_after': '2021-01-01', 'date_before': '2021-01-31'}
+        )
+        request.user = user
+        for filterset_class, queryset, table in (
+                (TimelogFilterSet, get_timelogs(), 'tracking_timelog'),
+                (TimelogFilterSet, get_timelogs_for_user(user.id), 'tracking_timelog'),
+                (TimelogListingFilterSet, get_timelog_listings(), 'tracking_timeloglisting'),
+                (
+                    TimelogListingFilterSet,
+                    get_timelog_listings_for_user(user.id),
+                    'tracking_timeloglisting'
+                ),
+        ):
+            timelogs = filterset_class(request.GET, queryset, request=request).qs
+            sql, params = timelogs.order_by('-date', '-id').query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+            assert f'SCAN {table} ' not in f'{plan} '
+            assert re.search(
+                fr'SEARCH {table} USING INDEX \S+ \(.*date>\? AND date<\?\)', plan
+            )
+
 
 class TestTimelogDetailAPIView:
     """
@@ -452,6 +598,131 @@ class TestTimelogDetailAPIView:
         response = client.delete(url)
         assert response.status_code == status.HTTP_204_NO_CONTENT
 
+    @pytest.mark.django_db
+    def test_timelog_detail_checks_owner_without_extra_queries(self, client):
+        """
+        Test that the owner of a timelog is checked from the detail query
+        itself, for the owner and the admin alike
+        """
+        timelog = TimelogFactory()
+        url = reverse('timelog_detail', kwargs={'pk': timelog.id})
+
+        client.force_login(timelog.contract.user)
+        owner_queries = count_queries(client, url)
+        client.force_login(UserFactory(is_staff=True))
+        assert count_queries(client, url) == owner_queries
+
+        # Session, user, the versions of the ETag and the timelog with its
+        # contract and project
+        assert owner_queries == 4
+
+
+class TestTimelogExportAPIView:
+    """
+    Test that the timelogs are exported as a stream of CSV or NDJSON
+    """
+
+    @staticmethod
+    def export(client, **params):
+        """
+        Export the logs with the given query params and return the response
+        and its decoded content
+        """
+        response = client.get(reverse('timelog_export'), params)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        return response, b''.join(response.streaming_content).decode()
+
+    @pytest.mark.django_db
+    def test_export_not_accessible_for_unauthenticated_users(self, client):
+        """
+        Test that anonymous users cannot export logs
+        """
+        response = client.get(reverse('timelog_export'))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    @pytest.mark.django_db
+    def test_export_csv_of_own_logs_in_date_range(self, client):
+        """
+        Test that a user exports only their own logs within the date range,
+        oldest first
+        """
+        user = UserFactory()
+        contract = ContractFactory(user=user)
+        for day in (3, 1, 2, 9):
+            TimelogFactory(contract=contract, date=datetime.date(2022, 1, day), hours_worked=2)
+        TimelogFactory(date=datetime.date(2022, 1, 2))
+        client.force_login(user)
+
+        response, content = self.export(
+            client, date_after='2022-01-01', date_before='2022-01-03'
+        )
+
+        assert response['Content-Type'] == 'text/csv'
+        lines = content.splitlines()
+        assert lines[0] == (
+            'id,date,contract,user,project,hours_worked,hourly_price,hourly_price_currency'
+        )
+        assert [line.split(',')[1] for line in lines[1:]] == [
+            '2022-01-01', '2022-01-02', '2022-01-03'
+        ]
+        assert lines[1].split(',')[2:6] == [
+            str(contract.id), str(user.id), str(contract.project_id), '2.00'
+        ]
+
+    @pytest.mark.django_db
+    def test_export_ndjson_of_all_logs_for_admin(self, client):
+        """
+        Test that an admin exports the logs of every user, one JSON object
+        per line, filtered by contract
+        """
+        timelogs = TimelogFactory.create_batch(3)
+        TimelogFactory(contract=timelogs[0].contract, date=datetime.date(1970, 1, 1))
+        client.force_login(UserFactory(is_staff=True))
+
+        response, content = self.export(client, file_format='ndjson')
+        assert response['Content-Type'] == 'application/x-ndjson'
+        rows = [json.loads(line) for line in content.splitlines()]
+        assert len(rows) == 4
+        assert set(rows[0]) == {
+            'id', 'date', 'contract', 'user', 'project', 'hours_worked',
+            'hourly_price', 'hourly_price_currency'
+        }
+
+        _, content = self.export(
+            client, file_format='ndjson', contract=timelogs[0].contract_id
+        )
+        assert [json.loads(line)['date'] for line in content.splitlines()][0] == '1970-01-01'
+        assert len(content.splitlines()) == 2
+
+    @pytest.mark.django_db
+    def test_export_runs_fixed_number_of_queries(self, client):
+        """
+        Test that exporting more logs does not run more queries
+        """
+        user = UserFactory()
+        client.force_login(user)
+        contract = ContractFactory(user=user)
+
+        query_counts = []
+        for first_day, total in ((datetime.date(2022, 1, 1), 1), (datetime.date(2022, 2, 1), 30)):
+            for day in range(total):
+                TimelogFactory(contract=contract, date=first_day + datetime.timedelta(days=day))
+            with CaptureQueriesContext(connection) as context:
+                _, content = self.export(client)
+            assert len(content.splitlines()) == contract.time_logs.count() + 1
+            query_counts.append(len(context.captured_queries))
+        assert query_counts[0] == query_counts[1]
+
+    @pytest.mark.django_db
+    def test_export_rejects_unknown_format(self, client):
+        """
+        Test that only the supported formats can be requested
+        """
+        client.force_login(UserFactory())
+        response = client.get(reverse('timelog_export'), {'file_format': 'xlsx'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
 
 class TestUserTimelogListAPIView:
     """
@@ -494,10 +765,515 @@ class TestUserTimelogListAPIView:
         client.force_login(owner_user)
         response = client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data['count'] == total_owned_contracts
+        assert len(response.data['results']) == total_owned_contracts
 
         # Non-owner admin user - Accessible
         client.force_login(UserFactory(is_staff=True))
         response = client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data['count'] == total_owned_contracts
+        assert len(response.data['results']) == total_owned_contracts
+
+
+class TestUserTimelogCreateAPIView:
+    """
+    Test that a timelog is validated and created in a single round trip
+    """
+
+    @pytest.mark.django_db
+    def test_create_runs_one_select_and_one_insert(self, client, django_assert_num_queries):
+        """
+        Test that the ownership and conflict checks take one query, and the
+        log is inserted with one more, and count every other query the
+        request runs
+        """
+        contract = ContractFactory()
+        client.force_login(contract.user)
+        url = reverse('timelog_list_for_user', kwargs={'user_id': contract.user_id})
+
+        # Session and user, the latest archived date, the ownership and
+        # conflict check, the log, a select and an insert for each of the
+        # daily and weekly rollups, a delete and an insert for the listing,
+        # the version of the earnings of the month, started by its first log
+        # with two more queries, the versions of the logs, and the savepoints
+        # around the log, its rollups and its listing
+        with django_assert_num_queries(21) as context:
+            response = client.post(
+                url, {'contract': contract.id, 'date': '2022-01-03', 'hours_worked': '8.00'}
+            )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data == {
+            'date': '2022-01-03', 'contract': contract.id, 'hours_worked': '8.00'
+        }
+        timelog_queries = [
+            query['sql'].split(' ')[0] for query in context.captured_queries
+            if re.match(r'(SELECT|INSERT INTO) "tracking_(timelog|contract)"', query['sql'])
+        ]
+        assert timelog_queries == ['SELECT', 'INSERT']
+        assert DailyHours.objects.get(date=datetime.date(2022, 1, 3)).hours == Decimal('8.00')
+
+    @pytest.mark.django_db
+    def test_create_rejects_foreign_contract_and_duplicate(self, client):
+        """
+        Test that a contract of another user and a second log on the same
+        date are both rejected
+        """
+        timelog = TimelogFactory(date=datetime.date(2022, 1, 3))
+        owner = timelog.contract.user
+        client.force_login(owner)
+        url = reverse('timelog_list_for_user', kwargs={'user_id': owner.id})
+
+        response = client.post(
+            url, {'contract': ContractFactory().id, 'date': '2022-01-04', 'hours_worked': '1'}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'contract' in response.data
+
+        response = client.post(
+            url, {'contract': timelog.contract_id, 'date': '2022-01-03', 'hours_worked': '1'}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'non_field_errors' in response.data
+
+    @pytest.mark.django_db
+    def test_admin_writes_only_under_own_contracts(self, client):
+        """
+        Test that the contract sent by an admin must be one of its own, like
+        for any user, while the date of the log of another user can be moved
+        """
+        timelog = TimelogFactory(date=datetime.date(2022, 1, 3))
+        owner = timelog.contract.user
+        client.force_login(UserFactory(is_staff=True))
+
+        response = client.post(
+            reverse('timelog_list_for_user', kwargs={'user_id': owner.id}),
+            {'contract': timelog.contract_id, 'date': '2022-01-04', 'hours_worked': '1'}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'contract' in response.data
+
+        url = reverse('timelog_detail', kwargs={'pk': timelog.id})
+        response = client.patch(
+            url, {'contract': timelog.contract_id}, content_type='application/json'
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        response = client.patch(url, {'date': '2022-01-05'}, content_type='application/json')
+        assert response.status_code == status.HTTP_200_OK
+
+    @pytest.mark.django_db
+    def test_update_checks_only_changed_contract_or_date(self, client):
+        """
+        Test that changing only the hours runs no validation query, while
+        moving a log onto a date that has one is rejected
+        """
+        timelog = TimelogFactory(date=datetime.date(2022, 1, 3))
+        TimelogFactory(contract=timelog.contract, date=datetime.date(2022, 1, 4))
+        client.force_login(timelog.contract.user)
+        url = reverse('timelog_detail', kwargs={'pk': timelog.id})
+
+        with CaptureQueriesContext(connection) as context:
+            response = client.patch(url, {'hours_worked': '3.00'}, content_type='application/json')
+        assert response.status_code == status.HTTP_200_OK
+        assert not any('EXISTS' in query['sql'] for query in context.captured_queries)
+
+        response = client.patch(url, {'date': '2022-01-04'}, content_type='application/json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'non_field_errors' in response.data
+
+        response = client.patch(url, {'date': '2022-01-05'}, content_type='application/json')
+        assert response.status_code == status.HTTP_200_OK
+
+
+class TestUserTimelogUpsertAPIView:
+    """
+    Test that the log of a contract on a date is created or updated in place
+    """
+
+    @staticmethod
+    def put(client, contract, date, hours_worked, user=None):
+        """
+        Put the hours of the contract on the date
+        """
+        url = reverse('timelog_upsert_for_user', kwargs={
+            'user_id': (user or contract.user).id,
+            'contract_id': contract.id,
+            'date': date,
+        })
+        return client.put(url, {'hours_worked': hours_worked}, content_type='application/json')
+
+    @pytest.mark.django_db
+    def test_upsert_creates_then_updates(self, client):
+        """
+        Test that the first request creates the log and the next ones update
+        it, keeping the rollups right
+        """
+        contract = ContractFactory()
+        client.force_login(contract.user)
+
+        response = self.put(client, contract, '2022-01-03', '8.00')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data == {
+            'id': response.data['id'],
+            'date': '2022-01-03',
+            'contract': contract.id,
+            'hours_worked': '8.00',
+        }
+
+        for _ in range(2):
+            retry = self.put(client, contract, '2022-01-03', '5.50')
+            assert retry.status_code == status.HTTP_200_OK
+            assert retry.data['id'] == response.data['id']
+
+        timelog = Timelog.objects.get()
+        assert timelog.hours_worked == Decimal('5.50')
+        assert DailyHours.objects.get().hours == Decimal('5.50')
+        assert WeeklyHours.objects.get().hours == Decimal('5.50')
+
+    @pytest.mark.django_db
+    def test_upsert_writes_with_one_statement(self, client):
+        """
+        Test that a log is created or updated with a single statement on the
+        logs, and not written again by a retry
+        """
+        contract = ContractFactory()
+        client.force_login(contract.user)
+
+        for hours_worked, expected_status, writes in (
+                ('8.00', status.HTTP_201_CREATED, 1),
+                ('5.50', status.HTTP_200_OK, 1),
+                ('5.50', status.HTTP_200_OK, 0),
+        ):
+            with CaptureQueriesContext(connection) as context:
+                response = self.put(client, contract, '2022-01-03', hours_worked)
+            assert response.status_code == expected_status
+            # The listing of the log is copied from it afterwards
+            timelog_writes = [
+                query['sql'] for query in context.captured_queries
+                if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+                and '"tracking_timelog"' in query['sql']
+                and '"tracking_timeloglisting"' not in query['sql']
+            ]
+            assert len(timelog_writes) == writes
+            assert all('ON CONFLICT' in sql for sql in timelog_writes)
+
+    @pytest.mark.django_db
+    def test_upsert_retry_changes_nothing(self, client):
+        """
+        Test that sending the hours the log already has writes nothing, so
+        the ETags and the derived data stay as they were
+        """
+        contract = ContractFactory()
+        client.force_login(contract.user)
+        self.put(client, contract, '2022-01-03', '8.00')
+        url = reverse('timelog_list')
+        etag = client.get(url)['ETag']
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.put(client, contract, '2022-01-03', '8')
+        assert response.status_code == status.HTTP_200_OK
+        assert not any(
+            query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+            for query in context.captured_queries
+        )
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == (
+            status.HTTP_304_NOT_MODIFIED
+        )
+
+    @pytest.mark.django_db
+    def test_upsert_rejects_invalid_requests(self, client):
+        """
+        Test that another user's contract, another user's url and an invalid
+        date or number of hours are all rejected
+        """
+        contract = ContractFactory()
+        client.force_login(contract.user)
+
+        response = self.put(client, ContractFactory(), '2022-01-03', '8.00', user=contract.user)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'contract' in response.data
+
+        response = self.put(client, contract, '2022-01-03', '8.00', user=UserFactory())
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+        response = self.put(client, contract, '2022-13-03', '8.00')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'date' in response.data
+
+        response = self.put(client, contract, '2022-01-03', '25.00')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'hours_worked' in response.data
+        assert not Timelog.objects.exists()
+
+
+class TestUserTimelogBulkCreateAPIView:
+    """
+    Test that a list of timelogs for a user is created at once
+    """
+
+    @staticmethod
+    def post(client, user, entries):
+        """
+        Post the given entries to the bulk endpoint of the given user
+        """
+        url = reverse('timelog_bulk_create_for_user', kwargs={'user_id': user.id})
+        return client.post(url, json.dumps(entries), content_type='application/json')
+
+    @pytest.mark.django_db
+    def test_bulk_create_only_accessible_for_owner_or_admin(self, client):
+        """
+        Test that only a user themselves or the admin can submit their logs
+        """
+        owner_user = UserFactory()
+        contract = ContractFactory(user=owner_user)
+
+        client.force_login(UserFactory())
+        response = self.post(client, owner_user, [])
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+        client.force_login(UserFactory(is_staff=True))
+        response = self.post(client, owner_user, [
+            {'contract': contract.id, 'date': '2022-01-03', 'hours_worked': '8.00'},
+        ])
+        assert response.status_code == status.HTTP_201_CREATED
+
+    @pytest.mark.django_db
+    def test_bulk_create_runs_fixed_number_of_queries(self, client):
+        """
+        Test that the number of queries does not grow with the number of
+        entries, and that the rollups include the new hours
+        """
+        owner_user = UserFactory()
+        contracts = ContractFactory.create_batch(3, user=owner_user)
+        client.force_login(owner_user)
+
+        def entries(first_day, days):
+            return [
+                {
+                    'contract': contract.id,
+                    'date': str(first_day + datetime.timedelta(days=day)),
+                    'hours_worked': '2.50',
+                }
+                for day in range(days)
+                for contract in contracts
+            ]
+
+        query_counts = []
+        for first_day, days in ((datetime.date(2022, 1, 3), 2), (datetime.date(2022, 2, 7), 20)):
+            with CaptureQueriesContext(connection) as context:
+                response = self.post(client, owner_user, entries(first_day, days))
+            assert response.status_code == status.HTTP_201_CREATED
+            assert len(response.data) == days * len(contracts)
+            assert all(log['id'] for log in response.data)
+            query_counts.append(len(context.captured_queries))
+
+        assert query_counts[0] == query_counts[1]
+        assert Timelog.objects.filter(contract__user=owner_user).count() == 66
+        assert DailyHours.objects.get(
+            user=owner_user, project=contracts[0].project, date=datetime.date(2022, 1, 3)
+        ).hours == Decimal('2.50')
+        assert WeeklyHours.objects.get(
+            user=owner_user, project=contracts[0].project, week=datetime.date(2022, 2, 7)
+        ).hours == Decimal('17.50')
+
+    @pytest.mark.django_db
+    def test_bulk_create_reports_errors_per_entry(self, client):
+        """
+        Test that invalid entries are reported at their index and nothing is
+        created if any entry is invalid
+        """
+        owner_user = UserFactory()
+        contract = ContractFactory(user=owner_user)
+        TimelogFactory(contract=contract, date=datetime.date(2022, 1, 3))
+        client.force_login(owner_user)
+
+        response = self.post(client, owner_user, [
+            {'contract': contract.id, 'date': '2022-01-04', 'hours_worked': '8.00'},
+            {'contract': ContractFactory().id, 'date': '2022-01-04', 'hours_worked': '8.00'},
+            {'contract': contract.id, 'date': '2022-01-03', 'hours_worked': '8.00'},
+            {'contract': contract.id, 'date': '2022-01-04', 'hours_worked': '8.00'},
+        ])
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data[0] == {}
+        assert 'contract' in response.data[1]
+        assert 'non_field_errors' in response.data[2]
+        assert 'non_field_errors' in response.data[3]
+
+        response = self.post(client, owner_user, [
+            {'contract': contract.id, 'date': '2022-01-05', 'hours_worked': '8.00'},
+            {'contract': contract.id, 'date': 'nope', 'hours_worked': '8.00'},
+        ])
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data[0] == {}
+        assert 'date' in response.data[1]
+        assert Timelog.objects.filter(contract=contract).count() == 1
+
+    @pytest.mark.django_db
+    def test_bulk_create_rejects_too_many_entries(self, client):
+        """
+        Test that a submission over the size limit is rejected
+        """
+        owner_user = UserFactory()
+        contract = ContractFactory(user=owner_user)
+        client.force_login(owner_user)
+
+        response = self.post(client, owner_user, [
+            {'contract': contract.id, 'date': '2022-01-03', 'hours_worked': '1.00'}
+        ] * 501)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not Timelog.objects.exists()
+
+
+class TestHoursReportAPIView:
+    """
+    Test that the hours report endpoint totals logs correctly
+    """
+
+    url = reverse('hours_report')
+
+    @pytest.mark.django_db
+    def test_hours_report_totals_by_group_and_period(self, client):
+        """
+        Test that the hours of a user are totalled per project and week
+        """
+        user = UserFactory()
+        first, second = ContractFactory.create_batch(2, user=user)
+        TimelogFactory(contract=first, date='2022-01-03', hours_worked=2)
+        TimelogFactory(contract=first, date='2022-01-04', hours_worked=3.5)
+        TimelogFactory(contract=second, date='2022-01-10', hours_worked=4)
+        # Outside of the date range
+        TimelogFactory(contract=second, date='2022-02-01', hours_worked=8)
+        # Another user
+        TimelogFactory(contract__project=first.project, date='2022-01-03', hours_worked=5)
+
+        client.force_login(user)
+        response = client.get(self.url, {
+            'date_after': '2022-01-01',
+            'date_before': '2022-01-31',
+            'group_by': 'project',
+            'period': 'week',
+        })
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['results'] == [
+            {'period': '2022-01-03', 'project': first.project.id, 'total_hours': '5.50'},
+            {'period': '2022-01-10', 'project': second.project.id, 'total_hours': '4.00'},
+        ]
+
+    @pytest.mark.django_db
+    def test_hours_report_totals_over_all_users_for_admin(self, client):
+        """
+        Test that an admin gets the totals of every user without a period
+        """
+        logs = TimelogFactory.create_batch(3, date='2022-01-03', hours_worked=10)
+
+        client.force_login(UserFactory(is_staff=True))
+        response = client.get(self.url, {
+            'date_after': '2022-01-01',
+            'date_before': '2022-01-31',
+            'group_by': 'user',
+        })
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['results'] == [
+            {'user': log.contract.user.id, 'total_hours': '10.00'} for log in logs
+        ]
+
+    @pytest.mark.django_db
+    def test_hours_report_of_other_user_not_accessible_for_non_admin(self, client):
+        """
+        Test that a non-admin user cannot see the report of another user
+        """
+        client.force_login(UserFactory())
+        response = client.get(self.url, {
+            'date_after': '2022-01-01',
+            'date_before': '2022-01-31',
+            'group_by': 'user',
+            'user': UserFactory().id,
+        })
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    @pytest.mark.django_db
+    def test_hours_report_requires_a_valid_date_range(self, client):
+        """
+        Test that a report without a valid date range is rejected
+        """
+        client.force_login(UserFactory())
+        response = client.get(self.url, {
+            'date_after': '2022-02-01',
+            'date_before': '2022-01-01',
+            'group_by': 'user',
+        })
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @pytest.mark.django_db
+    def test_hours_report_over_whole_weeks(self, client):
+        """
+        Test that a weekly report over whole weeks totals every user
+        """
+        first, second = ContractFactory.create_batch(2)
+        TimelogFactory(contract=first, date='2022-01-03', hours_worked=2)
+        TimelogFactory(contract=first, date='2022-01-09', hours_worked=3)
+        TimelogFactory(contract=second, date='2022-01-16', hours_worked=4)
+        TimelogFactory(contract=second, date='2022-01-17', hours_worked=5)
+
+        client.force_login(UserFactory(is_staff=True))
+        response = client.get(self.url, {
+            'date_after': '2022-01-03',
+            'date_before': '2022-01-16',
+            'group_by': 'user',
+            'period': 'week',
+        })
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['results'] == [
+            {'period': '2022-01-03', 'user': first.user.id, 'total_hours': '5.00'},
+            {'period': '2022-01-10', 'user': second.user.id, 'total_hours': '4.00'},
+        ]
+
+
+class TestEarningsReportAPIView:
+    """
+    Test that the earnings report endpoint totals earnings correctly
+    """
+
+    url = reverse('earnings_report')
+
+    @pytest.mark.django_db
+    def test_earnings_report_by_month(self, client):
+        """
+        Test that a user gets their earnings per contract and month
+        """
+        user = UserFactory()
+        contract = ContractFactory(user=user, hourly_price=12)
+        TimelogFactory(contract=contract, date='2022-01-03', hours_worked=2)
+        TimelogFactory(contract=contract, date='2022-02-03', hours_worked=1)
+        TimelogFactory(date='2022-01-03', hours_worked=5)
+
+        client.force_login(user)
+        response = client.get(self.url, {
+            'date_after': '2022-01-01',
+            'date_before': '2022-02-28',
+            'group_by': 'contract',
+            'period': 'month',
+        })
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()['results'] == [
+            {'period': '2022-01-01', 'contract': contract.id, 'currency': 'USD', 'amount': '24.00'},
+            {'period': '2022-02-01', 'contract': contract.id, 'currency': 'USD', 'amount': '12.00'},
+        ]
+
+    @pytest.mark.django_db
+    def test_earnings_report_only_supports_months(self, client):
+        """
+        Test that earnings cannot be bucketed by week
+        """
+        client.force_login(UserFactory())
+        response = client.get(self.url, {
+            'date_after': '2022-01-01',
+            'date_before': '2022-02-28',
+            'group_by': 'user',
+            'period': 'week',
+        })
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,131 @@
+"""
+Tests for the benchmarks of the API routes
+"""
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from tracking.benchmarks import (get_route_names, run_benchmarks,
+                                 run_throughput_benchmark, seed_benchmark_data)
+from tracking.models import Contract, DailyHours, Timelog
+from users.models import User
+
+# Queries of every benchmark request at the volumes seeded by the tests,
+# once the caches were warmed up by the timed runs
+EXPECTED_QUERIES = {
+    ('project_list', 'get as owner'): 7,
+    ('project_list', 'post as admin'): 9,
+    ('project_detail', 'get as owner'): 6,
+    ('project_detail', 'patch as admin'): 11,
+    ('project_detail', 'delete as admin'): 11,
+    ('project_cache_stats', 'get as admin'): 5,
+    ('contract_list', 'get as admin'): 7,
+    ('contract_list', 'get as owner'): 7,
+    ('contract_detail', 'get as owner'): 7,
+    ('contract_detail', 'patch as owner'): 19,
+    ('contract_detail', 'delete as owner'): 21,
+    ('contract_list_for_user', 'get as owner'): 7,
+    ('contract_list_for_user', 'post as owner'): 17,
+    ('timelog_list', 'get as admin'): 7,
+    ('timelog_list', 'get as owner'): 7,
+    ('timelog_list', 'get a month as admin'): 7,
+    ('timelog_export', 'get a month as admin'): 6,
+    ('timelog_export', 'get as owner'): 6,
+    ('timelog_detail', 'get as owner'): 7,
+    ('timelog_detail', 'patch as owner'): 26,
+    ('timelog_detail', 'delete as owner'): 24,
+    ('timelog_list_for_user', 'get as owner'): 7,
+    ('timelog_list_for_user', 'post as owner'): 26,
+    ('timelog_upsert_for_user', 'put a new log as owner'): 27,
+    ('timelog_upsert_for_user', 'put a log as owner'): 27,
+    ('timelog_bulk_create_for_user', 'post as owner'): 29,
+    ('hours_report', 'get as admin'): 6,
+    ('hours_report', 'get as owner'): 6,
+    ('earnings_report', 'get as admin'): 6,
+    ('job_list', 'get as owner'): 7,
+    ('job_list', 'post as owner'): 6,
+    ('job_detail', 'get as owner'): 6,
+    ('job_cancel', 'post as owner'): 9,
+    ('job_result', 'get as owner'): 6,
+    ('register', 'get as admin'): 7,
+    ('register', 'post as anonymous'): 8,
+    ('detail', 'get as owner'): 6,
+    ('detail', 'patch as owner'): 8,
+    ('detail', 'delete as admin'): 42,
+}
+
+
+class TestBenchmarks:
+    """
+    Test that the benchmarks measure every route on the seeded data
+    """
+
+    @pytest.mark.django_db
+    def test_benchmark_covers_every_route(self):
+        """
+        Test that every route is benchmarked successfully at a small volume,
+        with the expected queries, and the requests leave the seeded data as
+        it was
+        """
+        seed_benchmark_data(users=3, contracts=6, timelogs=60, projects=4)
+        results = run_benchmarks(repeat=2)
+
+        assert results['volumes']['timelogs'] == 60
+        assert {result['route'] for result in results['results']} == get_route_names()
+        assert {
+            (result['route'], result['label']): result['queries']
+            for result in results['results']
+        } == EXPECTED_QUERIES
+        for result in results['results']:
+            assert result['status'] < 400, result
+            assert set(result['latency_ms']) == {'min', 'median', 'p95', 'max'}
+
+        assert Contract.objects.count() == 6
+        assert Timelog.objects.count() == 60
+        assert DailyHours.objects.count() == 60
+
+    @pytest.mark.django_db(transaction=True)
+    def test_both_deployments_serve_every_request(self):
+        """
+        Test that the same reads succeed under both deployments
+        """
+        seed_benchmark_data(users=3, contracts=6, timelogs=60, projects=4)
+        results = run_throughput_benchmark(
+            requests=12, concurrency=4, threads=2, client_delay=0
+        )
+
+        for deployment in ('wsgi', 'asgi'):
+            result = results['deployments'][deployment]
+            assert result['statuses'] == {'200': 12}
+            assert result['requests_per_second'] > 0
+
+
+class TestBenchmarkCommands:
+    """
+    Test that the benchmark commands only seed a database of their own
+    """
+
+    @pytest.mark.parametrize('command', ['benchmark_api', 'benchmark_deployments'])
+    def test_database_is_required(self, command):
+        """
+        Test that the commands refuse to run without naming their database
+        """
+        with pytest.raises(CommandError, match='--database'):
+            call_command(command, stdout=None)
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('command', ['benchmark_api', 'benchmark_deployments'])
+    def test_configured_database_is_refused(self, command, settings, tmp_path):
+        """
+        Test that the commands refuse to seed the configured database
+        """
+        with pytest.raises(CommandError, match='configured database'):
+            call_command(
+                command, database=str(settings.DATABASES['default']['NAME']),
+                users=3, contracts=6, timelogs=60, projects=4,
+                output=str(tmp_path / 'results.json'), stdout=None
+            )
+
+        assert not User.objects.exists()
+        assert not (tmp_path / 'results.json').exists()
@@ -0,0 +1,97 @@
+"""
+Tests for the earnings engine of the tracking app
+"""
+import datetime
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from tracking.earnings import get_earnings
+from tracking.tests.factories import ContractFactory, TimelogFactory
+
+TODAY = datetime.date(2022, 3, 15)
+
+
+def get_user_earnings(user_id, date_after, date_before, **kwargs):
+    """
+    Return the earnings of a user as a {currency: amount} dict
+    """
+    return {
+        row['currency']: row['amount']
+        for row in get_earnings(
+            date_after, date_before, 'user', user_id=user_id, today=TODAY, **kwargs
+        )
+    }
+
+
+class TestEarnings:
+    """
+    Test that the earnings are totalled per currency and cached for closed months
+    """
+
+    @pytest.mark.django_db
+    def test_earnings_are_totalled_per_currency(self):
+        """
+        Test that hours are multiplied by the contract price and summed
+        separately for every currency
+        """
+        usd = ContractFactory(hourly_price=Decimal('10.50'))
+        eur = ContractFactory(user=usd.user, hourly_price=Decimal('20'), hourly_price_currency='EUR')
+        TimelogFactory(contract=usd, date='2022-01-10', hours_worked=2)
+        TimelogFactory(contract=usd, date='2022-02-10', hours_worked='1.5')
+        TimelogFactory(contract=eur, date='2022-03-01', hours_worked=3)
+        TimelogFactory(contract=eur, date='2022-04-01', hours_worked=3)
+
+        assert get_user_earnings(
+            usd.user_id, datetime.date(2022, 1, 1), datetime.date(2022, 3, 31)
+        ) == {'USD': Decimal('36.75'), 'EUR': Decimal('60.00')}
+
+        rows = get_earnings(
+            datetime.date(2022, 1, 1), datetime.date(2022, 2, 28), 'project',
+            by_month=True, today=TODAY
+        )
+        assert [(row['period'], row['project'], row['amount']) for row in rows] == [
+            (datetime.date(2022, 1, 1), usd.project_id, Decimal('21.00')),
+            (datetime.date(2022, 2, 1), usd.project_id, Decimal('15.75')),
+        ]
+
+    @pytest.mark.django_db
+    def test_closed_months_are_cached_until_they_change(self):
+        """
+        Test that the totals of closed months are served from the cache and
+        recomputed after a log or a contract price changes
+        """
+        contract = ContractFactory(hourly_price=Decimal('10'))
+        log = TimelogFactory(contract=contract, date='2022-01-10', hours_worked=2)
+        date_range = (datetime.date(2022, 1, 1), datetime.date(2022, 2, 28))
+
+        assert get_user_earnings(contract.user_id, *date_range) == {'USD': Decimal('20.00')}
+        with CaptureQueriesContext(connection) as context:
+            assert get_user_earnings(contract.user_id, *date_range) == {'USD': Decimal('20.00')}
+        # Only the versions of the months are read
+        assert len(context.captured_queries) == 1
+        assert 'tracking_version' in context.captured_queries[0]['sql']
+
+        log.hours_worked = 3
+        log.save()
+        assert get_user_earnings(contract.user_id, *date_range) == {'USD': Decimal('30.00')}
+
+        contract.hourly_price = Decimal('100')
+        contract.save()
+        assert get_user_earnings(contract.user_id, *date_range) == {'USD': Decimal('300.00')}
+
+    @pytest.mark.django_db
+    def test_open_month_is_not_cached(self):
+        """
+        Test that the current month is always computed from the logs
+        """
+        contract = ContractFactory(hourly_price=Decimal('10'))
+        TimelogFactory(contract=contract, date='2022-03-01', hours_worked=1)
+        date_range = (datetime.date(2022, 3, 1), datetime.date(2022, 3, 31))
+
+        assert get_user_earnings(contract.user_id, *date_range) == {'USD': Decimal('10.00')}
+        with CaptureQueriesContext(connection) as context:
+            get_user_earnings(contract.user_id, *date_range)
+        assert len(context.captured_queries) == 1
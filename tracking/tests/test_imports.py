@@ -0,0 +1,171 @@
+"""
+Tests for the bulk import of timelogs from CSV files
+"""
+import csv
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+
+from tracking import imports
+from tracking.models import DailyHours, Timelog, TimelogListing
+from tracking.services import check_hours_rollups, check_timelog_listings
+from tracking.tests.factories import ContractFactory, TimelogFactory
+
+DAY = datetime.date(2021, 6, 1)
+
+
+def write_csv(path, rows, columns=('user', 'project', 'date', 'hours_worked')):
+    """
+    Write the rows to a CSV file and return its path as a string
+    """
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        writer.writerows(rows)
+    return str(path)
+
+
+def import_csv(path, *args):
+    """
+    Run the import command on the file and return its output
+    """
+    out = StringIO()
+    call_command('import_timelogs', path, *args, stdout=out)
+    return out.getvalue()
+
+
+class TestImportTimelogs:
+    """
+    Test that the valid rows are imported in chunks with everything derived
+    from them, and every other row is rejected with its reason
+    """
+
+    @pytest.mark.django_db
+    def test_rows_are_imported_in_chunks(self, tmp_path):
+        """
+        Test that every valid row becomes a log, counted in the rollups and
+        listed, with the progress written after every chunk
+        """
+        contract = ContractFactory()
+        path = write_csv(tmp_path / 'logs.csv', [
+            (contract.user_id, contract.project_id, DAY + datetime.timedelta(days=day), '7.5')
+            for day in range(5)
+        ])
+
+        output = import_csv(path, '--chunk-size', '2')
+        assert output.count('Read ') == 3
+        assert 'Imported 5 of 5 rows' in output
+        assert Timelog.objects.filter(contract=contract).count() == 5
+        assert TimelogListing.objects.count() == 5
+        assert DailyHours.objects.get(date=DAY).hours == Decimal('7.5')
+        assert check_hours_rollups() == [] and check_timelog_listings() == []
+        assert not (tmp_path / 'logs.csv.rejects.csv').exists()
+
+    @pytest.mark.django_db
+    def test_invalid_rows_are_rejected(self, tmp_path):
+        """
+        Test that invalid rows, rows without a contract and rows logged
+        before or twice in the file are written to the reject file
+        """
+        contract = ContractFactory()
+        TimelogFactory(contract=contract, date=DAY, hours_worked=1)
+        owner = (contract.user_id, contract.project_id)
+        path = write_csv(tmp_path / 'logs.csv', [
+            (*owner, DAY, '8'),
+            (*owner, DAY + datetime.timedelta(days=1), '8'),
+            (*owner, DAY + datetime.timedelta(days=1), '6'),
+            (*owner, '01/06/2021', '8'),
+            (*owner, DAY + datetime.timedelta(days=2), '25'),
+            (*owner, DAY + datetime.timedelta(days=3), '1.255'),
+            (contract.user_id, ContractFactory().project_id, DAY, '8'),
+            ('someone', contract.project_id, DAY, '8'),
+        ])
+
+        output = import_csv(path, '--rejects', str(tmp_path / 'rejects.csv'))
+        assert 'Imported 1 of 8 rows' in output
+        assert 'Rejected 7 rows' in output
+        assert Timelog.objects.get(date=DAY).hours_worked == 1
+        assert Timelog.objects.get(date=DAY + datetime.timedelta(days=1)).hours_worked == 8
+
+        with open(tmp_path / 'rejects.csv', newline='') as file:
+            errors = [row['error'] for row in csv.DictReader(file)]
+        reasons = (
+            'already exists', 'more than once', 'YYYY-MM-DD', 'between 0 and 24',
+            '2 decimal places', 'no contract', 'ids',
+        )
+        assert len(errors) == len(reasons)
+        for reason in reasons:
+            assert len([error for error in errors if reason in error]) == 1, reason
+
+    @pytest.mark.django_db
+    def test_rows_logged_during_the_import_are_rejected(self, tmp_path, monkeypatch):
+        """
+        Test that a log written by someone else after its pair was looked up
+        rejects its row, and the rest of the chunk is still imported
+        """
+        contract = ContractFactory()
+        owner = (contract.user_id, contract.project_id)
+        get_existing_timelog_keys = imports.get_existing_timelog_keys
+        lookups = []
+
+        def log_after_lookup(keys):
+            existing = get_existing_timelog_keys(keys)
+            if not lookups:
+                TimelogFactory(contract=contract, date=DAY, hours_worked=1)
+            lookups.append(existing)
+            return existing
+
+        monkeypatch.setattr(imports, 'get_existing_timelog_keys', log_after_lookup)
+        path = write_csv(tmp_path / 'logs.csv', [
+            (*owner, DAY + datetime.timedelta(days=day), '8') for day in range(3)
+        ])
+
+        output = import_csv(path)
+        assert 'Imported 2 of 3 rows' in output
+        assert len(lookups) == 2
+        assert Timelog.objects.get(date=DAY).hours_worked == Decimal('1')
+        with open(tmp_path / 'logs.csv.rejects.csv') as rejects:
+            assert 'already exists' in rejects.read()
+        assert check_hours_rollups() == [] and check_timelog_listings() == []
+
+    @pytest.mark.django_db
+    def test_dry_run_and_export_round_trip(self, client, tmp_path):
+        """
+        Test that a dry run inserts nothing, and that the export of the
+        logs of a contract can be imported under another one
+        """
+        contract = ContractFactory()
+        for day in range(3):
+            TimelogFactory(contract=contract, date=DAY + datetime.timedelta(days=day))
+        client.force_login(contract.user)
+        exported = b''.join(client.get(reverse('timelog_export')).streaming_content).decode()
+
+        # The same logs for the same user on another project
+        other = ContractFactory(user=contract.user)
+        rows = list(csv.DictReader(StringIO(exported)))
+        for row in rows:
+            row['project'] = other.project_id
+        path = tmp_path / 'logs.csv'
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, rows[0].keys())
+            writer.writeheader()
+            writer.writerows(rows)
+
+        assert 'Would import 3 of 3 rows' in import_csv(str(path), '--dry-run')
+        assert not Timelog.objects.filter(contract=other).exists()
+        assert 'Imported 3 of 3 rows' in import_csv(str(path))
+        logs = Timelog.objects.order_by('date').values_list('date', 'hours_worked')
+        assert list(logs.filter(contract=other)) == list(logs.filter(contract=contract))
+
+    @pytest.mark.django_db
+    def test_missing_columns(self, tmp_path):
+        """
+        Test that a file without the required columns is refused
+        """
+        path = write_csv(tmp_path / 'logs.csv', [], columns=('user', 'date'))
+        with pytest.raises(CommandError, match='hours_worked, project'):
+            import_csv(path)
@@ -0,0 +1,116 @@
+"""
+Tests for the generation of the monthly invoices
+"""
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from djmoney.money import Money
+
+from tracking.invoices import generate_invoices, get_invoice_shards
+from tracking.models import Invoice, InvoiceShard, Timelog
+from tracking.tests.factories import ContractFactory, TimelogFactory
+
+MONTH = datetime.date(2021, 3, 1)
+
+
+def get_invoices():
+    """
+    Return the invoices as a {(contract, month): (user, hours, amount)} dict
+    """
+    return {
+        (invoice.contract_id, invoice.month): (invoice.user_id, invoice.hours, invoice.amount)
+        for invoice in Invoice.objects.all()
+    }
+
+
+@pytest.fixture(name='contracts')
+def contracts_with_logs():
+    """
+    Fixture to get eight contracts, all but the last with logs in MONTH and
+    around it
+    """
+    contracts = [
+        ContractFactory(
+            hourly_price=Money(Decimal('10.25') + number, 'EUR' if number % 2 else 'USD')
+        )
+        for number in range(8)
+    ]
+    for number, contract in enumerate(contracts[:-1]):
+        for day in (-1, 0, 14, 30, 31):
+            TimelogFactory(
+                contract=contract,
+                date=MONTH + datetime.timedelta(days=day),
+                hours_worked=Decimal('1.5') + number,
+            )
+    return contracts
+
+
+class TestGenerateInvoices:
+    """
+    Test that the invoices total the hours of a month times the hourly price
+    the same way whatever the workers and shards
+    """
+
+    @pytest.mark.django_db
+    def test_invoices_total_the_month(self, contracts):
+        """
+        Test that every contract with logs in the month gets an invoice of
+        its hours times its hourly price, in its currency
+        """
+        stats = generate_invoices(MONTH, shard_size=3)
+        assert (stats['invoices'], stats['logs']) == (7, 21)
+
+        invoices = get_invoices()
+        assert len(invoices) == 7
+        contract = contracts[1]
+        assert invoices[(contract.id, MONTH)] == (
+            contract.user_id, Decimal('7.50'), Money(Decimal('84.38'), 'EUR')
+        )
+        assert (contracts[-1].id, MONTH) not in invoices
+
+    @pytest.mark.django_db
+    def test_same_invoices_for_any_worker_count(self, contracts):
+        """
+        Test that worker processes write the same invoices as a single
+        process, including the archived logs
+
+        This checks the sharding, not the isolation of the workers: the
+        forked workers keep using the in-memory test database of this
+        process, which Django never closes
+        """
+        generate_invoices(MONTH, workers=1, shard_size=1)
+        expected = get_invoices()
+
+        call_command('archive_timelogs', stdout=StringIO())
+        assert not Timelog.objects.exists()
+        Invoice.objects.all().delete()
+        stats = generate_invoices(MONTH, workers=3, shard_size=2, restart=True)
+        assert stats['skipped'] == 0
+        assert get_invoices() == expected
+
+    @pytest.mark.django_db
+    def test_resume_after_a_crash(self, contracts):
+        """
+        Test that a second run only writes the shards the first did not
+        """
+        shards = get_invoice_shards(3)
+        assert len(shards) in (3, 4)
+        generate_invoices(MONTH, shard_size=3)
+        expected = get_invoices()
+
+        # As if the run had stopped after writing the first shard
+        InvoiceShard.objects.exclude(first_contract_id=shards[0][0]).delete()
+        Invoice.objects.filter(contract_id__gt=shards[0][1]).delete()
+
+        out = StringIO()
+        call_command(
+            'generate_invoices', '--month', '2021-03', '--shard-size', '3', '--workers', '1',
+            stdout=out
+        )
+        assert f'Skipped 1 of {len(shards)} shards' in out.getvalue()
+        assert 'logs/s' in out.getvalue()
+        assert get_invoices() == expected
+        assert InvoiceShard.objects.count() == len(shards)
@@ -0,0 +1,60 @@
+"""
+Tests for the selectors of the tracking app
+"""
+import re
+
+import pytest
+from django.db import connection
+
+from tracking.selectors import (get_contracts, get_contracts_for_user,
+                                get_timelogs, get_timelogs_for_contract,
+                                get_timelogs_for_user)
+
+# A step of a plan that reads a whole table without the help of an index
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+$')
+
+
+def get_query_plan(queryset):
+    """
+    Return the steps of the SQLite query plan for the given queryset
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+@pytest.mark.skipif(connection.vendor != 'sqlite', reason='Checks SQLite query plans')
+class TestSelectorQueryPlans:
+    """
+    Test that the selectors are served by indexes, so that a query falling
+    back to reading a whole table is caught
+    """
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('queryset', [
+        get_timelogs_for_user(1).order_by('-date', '-id')[:21],
+        get_timelogs_for_user(1).filter(date='2022-01-01'),
+        get_timelogs_for_contract(1),
+        get_timelogs().filter(contract=1, date='2022-01-01'),
+        get_timelogs().filter(date='2022-01-01').order_by('-date', '-id')[:21],
+        get_timelogs().filter(date__lt='2022-01-01').order_by('-date', '-id')[:21],
+        get_timelogs().order_by('-date', '-id')[:21],
+        get_contracts_for_user(1).order_by('id')[:21],
+        get_contracts().filter(project=1),
+    ])
+    def test_selectors_do_not_scan_full_tables(self, queryset):
+        """
+        Test that no step of the query plan is an unindexed table scan
+        """
+        plan = get_query_plan(queryset)
+        assert not [step for step in plan if FULL_SCAN.match(step)], plan
+
+    @pytest.mark.django_db
+    def test_timelog_pages_do_not_sort_all_logs(self):
+        """
+        Test that a page of all the logs is read in index order instead of
+        sorting the whole table
+        """
+        plan = get_query_plan(get_timelogs().order_by('-date', '-id')[:21])
+        assert not [step for step in plan if 'TEMP B-TREE' in step], plan
@@ -0,0 +1,281 @@
+"""
+Tests for the services of the tracking app
+"""
+import datetime
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.db.models.signals import pre_delete
+
+from tracking import services
+from tracking.models import (Contract, DailyHours, Timelog, TimelogListing,
+                             WeeklyHours)
+from tracking.services import (apply_timelog_deltas, bulk_create_timelogs,
+                               check_hours_rollups, check_timelog_listings,
+                               refresh_timelog_listings, upsert_timelog)
+from tracking.tests.factories import (ContractFactory, ProjectFactory,
+                                      TimelogFactory)
+from users.tests.factories import UserFactory
+
+
+def get_daily_hours():
+    """
+    Return the daily rollups as a {(user, project, date): hours} dict
+    """
+    return {
+        (row.user_id, row.project_id, row.date): row.hours for row in DailyHours.objects.all()
+    }
+
+
+def get_weekly_hours():
+    """
+    Return the weekly rollups as a {(user, project, week): hours} dict
+    """
+    return {
+        (row.user_id, row.project_id, row.week): row.hours for row in WeeklyHours.objects.all()
+    }
+
+
+class TestHoursRollups:
+    """
+    Test that the daily and weekly rollups follow the changes to the logs
+    """
+
+    monday = datetime.date(2022, 1, 3)
+    tuesday = datetime.date(2022, 1, 4)
+
+    @pytest.mark.django_db
+    def test_rollups_follow_created_updated_and_deleted_logs(self):
+        """
+        Test that creating, moving and deleting logs updates the rollups
+        """
+        contract = ContractFactory()
+        key = (contract.user_id, contract.project_id)
+        first = TimelogFactory(contract=contract, date=self.monday, hours_worked=2)
+        second = TimelogFactory(contract=contract, date=self.tuesday, hours_worked='3.25')
+
+        assert get_daily_hours() == {
+            (*key, self.monday): Decimal('2'),
+            (*key, self.tuesday): Decimal('3.25'),
+        }
+        assert get_weekly_hours() == {(*key, self.monday): Decimal('5.25')}
+
+        second.date = datetime.date(2022, 1, 10)
+        second.save()
+        assert get_daily_hours() == {
+            (*key, self.monday): Decimal('2'),
+            (*key, datetime.date(2022, 1, 10)): Decimal('3.25'),
+        }
+        assert get_weekly_hours() == {
+            (*key, self.monday): Decimal('2'),
+            (*key, datetime.date(2022, 1, 10)): Decimal('3.25'),
+        }
+
+        Timelog.objects.get(id=first.id).delete()
+        Timelog.objects.filter(id=second.id).delete()
+        assert not get_daily_hours()
+        assert not get_weekly_hours()
+
+    @pytest.mark.django_db
+    def test_rollups_follow_contract_changes(self):
+        """
+        Test that the rollups move with a contract that changes hands and go
+        away with a deleted contract
+        """
+        contract = ContractFactory()
+        TimelogFactory(contract=contract, date=self.monday, hours_worked=4)
+
+        contract.user = UserFactory()
+        contract.save()
+        assert get_daily_hours() == {
+            (contract.user_id, contract.project_id, self.monday): Decimal('4')
+        }
+
+        contract.delete()
+        assert not get_daily_hours()
+        assert not get_weekly_hours()
+
+    @pytest.mark.django_db
+    def test_failed_contract_delete_keeps_logs_counted(self):
+        """
+        Test that once the delete of a contract fails and is rolled back, the
+        later deletes of its logs are still taken out of the rollups
+        """
+        contract = ContractFactory()
+        first = TimelogFactory(contract=contract, date=self.monday, hours_worked=4)
+        TimelogFactory(contract=contract, date=self.tuesday, hours_worked=2)
+
+        def fail_delete(sender, instance, **kwargs):
+            raise RuntimeError('Delete failed')
+
+        pre_delete.connect(fail_delete, sender=Contract)
+        try:
+            with pytest.raises(RuntimeError), transaction.atomic():
+                contract.delete()
+        finally:
+            pre_delete.disconnect(fail_delete, sender=Contract)
+
+        assert get_weekly_hours() == {
+            (contract.user_id, contract.project_id, self.monday): Decimal('6')
+        }
+        Timelog.objects.get(id=first.id).delete()
+        assert get_weekly_hours() == {
+            (contract.user_id, contract.project_id, self.monday): Decimal('2')
+        }
+        assert not check_hours_rollups()
+
+    @pytest.mark.django_db
+    def test_bulk_deltas_update_rollups(self):
+        """
+        Test that bulk inserted logs are added to the rollups by their deltas
+        """
+        contract = ContractFactory()
+        TimelogFactory(contract=contract, date=self.monday, hours_worked=1)
+        logs = Timelog.objects.bulk_create([
+            Timelog(contract=contract, date=self.tuesday, hours_worked=Decimal('2.5')),
+            Timelog(contract=contract, date=self.tuesday.replace(day=5), hours_worked=3),
+        ])
+        apply_timelog_deltas((log.contract_id, log.date, log.hours_worked) for log in logs)
+
+        assert get_weekly_hours() == {
+            (contract.user_id, contract.project_id, self.monday): Decimal('6.5')
+        }
+        assert not check_hours_rollups()
+
+    @pytest.mark.django_db
+    def test_upsert_retries_after_a_concurrent_write(self, monkeypatch):
+        """
+        Test that an upsert whose log was written between reading its hours
+        and writing the new ones tries again, taking the concurrent hours
+        out of the rollups
+        """
+        contract = ContractFactory()
+        upsert_row = services._upsert_timelog_row
+        attempts = []
+
+        def upsert_after_concurrent_write(*args):
+            if not attempts:
+                attempts.append(args)
+                upsert_timelog(contract.user_id, contract.id, self.monday, Decimal('2'))
+            attempts.append(args)
+            return upsert_row(*args)
+
+        monkeypatch.setattr(services, '_upsert_timelog_row', upsert_after_concurrent_write)
+        timelog_id, created = upsert_timelog(
+            contract.user_id, contract.id, self.monday, Decimal('8')
+        )
+
+        assert len(attempts) == 4 and created is False
+        assert Timelog.objects.get(id=timelog_id).hours_worked == Decimal('8')
+        assert get_daily_hours() == {
+            (contract.user_id, contract.project_id, self.monday): Decimal('8')
+        }
+        assert not check_hours_rollups()
+
+
+class TestRebuildHoursRollupsCommand:
+    """
+    Test the management command rebuilding the rollups
+    """
+
+    @pytest.mark.django_db
+    def test_verify_reports_and_rebuild_fixes_stale_rollups(self):
+        """
+        Test that stale rollups fail verification and are fixed by a rebuild
+        """
+        contract = ContractFactory()
+        TimelogFactory(contract=contract, date='2022-01-03', hours_worked=8)
+        DailyHours.objects.update(hours=1)
+
+        with pytest.raises(CommandError):
+            call_command('rebuild_hours_rollups', '--verify', stdout=StringIO())
+
+        out = StringIO()
+        call_command('rebuild_hours_rollups', stdout=out)
+        assert 'Rollups match the timelogs' in out.getvalue()
+        assert get_daily_hours() == {
+            (contract.user_id, contract.project_id, datetime.date(2022, 1, 3)): Decimal('8')
+        }
+
+
+class TestTimelogListings:
+    """
+    Test that the listings follow the changes to the logs, contracts and
+    projects
+    """
+
+    @pytest.mark.django_db
+    def test_listings_follow_every_write(self):
+        """
+        Test that every way of writing the data the listings copy keeps them
+        equal to the logs
+        """
+        contract = ContractFactory(hourly_price=Decimal('10'))
+        timelog = TimelogFactory(contract=contract, date='2022-01-03', hours_worked=8)
+        bulk_create_timelogs(
+            [{'contract_id': contract.id, 'date': datetime.date(2022, 1, 4), 'hours_worked': 2}],
+            {contract.id: (contract.user_id, contract.project_id)}
+        )
+        upsert_timelog(contract.user_id, contract.id, datetime.date(2022, 1, 4), Decimal('3'))
+        timelog.hours_worked = 5
+        timelog.save()
+        assert check_timelog_listings() == []
+        assert TimelogListing.objects.get(id=timelog.id).hours_worked == Decimal('5')
+
+        contract.hourly_price = Decimal('20')
+        contract.user = UserFactory()
+        contract.save()
+        contract.project.name = 'Renamed'
+        contract.project.save()
+        assert check_timelog_listings() == []
+        assert set(TimelogListing.objects.values_list('user_id', 'project_name')) == {
+            (contract.user_id, 'Renamed')
+        }
+
+        timelog.delete()
+        assert check_timelog_listings() == []
+        ProjectFactory().delete()
+        contract.project.delete()
+        assert not TimelogListing.objects.exists()
+
+    @pytest.mark.django_db
+    def test_refresh_rewrites_only_the_given_pairs(self):
+        """
+        Test that a refresh leaves alone the listings of the other dates of
+        the contracts, even when other given pairs have those dates
+        """
+        monday, tuesday = datetime.date(2022, 1, 3), datetime.date(2022, 1, 4)
+        first, second = ContractFactory(), ContractFactory()
+        for contract in (first, second):
+            for date in (monday, tuesday):
+                TimelogFactory(contract=contract, date=date, hours_worked=8)
+        TimelogListing.objects.update(project_name='Stale')
+
+        refresh_timelog_listings([(first.id, monday), (second.id, tuesday)])
+
+        assert set(
+            TimelogListing.objects.exclude(project_name='Stale').values_list('contract_id', 'date')
+        ) == {(first.id, monday), (second.id, tuesday)}
+
+    @pytest.mark.django_db
+    def test_rebuild_command_fixes_stale_listings(self):
+        """
+        Test that stale listings fail verification and are fixed by a rebuild
+        """
+        timelog = TimelogFactory(date='2022-01-03', hours_worked=8)
+        TimelogListing.objects.update(project_name='Stale')
+        TimelogListing.objects.create(
+            id=timelog.id + 1, date=timelog.date, hours_worked=1, contract_id=0,
+            user_id=0, project_id=0, project_name='Gone', hourly_price=1
+        )
+
+        with pytest.raises(CommandError, match='2 timelog listings'):
+            call_command('rebuild_timelog_listings', '--verify', stdout=StringIO())
+
+        out = StringIO()
+        call_command('rebuild_timelog_listings', stdout=out)
+        assert 'Listings match the timelogs' in out.getvalue()
+        assert TimelogListing.objects.get().project_name == timelog.contract.project.name
@@ -0,0 +1,105 @@
+"""
+Versions of the data behind the API responses, used to validate the
+responses cached by clients. Every write to a Project, Contract or Timelog
+stores a new version of that resource, for everyone and for the user the
+written object belongs to, so that a response only changes its ETag when
+the data it was built from may have changed.
+
+Versions are counters in the Version table, so that every process sees the
+writes of the others, whoever made them: the API, a management command or a
+job. The versions of the users are moved on in the transaction of the write
+they version, the version for everyone only once it commits, so that the
+writes of different users never wait for each other on its row. Versions
+are never written by reads. A counter is None until the first write of what
+it versions starts it at the current time in nanoseconds, so that a counter
+lost with the table never restarts at a value used before.
+"""
+import time
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import Version
+
+CACHE_PREFIX = 'tracking:versions'
+
+# Resources whose versions are tracked
+PROJECTS = 'projects'
+CONTRACTS = 'contracts'
+TIMELOGS = 'timelogs'
+
+
+def get_counters(keys):
+    """
+    Return the value of every given counter, None for the counters that
+    never moved on
+
+    Args:
+        keys (iterable): Keys of the counters
+
+    Returns:
+        dict: The value of every key
+    """
+    keys = set(keys)
+    counters = dict.fromkeys(keys)
+    counters.update(Version.objects.filter(key__in=keys).values_list('key', 'value'))
+    return counters
+
+
+def increment_counters(keys):
+    """
+    Move every given counter on, starting the missing ones at the current
+    time. Call it in the transaction of the write the counters version
+
+    Args:
+        keys (iterable): Keys of the counters
+    """
+    keys = set(keys)
+    counters = Version.objects.filter(key__in=keys)
+    if counters.update(value=F('value') + 1) < len(keys):
+        # Moved on again in case another process started them meanwhile
+        Version.objects.bulk_create(
+            [Version(key=key, value=time.time_ns()) for key in keys], ignore_conflicts=True
+        )
+        counters.update(value=F('value') + 1)
+
+
+def get_version_key(resource, user_id=None):
+    """
+    Return the key of the version of the resource, for all the users or only
+    the given one
+    """
+    if user_id is None:
+        return f'{CACHE_PREFIX}:{resource}'
+    return f'{CACHE_PREFIX}:{resource}:user:{user_id}'
+
+
+def get_versions(keys):
+    """
+    Return the version stored under each of the given keys
+
+    Args:
+        keys (list): Keys built by get_version_key
+
+    Returns:
+        list: The versions, in the order of the keys
+    """
+    versions = get_counters(keys)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(resource, user_ids=()):
+    """
+    Move the version of the resource on for each of the given users, after
+    objects of theirs were written, and for everyone once the transaction of
+    the write commits. The responses for everyone read in between may still
+    get the previous version, for that moment
+
+    Args:
+        resource (str): One of PROJECTS, CONTRACTS or TIMELOGS
+        user_ids (iterable): Ids of the Users whose objects were written
+    """
+    user_ids = set(user_ids)
+    if user_ids:
+        increment_counters(get_version_key(resource, user_id) for user_id in user_ids)
+    transaction.on_commit(lambda: increment_counters([get_version_key(resource)]))
@@ -5,9 +5,11 @@ from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
 from rest_framework.validators import UniqueValidator
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 from users.models import User
 from users.services import create_user
+from users.tokens import ClaimsRefreshToken
 
 
 class UserSerializer(ModelSerializer):
@@ -62,3 +64,16 @@ class RegisterUserSerializer(serializers.ModelSerializer):
         Create a user object with the validated data
         """
         return create_user(**validated_data)
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Serializer for logging in, issuing tokens that carry the claims of the user
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        """
+        Create a refresh token with the claims of the user
+        """
+        return ClaimsRefreshToken.for_user(user)
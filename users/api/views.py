@@ -5,13 +5,19 @@ from rest_framework.generics import (ListCreateAPIView,
                                      RetrieveUpdateDestroyAPIView)
 from rest_framework.permissions import (SAFE_METHODS, AllowAny, IsAdminUser,
                                         IsAuthenticated)
+from rest_framework_simplejwt.views import TokenObtainPairView
 
+from time_tracking_system.instrumentation import ServerTimingMixin
 from users.models import User
 
-from .serializers import RegisterUserSerializer, UserSerializer
+from .serializers import (ClaimsTokenObtainPairSerializer,
+                          RegisterUserSerializer, UserSerializer)
 
 
-class UserRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
+class UserRetrieveUpdateDestroyView(
+    ServerTimingMixin,
+    RetrieveUpdateDestroyAPIView
+):
     """
     APIView to retrieve and update users. Only an admin
     or the user themselves can access their user object
@@ -30,7 +36,7 @@ class UserRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
         return User.objects.filter(id=self.request.user.id)
 
 
-class ListRegisterView(ListCreateAPIView):
+class ListRegisterView(ServerTimingMixin, ListCreateAPIView):
     """
     APIView to register a new user
     """
@@ -55,3 +61,12 @@ class ListRegisterView(ListCreateAPIView):
             return [IsAdminUser()]
 
         return [AllowAny()]
+
+
+class ClaimsTokenObtainPairView(TokenObtainPairView):
+    """
+    APIView to log in with a username and password, returning a refresh
+    and an access token carrying the claims of the user
+    """
+
+    serializer_class = ClaimsTokenObtainPairSerializer
@@ -11,3 +11,10 @@ class UsersConfig(AppConfig):
 
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        """
+        Connect the signal receivers of the app
+        """
+        # pylint: disable=import-outside-toplevel,unused-import
+        from . import signals  # noqa: F401
@@ -0,0 +1,59 @@
+"""
+Authentication of API requests by the claims of their JWT
+"""
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (AuthenticationFailed,
+                                                 InvalidToken)
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from time_tracking_system.replicas import pin_to_primary
+
+from .selectors import get_cached_user, is_pinned_to_primary, is_revoked
+from .tokens import TOKEN_CLAIMS
+
+
+class ClaimsUser(TokenUser):
+    """
+    Stateless user built from the claims of a token, enough for the
+    permission checks and filters of the API. The full User is only loaded,
+    through the cache, if `user` is read
+    """
+
+    @cached_property
+    def user(self):
+        """
+        The User object the token was issued to
+        """
+        return get_cached_user(self.id)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Authenticate requests by their JWT without loading the user from the db.
+    Tokens issued before their claims were added fall back to loading the
+    user. The state of the user, to reject revoked tokens and read from the
+    primary for a user that just wrote, comes from the cache of the user
+    states, so that a request is authenticated without any query
+    """
+
+    def get_user(self, validated_token):
+        """
+        Return a ClaimsUser for the token, unless its tokens were revoked
+        """
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        if is_pinned_to_primary(user_id):
+            pin_to_primary()
+
+        if not all(claim in validated_token for claim in TOKEN_CLAIMS):
+            return super().get_user(validated_token)
+
+        if is_revoked(validated_token, user_id):
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+
+        return ClaimsUser(validated_token)
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.9 on 2026-10-18 03:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserState',
+            fields=[
+                ('user_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tokens_revoked_at', models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.9 on 2026-10-18 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstate',
+            name='primary_pinned_until',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
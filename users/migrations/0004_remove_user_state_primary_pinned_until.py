@@ -0,0 +1,17 @@
+# Generated by Django 3.2.9 on 2026-10-18 04:18
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_state_primary_pinned_until'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='userstate',
+            name='primary_pinned_until',
+        ),
+    ]
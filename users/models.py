@@ -2,7 +2,9 @@
 Models for the users app
 """
 from django.contrib.auth.models import AbstractUser
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.db import models
+
+from .tokens import ClaimsRefreshToken
 
 
 class User(AbstractUser):
@@ -14,9 +16,10 @@ class User(AbstractUser):
 
     def create_auth_token(self):
         """
-        Create an auth token for this user
+        Create an auth token for this user, carrying the claims the api
+        needs to authorize its requests without loading it
         """
-        return RefreshToken.for_user(self)
+        return ClaimsRefreshToken.for_user(self)
 
     def get_tokens_for_user(self):
         """
@@ -31,3 +34,17 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.email
+
+
+class UserState(models.Model):
+    """
+    State of a user that every process serving the API has to agree on, such
+    as when its tokens were revoked. Kept apart from the User so that it
+    outlives a deleted user, and read by its id alone
+    """
+    user_id = models.BigIntegerField(primary_key=True)
+    # Tokens issued before this time are rejected
+    tokens_revoked_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f'State of User: {self.user_id}'
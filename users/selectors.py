@@ -0,0 +1,105 @@
+"""
+Selectors to retrieve data from db for the users app
+"""
+from django.conf import settings
+from django.core.cache import cache, caches
+
+from time_tracking_system.replicas import read_from_primary
+
+from .models import User, UserState
+
+USER_CACHE_PREFIX = 'users:user'
+PRIMARY_PIN_PREFIX = 'users:pinned'
+TOKENS_REVOKED_PREFIX = 'users:revoked'
+
+
+def get_cached_user(user_id):
+    """
+    Get a user by id, served from the cache for USER_CACHE_TIMEOUT seconds
+    after it was loaded. Only for the code that needs more of the user than
+    the claims of its token. The cache is the one of the process, so other
+    processes may serve their copy of a changed user until it expires, but
+    the tokens of a user whose claims changed are rejected before
+
+    Args:
+        user_id (int): Id of the User
+
+    Returns:
+        User: The User object
+
+    Raises:
+        User.DoesNotExist: If there is no such user
+    """
+    timeout = settings.USER_CACHE_TIMEOUT
+    if not timeout:
+        return User.objects.get(id=user_id)
+
+    key = f'{USER_CACHE_PREFIX}:{user_id}'
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.get(id=user_id)
+        cache.set(key, user, timeout=timeout)
+    return user
+
+
+def forget_cached_user(user_id):
+    """
+    Drop the cached copy of the user, so that it is loaded again next time
+    """
+    cache.delete(f'{USER_CACHE_PREFIX}:{user_id}')
+
+
+def get_tokens_revoked_at(user_id):
+    """
+    Get the time the tokens of a user were revoked at, served from the cache
+    of the user states for TOKEN_REVOCATION_CACHE_TIMEOUT seconds after it
+    was read from the primary, so that authenticating a request does not
+    query the db
+
+    Args:
+        user_id (int): Id of the User
+
+    Returns:
+        float: Timestamp of the revocation, 0 if the tokens were never revoked
+    """
+    states = caches[settings.USER_STATE_CACHE_ALIAS]
+    key = f'{TOKENS_REVOKED_PREFIX}:{user_id}'
+    revoked_at = states.get(key)
+    if revoked_at is None:
+        with read_from_primary():
+            revoked_at = UserState.objects.filter(user_id=user_id).values_list(
+                'tokens_revoked_at', flat=True
+            ).first()
+        revoked_at = revoked_at.timestamp() if revoked_at else 0
+        states.set(key, revoked_at, timeout=settings.TOKEN_REVOCATION_CACHE_TIMEOUT)
+    return revoked_at
+
+
+def is_revoked(token, user_id):
+    """
+    Whether the token was issued before the tokens of its user were revoked
+
+    Args:
+        token (Token): Validated token
+        user_id (int): Id of the User the token was issued to
+
+    Returns:
+        bool: True if the token must be rejected
+    """
+    return token.get('iat', 0) < get_tokens_revoked_at(user_id)
+
+
+def is_pinned_to_primary(user_id):
+    """
+    Whether the reads of the user must not go to the replicas, because it
+    wrote a moment ago
+
+    Args:
+        user_id (int): Id of the User
+
+    Returns:
+        bool: True if the reads of the user go to the primary
+    """
+    return caches[settings.USER_STATE_CACHE_ALIAS].get(
+        f'{PRIMARY_PIN_PREFIX}:{user_id}', False
+    )
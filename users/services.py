@@ -1,7 +1,13 @@
 """
 All the service functions to add data to the db for the users app
 """
-from .models import User
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .models import User, UserState
+from .selectors import PRIMARY_PIN_PREFIX, TOKENS_REVOKED_PREFIX
 
 
 def create_user(username, email, password, first_name='', last_name='', **kwargs):
@@ -32,3 +38,46 @@ def create_user(username, email, password, first_name='', last_name='', **kwargs
     # Create a JWT auth token a newly created user
     user.create_auth_token()
     return user
+
+
+def revoke_tokens(user_id):
+    """
+    Reject all the tokens issued to the user until now, e.g. because the
+    claims they carry are no longer true. Stored in the db, and written to
+    the cache of the user states right away and again once the transaction
+    commits, so that a time read before the commit is not left cached
+
+    Args:
+        user_id (int): Id of the User
+    """
+    revoked_at = timezone.now()
+    UserState.objects.update_or_create(
+        user_id=user_id, defaults={'tokens_revoked_at': revoked_at}
+    )
+    _cache_tokens_revoked_at(user_id, revoked_at.timestamp())
+    transaction.on_commit(lambda: _cache_tokens_revoked_at(user_id, revoked_at.timestamp()))
+
+
+def pin_user_to_primary(user_id):
+    """
+    Read from the primary for the user for the next REPLICA_PIN_SECONDS,
+    after it wrote, so that it reads its own writes whatever client it uses.
+    Kept in the cache of the user states, which expires the pin
+
+    Args:
+        user_id (int): Id of the User
+    """
+    caches[settings.USER_STATE_CACHE_ALIAS].set(
+        f'{PRIMARY_PIN_PREFIX}:{user_id}', True, timeout=settings.REPLICA_PIN_SECONDS
+    )
+
+
+def _cache_tokens_revoked_at(user_id, revoked_at):
+    """
+    Store the time the tokens of the user were revoked at in the cache of the
+    user states
+    """
+    caches[settings.USER_STATE_CACHE_ALIAS].set(
+        f'{TOKENS_REVOKED_PREFIX}:{user_id}', revoked_at,
+        timeout=settings.TOKEN_REVOCATION_CACHE_TIMEOUT
+    )
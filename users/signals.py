@@ -0,0 +1,62 @@
+"""
+Signal receivers keeping the tokens and the cached copies of the users in
+sync with the users table, and pinning the users that wrote to the primary
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from time_tracking_system.replicas import wrote_to_primary
+
+from .models import User
+from .selectors import forget_cached_user
+from .services import pin_user_to_primary, revoke_tokens
+from .tokens import TOKEN_CLAIMS
+
+# Fields whose change makes the claims of the tokens already issued wrong
+REVOKING_FIELDS = ('is_active', *TOKEN_CLAIMS)
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_user(sender, instance, raw, **kwargs):
+    """
+    Keep the stored values of the fields the tokens depend on
+    """
+    instance._previous_values = None
+    if not raw and instance.pk is not None:
+        instance._previous_values = User.objects.filter(pk=instance.pk).values(
+            *REVOKING_FIELDS
+        ).first()
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_user_save(sender, instance, raw, **kwargs):
+    """
+    Drop the cached copy of a saved user, and revoke its tokens if they no
+    longer describe it, e.g. it was deactivated or lost its staff status
+    """
+    forget_cached_user(instance.pk)
+    previous = getattr(instance, '_previous_values', None)
+    if previous and any(
+            previous[field] != getattr(instance, field) for field in REVOKING_FIELDS
+    ):
+        revoke_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def revoke_tokens_on_user_delete(sender, instance, **kwargs):
+    """
+    Drop the cached copy and the tokens of a deleted user
+    """
+    forget_cached_user(instance.pk)
+    revoke_tokens(instance.pk)
+
+
+@receiver(wrote_to_primary)
+def pin_writing_user(sender, request, **kwargs):
+    """
+    Pin the user a write was authenticated as to the primary, for the
+    clients of the token API that do not keep the cookie
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        pin_user_to_primary(user.id)
@@ -0,0 +1,186 @@
+"""
+Tests for authenticating api requests by the claims of their token
+"""
+import pytest
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from tracking.tests.factories import ContractFactory
+from users.authentication import ClaimsJWTAuthentication
+from users.selectors import get_cached_user
+from users.services import revoke_tokens
+from users.tests.factories import UserFactory
+
+
+def get(client, url, token):
+    """
+    GET the url authenticated by the given access token
+    """
+    return client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+
+class TestClaimsJWTAuthentication:
+    """
+    Test that requests with a token are authenticated without loading the user
+    """
+
+    @pytest.mark.django_db
+    def test_token_carries_claims(self):
+        """
+        Test that the tokens of a user carry the claims the api needs
+        """
+        user = UserFactory(is_staff=True)
+        access = AccessToken(user.get_tokens_for_user()['access'])
+
+        assert access['user_id'] == user.id
+        assert access['username'] == user.username
+        assert access['is_staff'] is True
+        assert access['is_superuser'] is False
+
+    @pytest.mark.django_db
+    def test_request_does_not_load_the_user(self, client):
+        """
+        Test that a request authenticated by a token does not query the users
+        table, while the staff claim still decides what is shown
+        """
+        user = UserFactory()
+        ContractFactory.create_batch(2, user=user)
+        ContractFactory()
+        admin = UserFactory(is_staff=True)
+
+        for token_user, total in ((user, 2), (admin, 3)):
+            token = token_user.get_tokens_for_user()['access']
+            with CaptureQueriesContext(connection) as context:
+                response = get(client, reverse('contract_list'), token)
+            assert response.status_code == status.HTTP_200_OK
+            assert len(response.data['results']) == total
+            assert not any(
+                '"users_user"' in query['sql'] for query in context.captured_queries
+            )
+
+    @pytest.mark.django_db
+    def test_authentication_runs_no_query(self):
+        """
+        Test that once the state of a user is cached, authenticating its
+        requests does not query the db at all
+        """
+        user = UserFactory()
+        token = user.get_tokens_for_user()['access']
+        request = APIRequestFactory().get('/api/logs/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        authentication = ClaimsJWTAuthentication()
+        authentication.authenticate(request)
+
+        with CaptureQueriesContext(connection) as context:
+            authenticated_user, _ = authentication.authenticate(request)
+        assert len(context.captured_queries) == 0
+        assert authenticated_user.id == user.id
+
+    @pytest.mark.django_db
+    def test_tokens_without_claims_load_the_user(self, client):
+        """
+        Test that tokens issued before the claims were added still work
+        """
+        user = UserFactory()
+        token = RefreshToken.for_user(user).access_token
+
+        response = get(client, reverse('contract_list'), token)
+        assert response.status_code == status.HTTP_200_OK
+
+        user.is_active = False
+        user.save()
+        response = get(client, reverse('contract_list'), token)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('field, value', [('is_active', False), ('is_staff', True)])
+    def test_tokens_revoked_when_claims_change(self, client, field, value):
+        """
+        Test that the tokens of a user are rejected once it is deactivated or
+        its staff status changes, but not after other changes
+        """
+        user = UserFactory()
+        token = user.get_tokens_for_user()['access']
+
+        user.first_name = 'Changed'
+        user.save()
+        assert get(client, reverse('contract_list'), token).status_code == status.HTTP_200_OK
+
+        setattr(user, field, value)
+        user.save()
+        response = get(client, reverse('contract_list'), token)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    @pytest.mark.django_db
+    def test_revocation_is_seen_by_every_process(self, client):
+        """
+        Test that tokens revoked by another process are rejected by one whose
+        memory never heard of it
+        """
+        user = UserFactory()
+        token = user.get_tokens_for_user()['access']
+        assert get(client, reverse('contract_list'), token).status_code == status.HTTP_200_OK
+
+        revoke_tokens(user.id)
+        for cache in caches.all():
+            cache.clear()
+
+        response = get(client, reverse('contract_list'), token)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    @pytest.mark.django_db
+    def test_tokens_issued_after_revocation_are_accepted(self, client):
+        """
+        Test that only the tokens issued before the revocation are rejected,
+        even when new ones are issued within the same second
+        """
+        user = UserFactory()
+        revoked = user.get_tokens_for_user()['access']
+        revoke_tokens(user.id)
+        issued = user.get_tokens_for_user()['access']
+
+        assert get(client, reverse('contract_list'), revoked).status_code == (
+            status.HTTP_403_FORBIDDEN
+        )
+        assert get(client, reverse('contract_list'), issued).status_code == status.HTTP_200_OK
+
+    @pytest.mark.django_db
+    def test_login_issues_tokens_with_claims(self, client):
+        """
+        Test that logging in returns tokens carrying the claims
+        """
+        user = UserFactory(password='a-Str0ng-password')
+
+        response = client.post(
+            reverse('token_obtain_pair'),
+            {'username': user.username, 'password': 'a-Str0ng-password'}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert AccessToken(response.data['access'])['is_staff'] is False
+
+
+class TestGetCachedUser:
+    """
+    Test that the users needed in full are cached until they change
+    """
+
+    @pytest.mark.django_db
+    def test_user_is_cached_until_saved(self, django_assert_num_queries):
+        """
+        Test that the user is loaded once and again after it is saved
+        """
+        user = UserFactory()
+
+        with django_assert_num_queries(1):
+            get_cached_user(user.id)
+            assert get_cached_user(user.id).username == user.username
+
+        user.first_name = 'Changed'
+        user.save()
+        with django_assert_num_queries(1):
+            assert get_cached_user(user.id).first_name == 'Changed'
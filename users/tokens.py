@@ -0,0 +1,33 @@
+"""
+JWT tokens carrying the claims the API needs to authorize a request, so
+that requests can be authenticated without loading the user from the db
+"""
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# User fields copied into every token
+TOKEN_CLAIMS = ('username', 'is_staff', 'is_superuser')
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token with the TOKEN_CLAIMS of the user, which are copied to
+    every access token created from it. The time it was issued at is kept
+    to the microsecond, so that a token issued in the same second as its
+    user's tokens were revoked can be told apart from the revoked ones
+    """
+
+    def set_iat(self, claim='iat', at_time=None):
+        """
+        Set the time the token was issued at, to the microsecond
+        """
+        self.payload[claim] = (at_time or self.current_time).timestamp()
+
+    @classmethod
+    def for_user(cls, user):
+        """
+        Create a token for the user with its claims
+        """
+        token = super().for_user(user)
+        for claim in TOKEN_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token